@@ -3,10 +3,127 @@
 from __future__ import annotations
 
 import argparse
+import os
+import sys
 
 from .version_builder import version_builder
 
 
+def response_validation(value: str) -> tuple[str, int]:
+    """Parse a response validation mode, optionally scoped to a route.
+
+    Accepted modes are ``strict``, ``off`` and ``sampled:N``, e.g.
+    ``/v2/creator/scaffold=sampled:10``.
+
+    Args:
+        value: The command line value.
+
+    Returns:
+        The route, ``*`` for all routes, and the rate at which responses are
+        validated: 1 for every response, N for one in N and 0 for none.
+
+    Raises:
+        argparse.ArgumentTypeError: If the mode is not valid.
+    """
+    route, _, mode = value.rpartition("=")
+    route = route or "*"
+    if mode == "strict":
+        return route, 1
+    if mode == "off":
+        return route, 0
+    kind, _, rate = mode.partition(":")
+    if kind == "sampled" and rate.isdigit() and int(rate) > 0:
+        return route, int(rate)
+    msg = f"invalid mode '{mode}', expected strict, off or sampled:N"
+    raise argparse.ArgumentTypeError(msg)
+
+
+def admission(value: str) -> tuple[str, tuple[int, int] | None]:
+    """Parse an admission budget, optionally scoped to a route.
+
+    Accepted budgets are ``LIMIT:QUEUE`` and ``off``, e.g.
+    ``/v2/creator/ee_project=2:4``.
+
+    Args:
+        value: The command line value.
+
+    Returns:
+        The route, ``*`` for the scaffold routes, and the number of requests
+        running at once and waiting, or None to admit every request.
+
+    Raises:
+        argparse.ArgumentTypeError: If the budget is not valid.
+    """
+    route, _, limits = value.rpartition("=")
+    route = route or "*"
+    if limits == "off":
+        return route, None
+    limit, _, queue = limits.partition(":")
+    if limit.isdigit() and queue.isdigit() and int(limit) > 0:
+        return route, (int(limit), int(queue))
+    msg = f"invalid budget '{limits}', expected LIMIT:QUEUE or off"
+    raise argparse.ArgumentTypeError(msg)
+
+
+def bind(value: str) -> str:
+    """Parse a server address.
+
+    Args:
+        value: The command line value, ``HOST:PORT`` or ``unix:PATH``.
+
+    Returns:
+        The address.
+
+    Raises:
+        argparse.ArgumentTypeError: If the address is not valid.
+    """
+    if value.startswith("unix:"):
+        if value.removeprefix("unix:"):
+            return value
+    else:
+        host, _, port = value.rpartition(":")
+        if host and port.isdigit():
+            return value
+    msg = f"invalid address '{value}', expected HOST:PORT or unix:PATH"
+    raise argparse.ArgumentTypeError(msg)
+
+
+def workers(value: str) -> int | str:
+    """Parse the number of server workers.
+
+    Args:
+        value: The command line value, a positive number or ``auto``.
+
+    Returns:
+        The number of workers, or ``auto`` to size the pool from the CPUs and
+        memory available to the server.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not valid.
+    """
+    if value == "auto":
+        return value
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    msg = f"invalid value '{value}', expected a positive number or auto"
+    raise argparse.ArgumentTypeError(msg)
+
+
+def _print_versions(output_format: str) -> None:
+    """Print the included tool versions, to a reader which may go away.
+
+    Args:
+        output_format: Either ``text`` or ``json``.
+    """
+    try:
+        print(version_builder(output_format=output_format))  # noqa: T201
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader is gone, e.g. head, stdout is flushed again at exit
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+
+
 def parse() -> argparse.Namespace:
     """Parse the command line arguments.
 
@@ -18,18 +135,25 @@ def parse() -> argparse.Namespace:
         formatter_class=argparse.RawTextHelpFormatter,
     )
 
+    # The versions are only resolved when requested, see below
     parser.add_argument(
         "--version",
-        action="version",
-        version=version_builder(),
+        action="store_true",
+        default=False,
         help="Print the included tool versions and exit.",
     )
 
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=["text", "json"],
+        help="The output format used with --version. (default: text)",
+    )
+
     subparsers = parser.add_subparsers(
         help="The subcommand to invoke.",
         title="Commands",
         dest="subcommand",
-        required=True,
     )
 
     server_command_parser = subparsers.add_parser(
@@ -44,7 +168,247 @@ def parse() -> argparse.Namespace:
         "--port",
         "-p",
         default="8000",
-        help="Specify the port for the Ansible Devtools server.",
+        help=(
+            "Specify the port for the Ansible Devtools server, 0 for a free port picked by"
+            " the system. Ignored for the sockets passed by systemd socket activation."
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--bind",
+        action="append",
+        type=bind,
+        metavar="ADDRESS",
+        help=(
+            "Listen on this address instead of --port on all interfaces, HOST:PORT or"
+            " unix:PATH for a unix socket only its owner can connect to. Can be repeated."
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--idle-timeout",
+        type=int,
+        default=0,
+        metavar="SECONDS",
+        help=(
+            "Stop the server once no request or job ran for this many seconds, e.g. to"
+            " be started again by systemd socket activation. (default: 0, never)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--ready-fd",
+        type=int,
+        metavar="FD",
+        help=(
+            "Write the server address, e.g. http://0.0.0.0:8000, and a newline to this"
+            " inherited file descriptor once the first worker accepts connections."
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--response-validation",
+        action="append",
+        type=response_validation,
+        metavar="[ROUTE=]MODE",
+        help=(
+            "Response validation mode: strict, off or sampled:N to validate one in N"
+            " responses. Prefix with a route, e.g. /v2/creator/scaffold=off, to"
+            " only apply it to that route. Can be repeated. (default: strict)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--admission",
+        action="append",
+        type=admission,
+        metavar="[ROUTE=]LIMIT:QUEUE",
+        help=(
+            "The scaffolds the server runs at once and the number waiting, beyond which"
+            " requests are rejected with a 429, or off. Prefix with a route, e.g."
+            " /metadata=8:16, to give that route a budget of its own. Can be repeated."
+            " A threaded worker always keeps a thread for the other routes."
+            " (default: the creator processes of the workers for both, kept below the"
+            " threads of the server)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--workers",
+        type=workers,
+        default=1,
+        help=(
+            "The number of worker processes, or auto to size the pool from the CPU"
+            " quota and memory limit of the container. (default: 1)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help=(
+            "The number of threads per worker, used by the gthread worker. With the"
+            " asgi worker, the number of creator requests a worker runs at once,"
+            " other requests are served on its event loop. (default: 1)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--worker-class",
+        choices=["sync", "gthread", "asgi"],
+        default="sync",
+        help="The gunicorn worker type. (default: sync)",
+    )
+
+    server_command_parser.add_argument(
+        "--timeout",
+        type=int,
+        default=30,
+        help="Seconds before a silent worker is killed and restarted. (default: 30)",
+    )
+
+    server_command_parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=30,
+        help="Seconds workers get to finish requests on restart. (default: 30)",
+    )
+
+    server_command_parser.add_argument(
+        "--backlog",
+        type=int,
+        default=2048,
+        help="The maximum number of pending connections. (default: 2048)",
+    )
+
+    server_command_parser.add_argument(
+        "--preload",
+        action="store_true",
+        default=False,
+        help=(
+            "Load the application once in the master process and share it"
+            " copy-on-write with the workers."
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--cache-dir",
+        help=(
+            "Cache the scaffold archives in this directory, shared by the workers."
+            " (default: no cache)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=512,
+        help="The maximum size of the scaffold cache in MiB. (default: 512)",
+    )
+
+    server_command_parser.add_argument(
+        "--cache-max-age",
+        type=int,
+        default=86400,
+        help="The maximum age of a cached scaffold in seconds. (default: 86400)",
+    )
+
+    server_command_parser.add_argument(
+        "--compression-level",
+        type=int,
+        choices=range(1, 23),
+        metavar="{1-22}",
+        default=6,
+        help=(
+            "The level of archives compressed for clients accepting gzip, zstd or zip,"
+            " capped at 9 for gzip and zip. (default: 6)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--compression-threads",
+        type=int,
+        choices=range(1, 65),
+        metavar="{1-64}",
+        default=2,
+        help="The number of threads compressing a gzip or zstd archive. (default: 2)",
+    )
+
+    server_command_parser.add_argument(
+        "--creator-processes",
+        type=int,
+        choices=range(1, 65),
+        metavar="{1-64}",
+        default=2,
+        help=(
+            "The number of pre-warmed processes running the ansible-creator commands,"
+            " per worker. (default: 2)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--creator-max-tasks",
+        type=int,
+        default=100,
+        help=(
+            "The number of commands a creator process runs before it is replaced,"
+            " 0 for no limit. (default: 100)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--creator-memory-limit",
+        type=int,
+        default=0,
+        help="The memory limit of a creator process in MiB, 0 for no limit. (default: 0)",
+    )
+
+    server_command_parser.add_argument(
+        "--jobs-dir",
+        help=(
+            "Enable the job API, with its queue in this directory, shared by the servers"
+            " on the host. (default: no job API)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--jobs-max-depth",
+        type=int,
+        default=64,
+        help="The maximum number of pending jobs. (default: 64)",
+    )
+
+    server_command_parser.add_argument(
+        "--jobs-retention",
+        type=int,
+        default=3600,
+        help="How long finished jobs and their archives are kept in seconds. (default: 3600)",
+    )
+
+    server_command_parser.add_argument(
+        "--metadata-refresh",
+        action="store_true",
+        default=False,
+        help=(
+            "Rebuild the /metadata response once distributions are installed or removed,"
+            " instead of keeping the one built at startup."
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--metrics-dir",
+        help=(
+            "The directory the workers write their metrics to, the files of exited"
+            " processes are removed at startup. (default: a temporary directory)"
+        ),
+    )
+
+    server_command_parser.add_argument(
+        "--timing-log",
+        action="store_true",
+        default=False,
+        help=("Log the phase timings of each request to stderr as JSON, also enabled by --debug."),
     )
 
     server_command_parser.add_argument(
@@ -55,4 +419,14 @@ def parse() -> argparse.Namespace:
         help="Run Ansible Devtools server with debug logging enabled.",
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    # Global options are not passed on to the subcommand
+    output_format = vars(args).pop("output_format")
+    if vars(args).pop("version"):
+        _print_versions(output_format or "text")
+        parser.exit()
+    if output_format is not None:
+        parser.error("argument --format: only valid with --version")
+    if args.subcommand is None:
+        parser.error("the following arguments are required: subcommand")
+    return args
@@ -0,0 +1,357 @@
+"""Admission control, sheds the requests a route has no budget left for."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import multiprocessing
+import time
+
+from typing import TYPE_CHECKING, Any
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from ansible_dev_tools.resources.server.metrics import ADMISSION_REJECTED, metrics, record_phase
+from ansible_dev_tools.resources.server.worker_counts import WorkerCounts
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from django.http import HttpRequest
+    from django.http.response import HttpResponseBase
+
+
+# The seconds a rejected client is asked to wait, scaffolds take about as long
+RETRY_AFTER = 1
+
+# The routes sharing the default ``*`` budget, the others are only admitted
+# against a budget of their own
+SCAFFOLD_ROUTES = frozenset(
+    (
+        "/v1/creator/playbook",
+        "/v1/creator/collection",
+        "/v2/creator/playbook",
+        "/v2/creator/collection",
+        "/v2/creator/devfile",
+        "/v2/creator/ee_project",
+        "/v2/creator/scaffold",
+        "/v2/creator/batch",
+    ),
+)
+
+
+# The routes never limited, so probes and scrapes answer while scaffolds queue
+EXEMPT_ROUTES = frozenset(("/healthz", "/readyz", "/metrics"))
+
+# How often a request waiting on the event loop looks for a released slot
+ASYNC_POLL_INTERVAL = 0.005
+
+# The counts of a budget kept for each worker
+RUNNING = 0
+WAITING = 1
+
+
+class Budget:
+    """A concurrency limit with a bounded wait queue, shared by the workers.
+
+    The counts live in shared memory, created in the master before it forks
+    the workers, so the limit and the queue apply to the whole server. A
+    released slot goes to a waiting request before one arriving meanwhile.
+    A worker can also be capped to ``per_worker`` requests of the budget,
+    running or waiting, so a thread is always left for the other routes.
+    The master drops the counts of a worker which exited, see ``forget``.
+    """
+
+    def __init__(self, limit: int, queue: int, per_worker: int = 0) -> None:
+        """Initialize the budget.
+
+        Args:
+            limit: The number of requests running at once.
+            queue: The number of requests waiting for a slot.
+            per_worker: The number of requests in a worker, 0 for no cap.
+        """
+        self.limit = limit
+        self.queue = queue
+        self.per_worker = per_worker
+        self._condition = multiprocessing.Condition()
+        self._counts = WorkerCounts(columns=2)
+
+    def _enter(self) -> bool | None:
+        """Take a slot, or queue for one, with the lock held.
+
+        Returns:
+            True with a slot, False when queued, None when the queue or the
+            worker is full.
+        """
+        if self.per_worker and sum(self._counts.get()) >= self.per_worker:
+            return None
+        waiting = self._counts.total(WAITING)
+        if self._counts.total(RUNNING) < self.limit and not waiting:
+            self._counts.add(1, RUNNING)
+            return True
+        if waiting >= self.queue:
+            return None
+        self._counts.add(1, WAITING)
+        return False
+
+    def _take(self) -> bool:
+        """Take a released slot for a waiting request, with the lock held.
+
+        Returns:
+            Whether a slot was taken.
+        """
+        if self._counts.total(RUNNING) >= self.limit:
+            return False
+        self._counts.add(-1, WAITING)
+        self._counts.add(1, RUNNING)
+        return True
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting for one if needed.
+
+        Returns:
+            True with a slot, False when the queue is full.
+        """
+        with self._condition:
+            entered = self._enter()
+            if entered is None:
+                return False
+            if not entered:
+                self._condition.wait_for(self._take)
+        return True
+
+    async def acquire_async(self) -> bool:
+        """Take a slot, waiting for one on the event loop if needed.
+
+        Returns:
+            True with a slot, False when the queue is full.
+
+        Raises:
+            asyncio.CancelledError: If the request is cancelled while waiting.
+        """
+        with self._condition:
+            entered = self._enter()
+        if entered is None:
+            return False
+        try:
+            while not entered:
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+                with self._condition:
+                    entered = self._take()
+        except asyncio.CancelledError:
+            # The client went away, leave the queue
+            with self._condition:
+                self._counts.add(-1, WAITING)
+            raise
+        return True
+
+    def release(self) -> None:
+        """Free the slot, for the waiting requests of every worker."""
+        with self._condition:
+            self._counts.add(-1, RUNNING)
+            self._condition.notify_all()
+
+    def counts(self) -> tuple[int, int]:
+        """Return the requests of the server running and waiting.
+
+        Returns:
+            The number of running and waiting requests.
+        """
+        with self._condition:
+            return self._counts.total(RUNNING), self._counts.total(WAITING)
+
+    def forget(self, pid: int) -> None:
+        """Free the slots and the queue places of a worker which exited.
+
+        Args:
+            pid: The process id of the worker.
+        """
+        with self._condition:
+            if self._counts.forget(pid):
+                self._condition.notify_all()
+
+
+def default_budget(
+    workers: int,
+    threads: int,
+    creator_processes: int,
+    *,
+    event_loop: bool,
+) -> tuple[int, int]:
+    """Size the budget shared by the scaffold routes of a server.
+
+    As many scaffolds run as there are creator processes, and as many more
+    wait. With workers serving a request per thread, the scaffolds running
+    or waiting are kept below the threads of the server, so one is always
+    left for the other routes.
+
+    Args:
+        workers: The number of workers.
+        threads: The number of threads of each worker.
+        creator_processes: The number of creator processes of each worker.
+        event_loop: Whether the other routes are served on an event loop.
+
+    Returns:
+        The limit and the queue length.
+    """
+    limit = creator_processes * workers
+    if event_loop:
+        return limit, limit
+    spare = workers * threads - 1
+    limit = max(1, min(limit, spare))
+    return limit, max(0, min(limit, spare - limit))
+
+
+def budget(route: str) -> Budget | None:
+    """Return the budget of a route.
+
+    The ``ADT_ADMISSION`` setting maps a route, or ``*`` for the scaffold
+    routes without one, to its concurrency ``limit`` and ``queue`` length
+    over the whole server, or to None to admit every request. The scaffold
+    routes share the ``*`` budget, so cheap routes such as ``/metadata`` are
+    never queued behind them, and the probes and metrics are never limited.
+    The ``ADT_ADMISSION_PER_WORKER`` setting caps the requests of a budget
+    in a worker.
+
+    Args:
+        route: The request path.
+
+    Returns:
+        The budget, or None if the route is not limited.
+    """
+    if route in EXEMPT_ROUTES:
+        return None
+    if route in getattr(settings, "ADT_ADMISSION", {}):
+        return configured_budget(route)
+    if route in SCAFFOLD_ROUTES:
+        return configured_budget("*")
+    return None
+
+
+@functools.cache
+def configured_budget(key: str) -> Budget | None:
+    """Build the budget of a route, or the shared one, once per process.
+
+    Args:
+        key: The route, or ``*`` for the budget shared by the scaffold routes.
+
+    Returns:
+        The budget, or None if the requests are not limited.
+    """
+    limits: tuple[int, int] | None = getattr(settings, "ADT_ADMISSION", {}).get(key)
+    per_worker: int = getattr(settings, "ADT_ADMISSION_PER_WORKER", 0)
+    return Budget(*limits, per_worker=per_worker) if limits else None
+
+
+def share_budgets() -> list[Budget]:
+    """Build the configured budgets in the master, before it forks the workers.
+
+    Returns:
+        The budgets, shared by the workers forked from now on.
+    """
+    keys = getattr(settings, "ADT_ADMISSION", {})
+    return [limit for key in keys if (limit := configured_budget(key)) is not None]
+
+
+def _rejected(route: str) -> JsonResponse:
+    """Build the response of a request rejected for lack of budget.
+
+    Args:
+        route: The request path.
+
+    Returns:
+        The 429 error response.
+    """
+    store = metrics()
+    if store is not None:
+        store.inc(ADMISSION_REJECTED, route=route)
+    response = JsonResponse(
+        {"code": 429, "message": f"Too many requests for {route}, retry later"},
+        status=429,
+    )
+    response["Retry-After"] = str(RETRY_AFTER)
+    return response
+
+
+class AdmissionMiddleware:
+    """Admit the requests of a route while its budget allows it.
+
+    A request waits while the route runs ``limit`` requests, and is rejected
+    with a 429 and ``Retry-After`` at once when ``queue`` requests are already
+    waiting. The wait is reported as the ``queue`` phase of the request.
+
+    Attributes:
+        sync_capable: The middleware serves WSGI requests.
+        async_capable: The middleware serves ASGI requests without a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self,
+        get_response: Callable[[HttpRequest], Any],
+    ) -> None:
+        """Initialize the middleware.
+
+        Args:
+            get_response: The next middleware or the view.
+        """
+        self.get_response = get_response
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(
+        self,
+        request: HttpRequest,
+    ) -> HttpResponseBase | Coroutine[Any, Any, HttpResponseBase]:
+        """Process a request.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            The response, or a coroutine returning it under ASGI.
+        """
+        if self._async:
+            return self._acall(request)
+        limit = budget(request.path)
+        if limit is None:
+            response: HttpResponseBase = self.get_response(request)
+            return response
+        start = time.perf_counter()
+        if not limit.acquire():
+            return _rejected(request.path)
+        record_phase(request, "queue", time.perf_counter() - start)
+        try:
+            response = self.get_response(request)
+        finally:
+            limit.release()
+        return response
+
+    async def _acall(self, request: HttpRequest) -> HttpResponseBase:
+        """Process a request under ASGI.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            The response.
+        """
+        limit = budget(request.path)
+        if limit is None:
+            response: HttpResponseBase = await self.get_response(request)
+            return response
+        start = time.perf_counter()
+        if not await limit.acquire_async():
+            return _rejected(request.path)
+        record_phase(request, "queue", time.perf_counter() - start)
+        try:
+            response = await self.get_response(request)
+        finally:
+            limit.release()
+        return response
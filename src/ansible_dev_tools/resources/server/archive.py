@@ -0,0 +1,581 @@
+"""Canonical archives of scaffolded directories."""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import hashlib
+import io
+import stat
+import struct
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.http import FileResponse
+
+from ansible_dev_tools.resources.server.metrics import ARCHIVE_SIZE, observe
+from ansible_dev_tools.server_utils import parse_accept
+
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    HAS_ZSTD = False
+else:
+    HAS_ZSTD = True
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from concurrent.futures import Future
+    from pathlib import Path
+    from typing import BinaryIO
+
+    from django.http import HttpRequest
+
+
+CHUNK_SIZE = 64 * 1024
+
+# The date of every archive member, zip archives clamp it to 1980
+ARCHIVE_MTIME = 0
+
+TAR = "application/tar"
+TAR_GZIP = "application/tar+gzip"
+TAR_ZSTD = "application/tar+zstd"
+ZIP = "application/zip"
+
+SUFFIXES = {TAR: ".tar", TAR_GZIP: ".tar.gz", TAR_ZSTD: ".tar.zst", ZIP: ".zip"}
+
+# Compressed in parallel, each block is primed with the end of the previous one
+GZIP_BLOCK_SIZE = 128 * 1024
+GZIP_WINDOW = 32 * 1024
+# Magic, deflate, no flags, no mtime, no extra flags, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+# The earliest date a zip entry can hold
+ZIP_EPOCH = 315532800
+
+
+def _entries(path: Path, arcname: str) -> Iterator[tuple[Path, str]]:
+    """Walk a directory in the order ``TarFile.add`` adds it.
+
+    Args:
+        path: The file or directory.
+        arcname: Its name in the archive.
+
+    Yields:
+        tuple[Path, str]: The path and archive name of each entry, symlinks are not followed.
+    """
+    yield path, arcname
+    if path.is_dir() and not path.is_symlink():
+        for child in sorted(path.iterdir()):
+            yield from _entries(child, f"{arcname}/{child.name}")
+
+
+def _normalize(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    """Drop the metadata that differs between two identical scaffolds.
+
+    Args:
+        info: The member read from the filesystem.
+
+    Returns:
+        The member with a fixed date and owner, and a mode only keeping
+        whether the file is executable.
+    """
+    info.mtime = ARCHIVE_MTIME
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    if info.issym():
+        info.mode = 0o777
+    elif info.isdir() or info.mode & stat.S_IXUSR:
+        info.mode = 0o755
+    else:
+        info.mode = 0o644
+    return info
+
+
+def iter_tar(directory: Path) -> Iterator[bytes]:
+    """Generate the canonical tar archive of a directory as its files are read.
+
+    The archive holds the same entries as ``tar.add(directory, arcname=".")``
+    but is produced in chunks of at most ``CHUNK_SIZE`` bytes, so it is
+    never held in memory as a whole. Entries are
+    sorted by name and normalized, so identical directories produce the same
+    bytes whenever and by whomever they are created. PAX headers are only
+    added for names the ustar format cannot hold.
+
+    Args:
+        directory: The directory to archive.
+
+    Yields:
+        bytes: The archive, header and data blocks as they are produced.
+    """
+    # The archive is only used to build the headers, hard links included
+    tar = tarfile.TarFile(fileobj=io.BytesIO(), mode="w", format=tarfile.PAX_FORMAT)
+    size = 0
+    for path, arcname in _entries(directory, "."):
+        info = _normalize(tar.gettarinfo(str(path), arcname))
+        header = info.tobuf(tar.format, tar.encoding, tar.errors)
+        size += len(header)
+        yield header
+        if not info.isreg():
+            continue
+        with path.open("rb") as file:
+            while chunk := file.read(CHUNK_SIZE):
+                size += len(chunk)
+                yield chunk
+        if remainder := info.size % tarfile.BLOCKSIZE:
+            padding = tarfile.BLOCKSIZE - remainder
+            size += padding
+            yield tarfile.NUL * padding
+    # The end of archive marker, then padding to a full record
+    end = tarfile.BLOCKSIZE * 2
+    end += -(size + end) % tarfile.RECORDSIZE
+    yield tarfile.NUL * end
+
+
+@dataclass(frozen=True)
+class ArchiveFormat:
+    """The archive format negotiated with a client.
+
+    Attributes:
+        media_type: The Content-Type of the response.
+        compression: The ``gzip``, ``zstd`` or ``zip`` compression, None for a plain tar.
+        content_encoding: Whether the compression is the Content-Encoding of a plain tar.
+    """
+
+    media_type: str
+    compression: str | None = None
+    content_encoding: bool = False
+
+
+def negotiate(request: HttpRequest) -> ArchiveFormat:
+    """Select the archive format from the Accept and Accept-Encoding headers.
+
+    A compressed media type explicitly accepted by the client wins over the
+    plain tar, the smallest one on a tie. The plain tar is served otherwise,
+    including to clients that do not accept any of the archive media types,
+    compressed with the best Accept-Encoding the client supports.
+
+    Args:
+        request: The request.
+
+    Returns:
+        The archive format.
+    """
+    accept = parse_accept(request.headers.get("Accept", ""))
+    tar_quality = accept.get(TAR, accept.get("application/*", accept.get("*/*", 0)))
+    offered = [TAR_ZSTD, TAR_GZIP, ZIP] if HAS_ZSTD else [TAR_GZIP, ZIP]
+    media_type = max(offered, key=lambda offer: accept.get(offer, 0))
+    if accept.get(media_type, 0) > 0 and accept[media_type] >= tar_quality:
+        compression = {TAR_ZSTD: "zstd", TAR_GZIP: "gzip", ZIP: "zip"}[media_type]
+        return ArchiveFormat(media_type, compression)
+    encodings = parse_accept(request.headers.get("Accept-Encoding", ""))
+    offered = ["zstd", "gzip"] if HAS_ZSTD else ["gzip"]
+    encoding = max(offered, key=lambda offer: encodings.get(offer, 0))
+    if encodings.get(encoding, 0) > 0:
+        return ArchiveFormat(TAR, encoding, content_encoding=True)
+    return ArchiveFormat(TAR)
+
+
+def _blocks(chunks: Iterator[bytes], size: int) -> Iterator[bytes]:
+    """Regroup chunks into blocks of a fixed size.
+
+    Args:
+        chunks: The chunks.
+        size: The block size, only the last block may be shorter.
+
+    Yields:
+        bytes: The blocks.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _deflate(block: bytes, level: int, window: bytes) -> bytes:
+    """Compress a block to raw deflate data ending on a byte boundary.
+
+    Args:
+        block: The data to compress.
+        level: The compression level.
+        window: The data preceding the block, used as the dictionary.
+
+    Returns:
+        The compressed block, which can be concatenated with the others.
+    """
+    compressor = (
+        zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=window)
+        if window
+        else zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    )
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+@functools.cache
+def _compression_executor(threads: int) -> ThreadPoolExecutor:
+    """Return the thread pool shared by the gzip compressions of this worker.
+
+    Args:
+        threads: The number of threads.
+
+    Returns:
+        The thread pool.
+    """
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix="adt-compress")
+
+
+def gzip_chunks(chunks: Iterator[bytes], level: int, threads: int) -> Iterator[bytes]:
+    """Compress chunks to a gzip stream, using several threads.
+
+    As pigz does, the data is split in blocks compressed independently with
+    the previous 32 KiB as the dictionary, so the ratio stays close to a
+    single stream. The blocks are compressed in parallel and written in
+    order, with at most one block per thread waiting for a compression.
+
+    Args:
+        chunks: The data to compress.
+        level: The compression level, from 0 to 9.
+        threads: The number of threads compressing blocks.
+
+    Yields:
+        bytes: The gzip stream.
+    """
+    yield GZIP_HEADER
+    crc = size = 0
+    window = b""
+    pending: deque[Future[bytes]] = deque()
+    executor = _compression_executor(threads) if threads > 1 else None
+    for block in _blocks(chunks, GZIP_BLOCK_SIZE):
+        crc = zlib.crc32(block, crc)
+        size += len(block)
+        if executor is None:
+            yield _deflate(block, level, window)
+        else:
+            pending.append(executor.submit(_deflate, block, level, window))
+            while len(pending) > threads:
+                yield pending.popleft().result()
+        window = block[-GZIP_WINDOW:]
+    while pending:
+        yield pending.popleft().result()
+    # An empty final block, then the checksum and size of the data
+    yield zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS).flush()
+    yield struct.pack("<II", crc, size & 0xFFFFFFFF)
+
+
+def zstd_chunks(chunks: Iterator[bytes], level: int, threads: int) -> Iterator[bytes]:
+    """Compress chunks to a zstd frame, using several threads.
+
+    Args:
+        chunks: The data to compress.
+        level: The compression level, from 1 to 22.
+        threads: The number of threads used by the compressor.
+
+    Yields:
+        bytes: The zstd frame.
+    """
+    # A single thread is zstd's default blocking mode, more start workers
+    compressor = zstandard.ZstdCompressor(
+        level=level,
+        threads=threads if threads > 1 else 0,
+    ).compressobj()
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read chunks as a binary stream."""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        """Initialize the reader.
+
+        Args:
+            chunks: The chunks to read.
+        """
+        self._chunks = chunks
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        """Return whether the stream is readable.
+
+        Returns:
+            True.
+        """
+        return True
+
+    def readinto(self, buffer: Any) -> int:  # noqa: ANN401
+        """Read the next bytes into a buffer.
+
+        Args:
+            buffer: The writable buffer.
+
+        Returns:
+            The number of bytes read, zero at the end of the chunks.
+        """
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class _Sink(io.RawIOBase):
+    """Collect the bytes written until they are drained."""
+
+    def __init__(self) -> None:
+        """Initialize the sink."""
+        self._data = bytearray()
+
+    def writable(self) -> bool:
+        """Return whether the stream is writable.
+
+        Returns:
+            True.
+        """
+        return True
+
+    def write(self, data: Any) -> int:  # noqa: ANN401
+        """Collect bytes.
+
+        Args:
+            data: The bytes written.
+
+        Returns:
+            The number of bytes written.
+        """
+        self._data += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Return and forget the bytes written so far.
+
+        Returns:
+            The bytes written since the last drain.
+        """
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+
+def _zip_info(member: tarfile.TarInfo) -> zipfile.ZipInfo:
+    """Build the zip entry of a tar member.
+
+    Args:
+        member: The tar member.
+
+    Returns:
+        The zip entry, with the member's name, date and mode.
+    """
+    name = member.name.removeprefix("./")
+    date_time = time.gmtime(max(member.mtime, ZIP_EPOCH))[:6]
+    info = zipfile.ZipInfo(f"{name}/" if member.isdir() else name, date_time)
+    file_type = stat.S_IFDIR if member.isdir() else stat.S_IFLNK if member.issym() else stat.S_IFREG
+    info.external_attr = (file_type | member.mode) << 16
+    if member.isdir():
+        # The MS-DOS directory attribute
+        info.external_attr |= 0x10
+    return info
+
+
+def zip_chunks(chunks: Iterator[bytes], level: int) -> Iterator[bytes]:
+    """Convert a tar stream to a zip archive, as both are streamed.
+
+    Directories, regular files and symlinks are kept, symlinks as entries
+    holding their target as Info-ZIP does. Zip dates cannot be older than
+    1980, older ones are clamped.
+
+    Args:
+        chunks: The tar archive.
+        level: The deflate compression level, from 0 to 9.
+
+    Yields:
+        bytes: The zip archive.
+    """
+    sink = _Sink()
+    with (
+        tarfile.open(fileobj=_ChunkReader(chunks), mode="r|") as tar,
+        zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as archive,
+    ):
+        for member in tar:
+            if member.name in {".", "./"}:
+                continue
+            info = _zip_info(member)
+            if member.isdir():
+                archive.writestr(info, b"")
+            elif member.issym():
+                archive.writestr(info, member.linkname)
+            elif member.isreg():
+                source = tar.extractfile(member)
+                if source is None:  # pragma: no cover
+                    continue
+                with source, archive.open(info, "w") as target:
+                    while chunk := source.read(CHUNK_SIZE):
+                        target.write(chunk)
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def compress(chunks: Iterator[bytes], archive_format: ArchiveFormat) -> Iterator[bytes]:
+    """Compress a tar stream to the negotiated format.
+
+    The ``ADT_COMPRESSION`` setting holds the compression ``level`` and the
+    number of ``threads`` compressing gzip and zstd streams. Gzip and zip
+    levels are capped at 9.
+
+    Args:
+        chunks: The tar archive.
+        archive_format: The negotiated format.
+
+    Returns:
+        The archive in the negotiated format.
+    """
+    config: dict[str, int] = getattr(settings, "ADT_COMPRESSION", {})
+    level = config.get("level", 6)
+    threads = config.get("threads", 1)
+    if archive_format.compression == "gzip":
+        return gzip_chunks(chunks, min(level, 9), threads)
+    if archive_format.compression == "zstd":
+        return zstd_chunks(chunks, level, threads)
+    if archive_format.compression == "zip":
+        return zip_chunks(chunks, min(level, 9))
+    return chunks
+
+
+def archive_headers(archive_format: ArchiveFormat, name: str, digest: str) -> dict[str, str]:
+    """Build the headers describing an archive download.
+
+    ``X-Archive-SHA256`` holds the digest of the canonical tar archive, the
+    ETag tells its compressed representations apart.
+
+    Args:
+        archive_format: The negotiated format.
+        name: The archive file name suggested to the client, without extension.
+        digest: The SHA-256 of the canonical tar archive, computed by ``write_archive``.
+
+    Returns:
+        The response headers.
+    """
+    filename = f"{name}{SUFFIXES[archive_format.media_type]}"
+    etag = f"{digest}-{archive_format.compression}" if archive_format.compression else digest
+    headers = {
+        "Content-Type": archive_format.media_type,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "ETag": f'"{etag}"',
+        "Vary": "Accept, Accept-Encoding",
+        "X-Archive-SHA256": digest,
+    }
+    if archive_format.content_encoding and archive_format.compression:
+        headers["Content-Encoding"] = archive_format.compression
+    return headers
+
+
+def _hashed(chunks: Iterator[bytes], digest: hashlib._Hash) -> Iterator[bytes]:
+    """Hash chunks as they are read.
+
+    Args:
+        chunks: The chunks.
+        digest: The hash updated with each chunk.
+
+    Yields:
+        bytes: The chunks.
+    """
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def write_archive(
+    file: BinaryIO,
+    tar: Iterator[bytes],
+    archive_format: ArchiveFormat,
+    name: str,
+) -> dict[str, str]:
+    """Write a tar archive to a file, in the negotiated format.
+
+    The SHA-256 of the tar archive is computed while it is written, the file
+    is left at its start, ready to be sent.
+
+    Args:
+        file: The file to write, opened for reading and writing.
+        tar: The canonical tar archive, see ``iter_tar``.
+        archive_format: The negotiated format.
+        name: The archive file name suggested to the client, without extension.
+
+    Returns:
+        The response headers of the archive, see ``archive_headers``.
+    """
+    digest = hashlib.sha256()
+    file.writelines(compress(_hashed(tar, digest), archive_format))
+    file.flush()
+    observe(ARCHIVE_SIZE, file.tell(), compression=archive_format.compression or "none")
+    file.seek(0)
+    return archive_headers(archive_format, name, digest.hexdigest())
+
+
+def temporary_archive(
+    tar: Iterator[bytes],
+    archive_format: ArchiveFormat,
+    name: str,
+) -> tuple[BinaryIO, dict[str, str]]:
+    """Write a tar archive to an anonymous temporary file, in the negotiated format.
+
+    The file has no name on disk, so the scaffolded directory can be removed
+    right away and the archive is freed when its descriptor is closed.
+
+    Args:
+        tar: The canonical tar archive, see ``iter_tar``.
+        archive_format: The negotiated format.
+        name: The archive file name suggested to the client, without extension.
+
+    Returns:
+        The archive file and its response headers.
+    """
+    with contextlib.ExitStack() as stack:
+        file = stack.enter_context(tempfile.TemporaryFile())
+        headers = write_archive(file, tar, archive_format, name)
+        # Owned by the response from now on
+        stack.pop_all()
+    return file, headers
+
+
+def archive_response(file: BinaryIO, headers: dict[str, str], status: int = 201) -> FileResponse:
+    """Create the response sending an archive file.
+
+    The response owns the file descriptor and closes it once the response
+    is closed. Under WSGI, Django hands the file to ``wsgi.file_wrapper``
+    so gunicorn sends it with ``sendfile`` from the kernel page cache,
+    without copying it through the worker.
+
+    Args:
+        file: The archive, at its start.
+        headers: The response headers, see ``archive_headers``.
+        status: The response status, 201 for a scaffold just created.
+
+    Returns:
+        The file response.
+    """
+    response = FileResponse(file, content_type=headers["Content-Type"], status=status)
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,23 @@
+"""URL configuration of the ASGI server."""
+
+from __future__ import annotations
+
+from django.urls import URLPattern
+
+from ansible_dev_tools.server_utils import async_view
+from ansible_dev_tools.subcommands.server import urlpatterns as wsgi_urlpatterns
+
+
+# Cheap views served on the event loop, the others run in the creator executor
+EVENT_LOOP_ROUTES = frozenset(
+    ("metadata", "healthz", "readyz", "v2/creator/capabilities", "v2/creator/schema"),
+)
+
+urlpatterns = tuple(
+    URLPattern(
+        pattern.pattern,
+        async_view(pattern.callback, blocking=str(pattern.pattern) not in EVENT_LOOP_ROUTES),
+        name=pattern.name,
+    )
+    for pattern in wsgi_urlpatterns
+)
@@ -0,0 +1,209 @@
+"""The creator backends, run in the creator process pool.
+
+The pool processes import this module to unpickle a backend, it only
+imports ansible-creator so they do not load Django and the OpenAPI document.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from ansible_creator._version import version as creator_version
+from ansible_creator.config import Config
+from ansible_creator.output import Output
+from ansible_creator.subcommands.add import Add
+from ansible_creator.subcommands.init import Init
+from ansible_creator.utils import TermFeatures
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class CreatorOutput(Output):
+    """The creator output."""
+
+    def __init__(self, log_file: str) -> None:
+        """Initialize the creator output.
+
+        Convenience class to consistently define output with a changing temporary directory.
+
+        Args:
+            log_file: The log file path.
+        """
+        super().__init__(
+            log_file=log_file,
+            log_level="DEBUG",
+            log_append="false",
+            term_features=TermFeatures(color=False, links=False),
+            verbosity=1,
+        )
+
+
+class CreatorBackendV1:
+    """The creator wrapper of the v1 API, handles interaction with the python creator project."""
+
+    def __init__(self, tmp_dir: Path) -> None:
+        """Initialize the creator.
+
+        Args:
+            tmp_dir: The temporary directory.
+        """
+        self.tmp_dir = tmp_dir
+
+    def collection(self, collection: str, project: str) -> Path:
+        """Scaffold a collection.
+
+        Args:
+            collection: The collection name.
+            project: The project type.
+
+        Returns:
+            The scaffolded directory.
+        """
+        init_path = self.tmp_dir / collection
+        config = Config(
+            creator_version=creator_version,
+            init_path=str(init_path),
+            output=CreatorOutput(log_file=str(self.tmp_dir / "creator.log")),
+            collection=collection,
+            subcommand="init",
+            project=project,
+        )
+        Init(config).run()
+        return init_path
+
+    def playbook(
+        self,
+        project: str,
+        scm_org: str,
+        scm_project: str,
+    ) -> Path:
+        """Scaffold a playbook project.
+
+        Args:
+            project: The project type.
+            scm_org: The SCM organization.
+            scm_project: The SCM project.
+
+        Returns:
+            The scaffolded directory.
+        """
+        init_path = self.tmp_dir / f"{scm_org}-{scm_project}"
+        config = Config(
+            creator_version=creator_version,
+            init_path=str(init_path),
+            output=CreatorOutput(log_file=str(self.tmp_dir / "creator.log")),
+            project=project,
+            namespace=scm_org,
+            collection_name=scm_project,
+            subcommand="init",
+        )
+        Init(config).run()
+        return init_path
+
+
+class CreatorBackendV2:
+    """The creator wrapper of the v2 API, handles interaction with the python creator project."""
+
+    def __init__(self, tmp_dir: Path) -> None:
+        """Initialize the creator.
+
+        Args:
+            tmp_dir: The temporary directory.
+        """
+        self.tmp_dir = tmp_dir
+
+    @property
+    def _creator_output(self) -> CreatorOutput:
+        """Return a CreatorOutput configured for the current temp directory."""
+        return CreatorOutput(log_file=str(self.tmp_dir / "creator.log"))
+
+    def collection(self, collection: str, project: str) -> Path:
+        """Scaffold a collection.
+
+        Args:
+            collection: The collection name.
+            project: The project type.
+
+        Returns:
+            The scaffolded directory.
+        """
+        init_path = self.tmp_dir / collection
+        config = Config(
+            creator_version=creator_version,
+            init_path=str(init_path),
+            output=self._creator_output,
+            collection=collection,
+            subcommand="init",
+            project=project,
+        )
+        Init(config).run()
+        return init_path
+
+    def playbook(
+        self,
+        project: str,
+        namespace: str,
+        collection_name: str,
+    ) -> Path:
+        """Scaffold a playbook project.
+
+        Args:
+            project: The project type.
+            namespace: The collection namespace.
+            collection_name: The collection name.
+
+        Returns:
+            The scaffolded directory.
+        """
+        init_path = self.tmp_dir / f"{namespace}-{collection_name}"
+        config = Config(
+            creator_version=creator_version,
+            init_path=str(init_path),
+            output=self._creator_output,
+            project=project,
+            namespace=namespace,
+            collection_name=collection_name,
+            subcommand="init",
+        )
+        Init(config).run()
+        return init_path
+
+    def devfile(self) -> Path:
+        """Scaffold a devfile.
+
+        Returns:
+            The scaffolded directory.
+        """
+        # Path where the devfile is going to be added
+        add_path = self.tmp_dir / "devfile"
+        add_path.mkdir(parents=True, exist_ok=True)
+
+        config = Config(
+            resource_type="devfile",
+            creator_version=creator_version,
+            path=str(add_path),
+            output=self._creator_output,
+            subcommand="add",
+            overwrite=True,
+        )
+        Add(config).run()
+        return add_path
+
+    def ee_project(self) -> Path:
+        """Scaffold an execution environment project.
+
+        Returns:
+            The scaffolded directory.
+        """
+        init_path = self.tmp_dir / "ee_project"
+        config = Config(
+            creator_version=creator_version,
+            init_path=str(init_path),
+            output=self._creator_output,
+            project="execution_env",
+            subcommand="init",
+        )
+        Init(config).run()
+        return init_path
@@ -4,19 +4,95 @@ from __future__ import annotations
 
 import json
 import shutil
+import tempfile
 
+from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
 from ansible_creator.api import V1
-from django.core.files.storage import FileSystemStorage
-from django.http import FileResponse, HttpRequest, HttpResponse, JsonResponse
-
-from ansible_dev_tools.resources.server.creator_v2 import create_tar_file
-from ansible_dev_tools.server_utils import validate_request, validate_response
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+
+from ansible_dev_tools.resources.server.archive import (
+    SUFFIXES,
+    archive_response,
+    iter_tar,
+    negotiate,
+    temporary_archive,
+)
+from ansible_dev_tools.resources.server.creator_pool import run_scaffold, submit
+from ansible_dev_tools.resources.server.metrics import phase, time_scaffold
+from ansible_dev_tools.resources.server.scaffold_cache import cacheable, scaffold_cache
+from ansible_dev_tools.server_utils import (
+    PrecomputedResponse,
+    parse_accept,
+    validate_request,
+    validate_response,
+)
 
 
 if TYPE_CHECKING:
-    from pathlib import Path
+    from concurrent.futures import Future
+
+    from ansible_creator.api import CreatorResult
+
+
+# The capability tree and command schemas only change with ansible-creator,
+# they are computed once per worker, keyed by command path
+_SCHEMA_RESPONSES: dict[tuple[str, ...], PrecomputedResponse] = {}
+
+NDJSON = "application/x-ndjson"
+
+
+def _accepts_ndjson(request: HttpRequest) -> bool:
+    """Tell whether the client prefers an NDJSON manifest to an archive.
+
+    Args:
+        request: HttpRequest object.
+
+    Returns:
+        True if NDJSON is accepted at least as much as any archive format.
+    """
+    accept = parse_accept(request.headers.get("Accept", ""))
+    quality = accept.get(NDJSON, 0)
+    return quality > 0 and quality >= max(accept.get(media_type, 0) for media_type in SUFFIXES)
+
+
+def _batch_result(
+    index: int,
+    command_path: list[str],
+    future: Future[CreatorResult],
+    staging: Path,
+) -> dict[str, Any]:
+    """Collect the result of a batch item, moving its scaffold to the staging directory.
+
+    Args:
+        index: The position of the item in the batch.
+        command_path: The command segments of the item.
+        future: The running command.
+        staging: The directory holding the scaffolds of the batch.
+
+    Returns:
+        The manifest entry of the item.
+    """
+    entry: dict[str, Any] = {"index": index, "command_path": command_path}
+    try:
+        creator_result = future.result()
+    except Exception as exc:  # noqa: BLE001
+        # Reported in the manifest, the other items are still returned
+        return {**entry, "status": "error", "message": str(exc), "logs": []}
+    entry.update(
+        status=creator_result.status,
+        message=creator_result.message,
+        logs=creator_result.logs,
+    )
+    if creator_result.path is None:  # pragma: no cover
+        return entry
+    if creator_result.status == "success":
+        entry["directory"] = f"{index}-{'_'.join(command_path)}"
+        shutil.move(creator_result.path, staging / entry["directory"])
+    else:  # pragma: no cover
+        shutil.rmtree(creator_result.path, ignore_errors=True)
+    return entry
 
 
 class CreatorDynamic:
@@ -26,44 +102,104 @@ class CreatorDynamic:
     without hardcoding individual project types.
     """
 
-    def _response_from_tar(self, tar_file: Path) -> FileResponse:
-        """Create a FileResponse from a tar file.
+    def capabilities(self, request: HttpRequest) -> JsonResponse | HttpResponse:
+        """Return the full ansible-creator capability tree.
+
+        The response is computed once per worker and served with an ETag,
+        clients sending it back in ``If-None-Match`` get a 304 without body.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            JSON response with the capability schema.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        precomputed = _SCHEMA_RESPONSES.get(())
+        if precomputed is None:
+            api = V1()
+            precomputed = PrecomputedResponse.from_response(JsonResponse(api.schema()))
+            _SCHEMA_RESPONSES[()] = precomputed
+        return precomputed.respond(request)
+
+    def batch(self, request: HttpRequest) -> StreamingHttpResponse | HttpResponse:
+        """Scaffold several ansible-creator projects in parallel.
+
+        Accepts a JSON body with ``items``, each with a ``command_path`` and
+        optional ``params`` as for ``scaffold``. The items run concurrently in
+        the creator process pool. The response is a single archive holding
+        each successful item in an ``<index>-<command>`` directory and the
+        per-item results in ``manifest.ndjson``, or only that manifest when
+        the client accepts ``application/x-ndjson``. Failed items are only
+        reported in the manifest.
 
         Args:
-            tar_file: The tar file path.
+            request: HttpRequest object.
 
         Returns:
-            The file response.
+            Archive or NDJSON manifest, or error response.
         """
-        fs = FileSystemStorage(str(tar_file.parent))
-        response = FileResponse(
-            fs.open(tar_file.name, "rb"),
-            content_type="application/tar",
-            status=201,
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        body: dict[str, Any] = result.body  # type: ignore[assignment]
+        items: list[dict[str, Any]] = body["items"]
+        futures = [
+            time_scaffold(
+                "_".join(item["command_path"]),
+                submit(run_scaffold, item["command_path"], item.get("params", {})),
+            )
+            for item in items
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            staging = Path(tmp_dir) / "batch"
+            staging.mkdir()
+            with phase(request, "scaffold"):
+                manifest = "".join(
+                    json.dumps(_batch_result(index, item["command_path"], future, staging)) + "\n"
+                    for index, (item, future) in enumerate(zip(items, futures, strict=True))
+                )
+            response: StreamingHttpResponse | HttpResponse
+            if _accepts_ndjson(request):
+                response = HttpResponse(manifest, content_type=NDJSON, status=200)
+            else:
+                (staging / "manifest.ndjson").write_text(manifest)
+                # The archive file outlives the scaffolds, the response closes it
+                with phase(request, "archive"):
+                    file, headers = temporary_archive(
+                        iter_tar(staging), negotiate(request), "batch"
+                    )
+                response = archive_response(file, headers)
+
+        return validate_response(
+            request=request,
+            response=response,
         )
-        response["Content-Disposition"] = f'attachment; filename="{tar_file.name}"'
-        return response
 
-    def capabilities(self, request: HttpRequest) -> JsonResponse | HttpResponse:
-        """Return the full ansible-creator capability tree.
+    def cache(self, request: HttpRequest) -> JsonResponse | HttpResponse:
+        """Return the scaffold cache counters and usage.
 
         Args:
             request: HttpRequest object.
 
         Returns:
-            JSON response with the capability schema.
+            JSON response with the cache statistics.
         """
         result = validate_request(request)
         if isinstance(result, HttpResponse):
             return result
-        api = V1()
-        return JsonResponse(api.schema(), status=200)
+        cache = scaffold_cache()
+        stats = cache.stats() if cache else {"hits": 0, "misses": 0, "entries": 0, "size": 0}
+        return JsonResponse({"enabled": cache is not None, **stats}, status=200)
 
     def schema(self, request: HttpRequest) -> JsonResponse | HttpResponse:
         """Return the parameter schema for a specific command path.
 
         The command path is provided via repeated ``command_path`` query
         parameters, e.g. ``?command_path=init&command_path=collection``.
+        Like the capabilities, the schemas are computed once per worker.
 
         Args:
             request: HttpRequest object.
@@ -80,19 +216,27 @@ class CreatorDynamic:
                 "Missing required query parameter: command_path",
                 status=400,
             )
-        try:
-            api = V1()
-            schema_result = api.schema_for(*path_segments)
-        except KeyError as exc:
-            return JsonResponse({"error": str(exc)}, status=400)
-        return JsonResponse(schema_result, status=200)
-
-    def scaffold(self, request: HttpRequest) -> FileResponse | HttpResponse:
+        key = tuple(path_segments)
+        precomputed = _SCHEMA_RESPONSES.get(key)
+        if precomputed is None:
+            try:
+                api = V1()
+                schema_result = api.schema_for(*path_segments)
+            except KeyError as exc:
+                return JsonResponse({"error": str(exc)}, status=400)
+            precomputed = PrecomputedResponse.from_response(JsonResponse(schema_result))
+            _SCHEMA_RESPONSES[key] = precomputed
+        return precomputed.respond(request)
+
+    def scaffold(self, request: HttpRequest) -> StreamingHttpResponse | HttpResponse:
         """Scaffold an ansible-creator project dynamically.
 
         Accepts a JSON body with ``command_path`` (list of strings) and
-        optional ``params`` (dict). Delegates to ``V1().run()`` and returns
-        the scaffolded content as a tar archive.
+        optional ``params`` (dict). Runs ``V1().run()`` in the creator process
+        pool and returns the scaffolded content as an archive, a tar unless
+        the client negotiated a compressed format. Successful scaffolds are
+        stored in the scaffold cache, repeated requests are served from it,
+        unless they hold a devfile whose name is unique to each run.
 
         On success, logs are included in ``X-Creator-Logs`` and
         ``X-Creator-Message`` response headers.
@@ -104,7 +248,7 @@ class CreatorDynamic:
             request: HttpRequest object.
 
         Returns:
-            Tar file response on success, or JSON/HTTP error response.
+            Streamed archive on success, or JSON/HTTP error response.
         """
         result = validate_request(request)
         if isinstance(result, HttpResponse):
@@ -120,8 +264,18 @@ class CreatorDynamic:
                 status=400,
             )
 
-        api = V1()
-        creator_result = api.run(*command_path, **params)
+        archive_format = negotiate(request)
+        cache = scaffold_cache()
+        key = cache.key(request.path, body, archive_format) if cache else ""
+        entry = cache.get(key) if cache else None
+        if entry is not None:
+            return validate_response(request=request, response=entry.response())
+
+        with phase(request, "scaffold"):
+            creator_result = time_scaffold(
+                "_".join(command_path),
+                submit(run_scaffold, command_path, params),
+            ).result()
 
         if creator_result.status == "error":
             # Clean up the temp directory on error
@@ -146,13 +300,24 @@ class CreatorDynamic:
                 status=400,
             )
 
+        name = "_".join(command_path)
+        creator_headers = {
+            "X-Creator-Logs": json.dumps(creator_result.logs),
+            "X-Creator-Message": creator_result.message,
+        }
+        # The archive file outlives the scaffold, the response closes it
         try:
-            tar_name = f"{'_'.join(command_path)}.tar"
-            tar_file = creator_result.path.parent / tar_name
-            create_tar_file(creator_result.path, tar_file)
-            response = self._response_from_tar(tar_file)
-            response["X-Creator-Logs"] = json.dumps(creator_result.logs)
-            response["X-Creator-Message"] = creator_result.message
+            with phase(request, "archive"):
+                if cache and cacheable(creator_result.path):
+                    entry = cache.store(
+                        key, creator_result.path, archive_format, name, creator_headers
+                    )
+                    response = entry.response()
+                else:
+                    file, headers = temporary_archive(
+                        iter_tar(creator_result.path), archive_format, name
+                    )
+                    response = archive_response(file, {**headers, **creator_headers})
         finally:
             shutil.rmtree(creator_result.path, ignore_errors=True)
 
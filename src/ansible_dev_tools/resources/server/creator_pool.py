@@ -0,0 +1,158 @@
+"""The pre-warmed process pool running ansible-creator commands."""
+
+from __future__ import annotations
+
+import functools
+import multiprocessing
+import os
+import resource
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from importlib import resources as importlib_resources
+from typing import TYPE_CHECKING, Any, ParamSpec, TypeVar
+
+from ansible_creator.api import V1
+from django.conf import settings
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from concurrent.futures import Future
+    from pathlib import Path
+
+    from ansible_creator.api import CreatorResult
+
+
+CREATOR_RESOURCES = "ansible_creator.resources"
+# Unpickled by the pool processes, it only imports ansible-creator
+CREATOR_BACKEND = "ansible_dev_tools.resources.server.creator_backend"
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_POOL_LOCK = threading.Lock()
+
+
+@functools.cache
+def template_modules() -> tuple[str, ...]:
+    """List the packages of the ansible-creator project templates.
+
+    Returns:
+        The template packages and the common resource bundles they include.
+    """
+    return tuple(
+        f"{package}.{entry.name}"
+        for package in (CREATOR_RESOURCES, f"{CREATOR_RESOURCES}.common")
+        for entry in importlib_resources.files(package).iterdir()
+        if entry.is_dir() and entry.name != "__pycache__"
+    )
+
+
+def warm_up() -> None:
+    """Load the ansible-creator parser, schema and template packages."""
+    V1().schema()
+    for name in template_modules():
+        import_module(name)
+
+
+def _initialize(memory_limit: int) -> None:
+    """Prepare a pool process before its first command.
+
+    Args:
+        memory_limit: The address space limit of the process in bytes, 0 for none.
+    """
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    warm_up()
+
+
+@functools.cache
+def creator_pool() -> ProcessPoolExecutor:
+    """Return the creator process pool of this worker.
+
+    The ``ADT_CREATOR_POOL`` setting holds the number of ``processes``, the
+    ``max_tasks_per_child`` run by a process before it is replaced and the
+    ``memory_limit`` of each process in bytes. The pool is started on first
+    use, after the workers are forked, from a fork server which has imported
+    ansible-creator, its templates and the creator backends, so the pool
+    processes start warm and do not inherit the threads and sockets of the
+    worker. A command over the memory limit fails with a ``MemoryError``
+    without affecting the others.
+
+    Returns:
+        The process pool.
+    """
+    config: dict[str, int] = getattr(settings, "ADT_CREATOR_POOL", {})
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__, CREATOR_BACKEND, *template_modules()])
+    return ProcessPoolExecutor(
+        max_workers=config.get("processes", 2),
+        mp_context=context,
+        initializer=_initialize,
+        initargs=(config.get("memory_limit", 0),),
+        max_tasks_per_child=config.get("max_tasks_per_child") or None,
+    )
+
+
+def submit(fn: Callable[P, R], /, *args: P.args, **kwargs: P.kwargs) -> Future[R]:
+    """Run a function in the creator process pool.
+
+    A pool broken by a process that died, e.g. killed by the kernel, is
+    replaced by a new one.
+
+    Args:
+        fn: The function, it must be importable by the pool processes.
+        *args: The positional arguments of the function.
+        **kwargs: The keyword arguments of the function.
+
+    Returns:
+        The future result of the function.
+    """
+    pool = creator_pool()
+    try:
+        return pool.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        with _POOL_LOCK:
+            if creator_pool() is pool:
+                creator_pool.cache_clear()
+        return creator_pool().submit(fn, *args, **kwargs)
+
+
+def start_processes() -> None:
+    """Start every process of the creator pool and wait for them to warm up."""
+    processes = getattr(settings, "ADT_CREATOR_POOL", {}).get("processes", 2)
+    # A process is only started for a task no idle process can take
+    for future in [submit(os.getpid) for _ in range(processes)]:
+        future.result()
+
+
+def run_scaffold(command_path: list[str], params: dict[str, Any]) -> CreatorResult:
+    """Run an ansible-creator command, in a process of the pool.
+
+    Args:
+        command_path: The command segments, e.g. ``["init", "collection"]``.
+        params: The command parameters.
+
+    Returns:
+        The creator result, its path is a temporary directory the caller removes.
+    """
+    return V1().run(*command_path, **params)
+
+
+def run_backend(backend: Any, method: str, params: dict[str, Any]) -> Path:  # noqa: ANN401
+    """Run a creator backend method, in a process of the pool.
+
+    Args:
+        backend: The creator backend, scaffolding into its temporary directory,
+            from the light ``creator_backend`` module.
+        method: The name of the backend method.
+        params: The method parameters.
+
+    Returns:
+        The scaffolded directory.
+    """
+    result: Path = getattr(backend, method)(**params)
+    return result
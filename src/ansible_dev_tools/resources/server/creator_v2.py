@@ -1,288 +1,133 @@
-"""The creator frontend and backend APIs."""
+"""The creator frontend APIs, the backends run in the creator process pool."""
 
 from __future__ import annotations
 
-import tarfile
 import tempfile
 
 from pathlib import Path
-
-from ansible_creator._version import version as creator_version
-from ansible_creator.config import Config
-from ansible_creator.output import Output
-from ansible_creator.subcommands.add import Add
-from ansible_creator.subcommands.init import Init
-from ansible_creator.utils import TermFeatures
-from django.core.files.storage import FileSystemStorage
-from django.http import FileResponse, HttpRequest, HttpResponse
-
+from typing import Any
+
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+
+from ansible_dev_tools.resources.server.archive import (
+    archive_response,
+    iter_tar,
+    negotiate,
+    temporary_archive,
+)
+from ansible_dev_tools.resources.server.creator_backend import CreatorBackendV2
+from ansible_dev_tools.resources.server.creator_pool import run_backend, submit
+from ansible_dev_tools.resources.server.metrics import phase, time_scaffold
+from ansible_dev_tools.resources.server.scaffold_cache import cacheable, scaffold_cache
 from ansible_dev_tools.server_utils import validate_request, validate_response
 
 
-def create_tar_file(init_path: Path, tar_file: Path) -> None:
-    """Create a tar file from the given directory.
-
-    Args:
-        init_path: The directory path to create the tar file from.
-        tar_file: The output tar file path.
-    """
-    with tarfile.open(tar_file, "w") as tar:
-        tar.add(str(init_path), arcname=".")
-
-
 class CreatorFrontendV2:
     """The creator frontend, handles requests from users."""
 
-    def _response_from_tar(self, tar_file: Path) -> FileResponse:
-        """Create a FileResponse from a tar file.
-
-        Args:
-            tar_file: The tar file path.
-
-        Returns:
-            The file response.
-        """
-        fs = FileSystemStorage(str(tar_file.parent))
-        response = FileResponse(
-            fs.open(tar_file.name, "rb"),
-            content_type="application/tar",
-            status=201,
-        )
-        response["Content-Disposition"] = f'attachment; filename="{tar_file.name}"'
-        return response
-
-    def playbook(
+    def _scaffold(
         self,
         request: HttpRequest,
-    ) -> FileResponse | HttpResponse:
-        """Create a new playbook project.
+        method: str,
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Validate a request and respond with its scaffold, from the cache if possible.
+
+        The scaffold runs in the creator process pool. Scaffolds holding a
+        devfile are never cached, its name is unique to each run.
 
         Args:
             request: HttpRequest object.
+            method: The backend method scaffolding the request body.
 
         Returns:
-            File or error response.
+            Archive or error response.
         """
         result = validate_request(request)
         if isinstance(result, HttpResponse):
             return result
+        body: dict[str, Any] = result.body or {}
+        archive_format = negotiate(request)
+        cache = scaffold_cache()
+        key = cache.key(request.path, body, archive_format) if cache else ""
+        entry = cache.get(key) if cache else None
+        if entry is not None:
+            return validate_response(request=request, response=entry.response())
+
         with tempfile.TemporaryDirectory() as tmp_dir:
-            # result.body here is a dict, it appear the type hint is wrong
-            tar_file = CreatorBackend(Path(tmp_dir)).playbook(
-                **result.body,  # type: ignore[arg-type]
-            )
-            response = self._response_from_tar(tar_file)
+            with phase(request, "scaffold"):
+                directory = time_scaffold(
+                    method,
+                    submit(run_backend, CreatorBackendV2(Path(tmp_dir)), method, body),
+                ).result()
+            # The archive file outlives the scaffold, the response closes it
+            with phase(request, "archive"):
+                if cache and cacheable(directory):
+                    response = cache.store(
+                        key, directory, archive_format, directory.name
+                    ).response()
+                else:
+                    file, headers = temporary_archive(
+                        iter_tar(directory), archive_format, directory.name
+                    )
+                    response = archive_response(file, headers)
 
         return validate_response(
             request=request,
             response=response,
         )
 
-    def collection(
+    def playbook(
         self,
         request: HttpRequest,
-    ) -> FileResponse | HttpResponse:
-        """Create a new collection project.
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Create a new playbook project.
 
         Args:
             request: HttpRequest object.
 
         Returns:
-            File or error response.
+            Archive or error response.
         """
-        result = validate_request(request)
-        if isinstance(result, HttpResponse):
-            return result
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            # result.body here is a dict, it appear the type hint is wrong
-            tar_file = CreatorBackend(Path(tmp_dir)).collection(
-                **result.body,  # type: ignore[arg-type]
-            )
-            response = self._response_from_tar(tar_file)
+        return self._scaffold(request, "playbook")
 
-        return validate_response(
-            request=request,
-            response=response,
-        )
-
-    def devfile(
+    def collection(
         self,
         request: HttpRequest,
-    ) -> FileResponse | HttpResponse:
-        """Add a devfile.
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Create a new collection project.
 
         Args:
             request: HttpRequest object.
 
         Returns:
-            File or error response.
+            Archive or error response.
         """
-        result = validate_request(request)
-        if isinstance(result, HttpResponse):
-            return result
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tar_file = CreatorBackend(Path(tmp_dir)).devfile()
-            response = self._response_from_tar(tar_file)
-
-        return validate_response(
-            request=request,
-            response=response,
-        )
+        return self._scaffold(request, "collection")
 
-    def ee_project(
+    def devfile(
         self,
         request: HttpRequest,
-    ) -> FileResponse | HttpResponse:
-        """Create a new execution environment project.
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Add a devfile.
 
         Args:
             request: HttpRequest object.
 
         Returns:
-            File or error response.
-        """
-        result = validate_request(request)
-        if isinstance(result, HttpResponse):
-            return result
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tar_file = CreatorBackend(Path(tmp_dir)).ee_project()
-            response = self._response_from_tar(tar_file)
-
-        return validate_response(
-            request=request,
-            response=response,
-        )
-
-
-class CreatorOutput(Output):
-    """The creator output."""
-
-    def __init__(self, log_file: str) -> None:
-        """Initialize the creator output.
-
-        Convenience class to consistently define output with a changing temporary directory.
-
-        Args:
-            log_file: The log file path.
-        """
-        super().__init__(
-            log_file=log_file,
-            log_level="DEBUG",
-            log_append="false",
-            term_features=TermFeatures(color=False, links=False),
-            verbosity=1,
-        )
-
-
-class CreatorBackend:
-    """The creator wrapper, handles interaction with the python creator project."""
-
-    def __init__(self, tmp_dir: Path) -> None:
-        """Initialize the creator.
-
-        Args:
-            tmp_dir: The temporary directory.
-        """
-        self.tmp_dir = tmp_dir
-
-    @property
-    def _creator_output(self) -> CreatorOutput:
-        """Return a CreatorOutput configured for the current temp directory."""
-        return CreatorOutput(log_file=str(self.tmp_dir / "creator.log"))
-
-    def collection(self, collection: str, project: str) -> Path:
-        """Scaffold a collection.
-
-        Args:
-            collection: The collection name.
-            project: The project type.
-
-        Returns:
-            The tar file path.
+            Archive or error response.
         """
-        init_path = self.tmp_dir / collection
-        config = Config(
-            creator_version=creator_version,
-            init_path=str(init_path),
-            output=self._creator_output,
-            collection=collection,
-            subcommand="init",
-            project=project,
-        )
-        Init(config).run()
-        tar_file = self.tmp_dir / f"{collection}.tar"
-        create_tar_file(init_path, tar_file)
-        return tar_file
+        return self._scaffold(request, "devfile")
 
-    def playbook(
+    def ee_project(
         self,
-        project: str,
-        namespace: str,
-        collection_name: str,
-    ) -> Path:
-        """Scaffold a playbook project.
+        request: HttpRequest,
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Create a new execution environment project.
 
         Args:
-            project: The project type.
-            namespace: The collection namespace.
-            collection_name: The collection name.
-
-        Returns:
-            The tar file path.
-        """
-        init_path = self.tmp_dir / f"{namespace}-{collection_name}"
-        config = Config(
-            creator_version=creator_version,
-            init_path=str(init_path),
-            output=self._creator_output,
-            project=project,
-            namespace=namespace,
-            collection_name=collection_name,
-            subcommand="init",
-        )
-        Init(config).run()
-        tar_file = self.tmp_dir / f"{namespace}-{collection_name}.tar"
-        create_tar_file(init_path, tar_file)
-        return tar_file
-
-    def devfile(self) -> Path:
-        """Scaffold a devfile.
-
-        Returns:
-            The tar file path.
-        """
-        # Path where the devfile is going to be added
-        add_path = self.tmp_dir / "devfile"
-        add_path.mkdir(parents=True, exist_ok=True)
-
-        config = Config(
-            resource_type="devfile",
-            creator_version=creator_version,
-            path=str(add_path),
-            output=self._creator_output,
-            subcommand="add",
-            overwrite=True,
-        )
-        Add(config).run()
-        tar_file = self.tmp_dir / "devfile.tar"
-        create_tar_file(add_path, tar_file)
-        return tar_file
-
-    def ee_project(self) -> Path:
-        """Scaffold an execution environment project.
+            request: HttpRequest object.
 
         Returns:
-            The tar file path.
+            Archive or error response.
         """
-        init_path = self.tmp_dir / "ee_project"
-        config = Config(
-            creator_version=creator_version,
-            init_path=str(init_path),
-            output=self._creator_output,
-            project="execution_env",
-            subcommand="init",
-        )
-        Init(config).run()
-        tar_file = self.tmp_dir / "ee_project.tar"
-        create_tar_file(init_path, tar_file)
-        return tar_file
+        return self._scaffold(request, "ee_project")
@@ -0,0 +1,89 @@
+"""The liveness and readiness probes of the server."""
+
+from __future__ import annotations
+
+import os
+import time
+
+from importlib import import_module
+
+from django.http import HttpRequest, HttpResponse, JsonResponse
+
+from ansible_dev_tools.resources.server.creator_pool import start_processes, warm_up
+from ansible_dev_tools.resources.server.job_queue import job_queue
+from ansible_dev_tools.resources.server.metrics import metrics
+from ansible_dev_tools.resources.server.scaffold_cache import scaffold_cache
+from ansible_dev_tools.resources.server.server_info import precomputed_metadata
+from ansible_dev_tools.server_utils import validate_request
+
+
+# Imported by openapi-core when the first request and response are validated
+PRELOAD_MODULES = (
+    "openapi_core.templating.media_types.finders",
+    "openapi_core.templating.responses.finders",
+)
+
+# The warm-up duration of the processes which completed it, keyed by pid so
+# workers forked from a warmed up master do not inherit it
+_WARM_UP_SECONDS: dict[int, float] = {}
+
+
+def warm_up_worker() -> float:
+    """Warm up a worker before it serves its first request.
+
+    Imports what the OpenAPI validation of the first request and response
+    would, builds the metadata response, opens the scaffold cache, the job
+    queue and the metrics, and starts the creator processes.
+
+    Returns:
+        The warm-up duration in seconds.
+    """
+    start = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        import_module(name)
+    warm_up()
+    precomputed_metadata()
+    scaffold_cache()
+    job_queue()
+    metrics()
+    start_processes()
+    seconds = time.perf_counter() - start
+    _WARM_UP_SECONDS[os.getpid()] = seconds
+    return seconds
+
+
+class Health:
+    """The probes, for orchestrators and load balancers."""
+
+    def healthz(self, request: HttpRequest) -> HttpResponse:
+        """Report the worker is alive.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            JSON response with the process id.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        return JsonResponse({"status": "alive", "pid": os.getpid()})
+
+    def readyz(self, request: HttpRequest) -> HttpResponse:
+        """Report whether the worker is warmed up and ready to serve requests.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            JSON response with the warm-up duration, or 503 while warming up.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        seconds = _WARM_UP_SECONDS.get(os.getpid())
+        if seconds is None:
+            return JsonResponse({"status": "warming up", "pid": os.getpid()}, status=503)
+        return JsonResponse(
+            {"status": "ready", "pid": os.getpid(), "warm_up_seconds": round(seconds, 3)},
+        )
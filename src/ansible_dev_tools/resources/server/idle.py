@@ -0,0 +1,141 @@
+"""Track the activity of the server workers, to exit once the server is idle."""
+
+from __future__ import annotations
+
+import contextlib
+import multiprocessing
+import time
+
+from typing import TYPE_CHECKING, Any
+
+from django.core import signals
+
+from ansible_dev_tools.resources.server.worker_counts import WorkerCounts
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+
+class Activity:
+    """The requests and jobs running in the workers, shared with the master.
+
+    Each worker counts its requests and jobs in shared memory, created in
+    the master before it forks the workers. The master drops the count of a
+    worker which exited, so a worker killed in the middle of a request does
+    not keep the server busy forever. Monotonic times are comparable across
+    processes.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the activity, the server starts busy for the idle timeout."""
+        self._lock = multiprocessing.Lock()
+        self._running = WorkerCounts()
+        self._last = multiprocessing.Value("d", time.monotonic(), lock=False)
+
+    def update(self, delta: int) -> None:
+        """Count a started or finished request or job of this process.
+
+        Args:
+            delta: 1 when it starts, -1 when it finishes.
+        """
+        with self._lock:
+            self._running.add(delta)
+            self._last.value = time.monotonic()
+
+    def forget(self, pid: int) -> None:
+        """Stop counting the requests and jobs of a worker which exited.
+
+        Args:
+            pid: The process id of the worker.
+        """
+        with self._lock:
+            if self._running.forget(pid):
+                self._last.value = time.monotonic()
+
+    @contextlib.contextmanager
+    def busy(self) -> Iterator[None]:
+        """Count a request or job while it runs.
+
+        Yields:
+            None: The request or job runs.
+        """
+        self.update(1)
+        try:
+            yield
+        finally:
+            self.update(-1)
+
+    def idle_for(self) -> float:
+        """Return for how long nothing ran.
+
+        Returns:
+            The seconds since the last request or job finished, 0 while one runs.
+        """
+        with self._lock:
+            if self._running.total():
+                return 0.0
+            last: float = self._last.value
+        return time.monotonic() - last
+
+    def watch(self, timeout: float, on_idle: Callable[[], None]) -> None:
+        """Wait until nothing ran for a while, then call back.
+
+        Args:
+            timeout: The idle time in seconds.
+            on_idle: Called once the server is idle.
+        """
+        while (idle := self.idle_for()) < timeout:
+            time.sleep(timeout - idle)
+        on_idle()
+
+
+# The activity of the server, set in the master when an idle timeout is set
+_ACTIVITY: Activity | None = None
+
+
+def _request_started(**_kwargs: Any) -> None:  # noqa: ANN401
+    """Count a request as it starts.
+
+    Args:
+        **_kwargs: The signal arguments.
+    """
+    if _ACTIVITY is not None:
+        _ACTIVITY.update(1)
+
+
+def _request_finished(**_kwargs: Any) -> None:  # noqa: ANN401
+    """Count a request once its response is sent.
+
+    Args:
+        **_kwargs: The signal arguments.
+    """
+    if _ACTIVITY is not None:
+        _ACTIVITY.update(-1)
+
+
+def track_activity() -> Activity:
+    """Track the requests and jobs of the workers forked from now on.
+
+    Returns:
+        The activity, shared by the workers.
+    """
+    global _ACTIVITY  # noqa: PLW0603
+    _ACTIVITY = Activity()
+    signals.request_started.connect(_request_started, dispatch_uid=__name__)
+    signals.request_finished.connect(_request_finished, dispatch_uid=__name__)
+    return _ACTIVITY
+
+
+@contextlib.contextmanager
+def busy() -> Iterator[None]:
+    """Keep the server from exiting while outside of a request, e.g. in a job.
+
+    Yields:
+        None: The work runs.
+    """
+    if _ACTIVITY is None:
+        yield
+        return
+    with _ACTIVITY.busy():
+        yield
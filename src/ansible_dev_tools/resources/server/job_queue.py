@@ -0,0 +1,405 @@
+"""The persistent scaffold job queue shared by the server processes."""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+
+from ansible_dev_tools.resources.server.archive import iter_tar
+from ansible_dev_tools.resources.server.creator_pool import run_scaffold, submit
+from ansible_dev_tools.resources.server.idle import busy
+from ansible_dev_tools.resources.server.metrics import time_scaffold
+from ansible_dev_tools.utils import process_alive
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    runner INTEGER,
+    message TEXT,
+    logs TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# How long an idle runner sleeps before looking for jobs submitted to other
+# processes, doubled while the queue stays empty
+POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 10.0
+
+
+class QueueFullError(Exception):
+    """The queue already holds its maximum number of pending jobs."""
+
+
+class IdempotencyConflictError(Exception):
+    """An idempotency key was reused for another request."""
+
+
+@dataclass(frozen=True)
+class Job:
+    """A scaffold job.
+
+    Attributes:
+        id: The job identifier.
+        request: The scaffold request, with a ``command_path`` and ``params``.
+        status: ``queued``, ``running``, ``succeeded`` or ``failed``.
+        created: When the job was submitted.
+        started: When a runner claimed the job.
+        finished: When the job completed.
+        message: The creator summary or error message.
+        logs: The creator logs.
+    """
+
+    id: str
+    request: dict[str, Any]
+    status: str
+    created: float
+    started: float | None
+    finished: float | None
+    message: str | None
+    logs: list[str]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> Job:
+        """Build a job from a database row.
+
+        Args:
+            row: The row of the jobs table.
+
+        Returns:
+            The job.
+        """
+        return cls(
+            id=row["id"],
+            request=json.loads(row["request"]),
+            status=row["status"],
+            created=row["created"],
+            started=row["started"],
+            finished=row["finished"],
+            message=row["message"],
+            logs=json.loads(row["logs"]),
+        )
+
+
+class JobQueue:
+    """A queue of scaffold jobs persisted in SQLite.
+
+    The queue is a database in the jobs directory, every server process on
+    the host opening it shares the jobs. Each process runs the jobs it
+    claims one at a time in the creator process pool, the archive of a
+    successful job is kept in the ``results`` directory. Jobs are dropped
+    with their archive once they finished longer than the retention ago,
+    jobs left running by a process that is gone are queued again.
+    """
+
+    def __init__(self, path: Path, max_depth: int, retention: int) -> None:
+        """Initialize the queue.
+
+        Args:
+            path: The jobs directory.
+            max_depth: The maximum number of queued and running jobs.
+            retention: How long finished jobs and their archives are kept, in seconds.
+        """
+        self.path = path
+        self.max_depth = max_depth
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        (path / "results").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path / "jobs.sqlite3",
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def result(self, job: Job) -> Path:
+        """Return the archive path of a job.
+
+        Args:
+            job: The job.
+
+        Returns:
+            The path of the canonical tar archive, which exists once the job succeeded.
+        """
+        return self.path / "results" / f"{job.id}.tar"
+
+    def submit(
+        self, request: dict[str, Any], idempotency_key: str | None = None
+    ) -> tuple[Job, bool]:
+        """Queue a scaffold job.
+
+        Args:
+            request: The scaffold request, with a ``command_path`` and ``params``.
+            idempotency_key: Identifies retries of the same submission.
+
+        Returns:
+            The job and whether it was created, False when the idempotency key
+            matched an earlier submission.
+
+        Raises:
+            IdempotencyConflictError: If the key was used for another request.
+            QueueFullError: If the queue holds its maximum number of pending jobs.
+        """
+        now = time.time()
+        job = None
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._expire(now)
+            if idempotency_key is not None:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE idempotency_key = ?",
+                    (idempotency_key,),
+                ).fetchone()
+                job = Job.from_row(row) if row else None
+            if job is None:
+                (depth,) = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)",
+                    (QUEUED, RUNNING),
+                ).fetchone()
+                if depth < self.max_depth:
+                    job = Job(uuid.uuid4().hex, request, QUEUED, now, None, None, None, [])
+                    self._db.execute(
+                        "INSERT INTO jobs (id, idempotency_key, request, status, created)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (job.id, idempotency_key, json.dumps(request), QUEUED, now),
+                    )
+                    self._wake.set()
+                    return job, True
+        if job is None:
+            msg = f"The job queue holds {self.max_depth} pending jobs"
+            raise QueueFullError(msg)
+        if job.request != request:
+            msg = f"Idempotency key {idempotency_key} was used for another request"
+            raise IdempotencyConflictError(msg)
+        return job, False
+
+    def get(self, job_id: str) -> Job | None:
+        """Look up a job.
+
+        Args:
+            job_id: The job identifier.
+
+        Returns:
+            The job, or None if it is unknown or expired.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (finished IS NULL OR finished > ?)",
+                (job_id, time.time() - self.retention),
+            ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def describe(self, job: Job) -> dict[str, Any]:
+        """Describe a job to clients.
+
+        Args:
+            job: The job.
+
+        Returns:
+            The job status, with the URL of its archive once it succeeded.
+        """
+        return {
+            "id": job.id,
+            "status": job.status,
+            "command_path": job.request["command_path"],
+            "created": job.created,
+            "started": job.started,
+            "finished": job.finished,
+            "expires": job.finished + self.retention if job.finished else None,
+            "message": job.message,
+            "logs": job.logs,
+            "result": f"/v2/jobs/{job.id}/result" if job.status == SUCCEEDED else None,
+        }
+
+    def _expire(self, now: float) -> None:
+        """Drop the jobs finished longer than the retention ago, with their archive.
+
+        Args:
+            now: The current time.
+        """
+        expired = [
+            job_id
+            for (job_id,) in self._db.execute(
+                "DELETE FROM jobs WHERE finished <= ? RETURNING id",
+                (now - self.retention,),
+            ).fetchall()
+        ]
+        for job_id in expired:
+            (self.path / "results" / f"{job_id}.tar").unlink(missing_ok=True)
+
+    def _pending(self) -> bool:
+        """Check, without taking the write lock, whether the queue needs a runner.
+
+        Returns:
+            Whether a job is queued, expired or left running by a dead runner.
+        """
+        with self._lock:
+            (found,) = self._db.execute(
+                "SELECT EXISTS (SELECT 1 FROM jobs WHERE status = ?)"
+                " OR EXISTS (SELECT 1 FROM jobs WHERE finished <= ?)",
+                (QUEUED, time.time() - self.retention),
+            ).fetchone()
+            runners = self._db.execute(
+                "SELECT runner FROM jobs WHERE status = ?",
+                (RUNNING,),
+            ).fetchall()
+        return bool(found) or any(not process_alive(runner) for (runner,) in runners)
+
+    def _claim(self) -> Job | None:
+        """Claim the oldest queued job, queuing again the jobs of dead runners.
+
+        Returns:
+            The claimed job, or None if no job is queued.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._expire(now)
+            for job_id, runner in self._db.execute(
+                "SELECT id, runner FROM jobs WHERE status = ?",
+                (RUNNING,),
+            ).fetchall():
+                if not process_alive(runner):
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, started = NULL, runner = NULL WHERE id = ?",
+                        (QUEUED, job_id),
+                    )
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, started = ?, runner = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1)"
+                " RETURNING *",
+                (RUNNING, now, os.getpid(), QUEUED),
+            ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def _finish(self, job: Job, status: str, message: str | None, logs: list[str]) -> None:
+        """Record the outcome of a job.
+
+        Args:
+            job: The job.
+            status: ``succeeded`` or ``failed``.
+            message: The creator summary or error message.
+            logs: The creator logs.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished = ?, message = ?, logs = ? WHERE id = ?",
+                (status, time.time(), message, json.dumps(logs), job.id),
+            )
+
+    def _run(self, job: Job) -> tuple[str, str | None, list[str]]:
+        """Scaffold a job in the creator process pool and store its archive.
+
+        Args:
+            job: The claimed job.
+
+        Returns:
+            The status, message and logs of the job.
+        """
+        command_path = job.request["command_path"]
+        params = job.request.get("params", {})
+        creator_result = time_scaffold(
+            "_".join(command_path),
+            submit(run_scaffold, command_path, params),
+        ).result()
+        if creator_result.status != "success" or creator_result.path is None:
+            if creator_result.path is not None:  # pragma: no cover
+                shutil.rmtree(creator_result.path, ignore_errors=True)
+            return FAILED, creator_result.message, creator_result.logs
+        target = self.result(job)
+        fd, name = tempfile.mkstemp(dir=target.parent)
+        tmp_path = Path(name)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.writelines(iter_tar(creator_result.path))
+            tmp_path.replace(target)
+        finally:
+            # Only left over when the archive could not be written
+            tmp_path.unlink(missing_ok=True)
+            shutil.rmtree(creator_result.path, ignore_errors=True)
+        return SUCCEEDED, creator_result.message, creator_result.logs
+
+    def run_next(self) -> bool:
+        """Run the oldest queued job, if any.
+
+        Returns:
+            Whether a job was run.
+        """
+        # The claim locks the database for every process, most polls find nothing
+        job = self._claim() if self._pending() else None
+        if job is None:
+            return False
+        with busy():
+            try:
+                status, message, logs = self._run(job)
+            except Exception as exc:  # noqa: BLE001
+                # The job fails, the runner keeps serving the queue
+                status, message, logs = FAILED, str(exc), []
+            self._finish(job, status, message, logs)
+        return True
+
+    def run_forever(self) -> None:
+        """Run the queued jobs, waiting for new ones when the queue is empty.
+
+        A job submitted to this process wakes the runner at once, the jobs
+        submitted to other processes are polled less often while the queue
+        stays empty.
+        """
+        interval = POLL_INTERVAL
+        while True:
+            if self.run_next():
+                interval = POLL_INTERVAL
+                continue
+            woken = self._wake.wait(interval)
+            self._wake.clear()
+            interval = POLL_INTERVAL if woken else min(interval * 2, MAX_POLL_INTERVAL)
+
+
+@functools.cache
+def job_queue() -> JobQueue | None:
+    """Return the job queue of this worker, starting its runner.
+
+    The ``ADT_JOBS`` setting holds the jobs ``path``, the ``max_depth`` of
+    the queue and the ``retention`` of finished jobs, the job API is
+    disabled when it is not set. The queue is opened on first use, after the
+    workers are forked, with a runner thread for the jobs.
+
+    Returns:
+        The job queue, or None if it is disabled.
+    """
+    config: dict[str, Any] | None = getattr(settings, "ADT_JOBS", None)
+    if not config:
+        return None
+    queue = JobQueue(Path(config["path"]), config["max_depth"], config["retention"])
+    threading.Thread(target=queue.run_forever, name="adt-jobs", daemon=True).start()
+    return queue
@@ -0,0 +1,147 @@
+"""The asynchronous scaffold job API."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+
+from ansible_dev_tools.resources.server.archive import (
+    CHUNK_SIZE,
+    archive_response,
+    negotiate,
+    temporary_archive,
+)
+from ansible_dev_tools.resources.server.job_queue import (
+    SUCCEEDED,
+    IdempotencyConflictError,
+    QueueFullError,
+    job_queue,
+)
+from ansible_dev_tools.server_utils import validate_request, validate_response
+
+
+# Suggested to clients of a full queue, in seconds
+RETRY_AFTER = 5
+
+
+def _error(status: int, message: str) -> JsonResponse:
+    """Build an error response.
+
+    Args:
+        status: The HTTP status code.
+        message: The error message.
+
+    Returns:
+        The JSON error response.
+    """
+    return JsonResponse({"code": status, "message": message}, status=status)
+
+
+class Jobs:
+    """Scaffold jobs run outside of the request.
+
+    A job takes the body of a ``/v2/creator/scaffold`` request. It is queued,
+    run by one of the server processes sharing the queue, and its archive is
+    downloaded once it succeeded.
+    """
+
+    def submit(self, request: HttpRequest) -> StreamingHttpResponse | HttpResponse:
+        """Submit a scaffold job.
+
+        A client retrying a submission sends the same ``Idempotency-Key``
+        header, and gets the job created by the first attempt.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            The job with its URL in ``Location``, or 429 when the queue is full.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        queue = job_queue()
+        if queue is None:  # pragma: no cover
+            return _error(404, "The job queue is disabled")
+        body: dict[str, Any] = result.body  # type: ignore[assignment]
+        try:
+            job, _created = queue.submit(body, request.headers.get("Idempotency-Key"))
+        except QueueFullError as exc:
+            response = _error(429, str(exc))
+            response["Retry-After"] = str(RETRY_AFTER)
+        except IdempotencyConflictError as exc:
+            response = _error(422, str(exc))
+        else:
+            response = JsonResponse(queue.describe(job), status=202)
+            response["Location"] = f"/v2/jobs/{job.id}"
+        return validate_response(request=request, response=response)
+
+    def status(
+        self,
+        request: HttpRequest,
+        job_id: str,
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Return the status of a job.
+
+        Args:
+            request: HttpRequest object.
+            job_id: The job identifier.
+
+        Returns:
+            The job, or 404 if it is unknown or expired.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        queue = job_queue()
+        job = queue.get(job_id) if queue else None
+        if queue is None or job is None:
+            return _error(404, f"Unknown job {job_id}")
+        return validate_response(
+            request=request,
+            response=JsonResponse(queue.describe(job), status=200),
+        )
+
+    def result(
+        self,
+        request: HttpRequest,
+        job_id: str,
+    ) -> StreamingHttpResponse | HttpResponse:
+        """Download the archive of a succeeded job.
+
+        The archive is compressed as negotiated with the client, like the
+        creator endpoints.
+
+        Args:
+            request: HttpRequest object.
+            job_id: The job identifier.
+
+        Returns:
+            The archive, 404 if the job is unknown or expired, or 409 with
+            the job if it did not succeed.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        queue = job_queue()
+        job = queue.get(job_id) if queue else None
+        if queue is None or job is None:
+            return _error(404, f"Unknown job {job_id}")
+        if job.status != SUCCEEDED:
+            return JsonResponse(queue.describe(job), status=409)
+        try:
+            tar = queue.result(job).open("rb")
+        except FileNotFoundError:  # pragma: no cover
+            # Expired by another process since the lookup
+            return _error(404, f"Unknown job {job_id}")
+        with tar:
+            file, headers = temporary_archive(
+                iter(lambda: tar.read(CHUNK_SIZE), b""),
+                negotiate(request),
+                "_".join(job.request["command_path"]),
+            )
+        return validate_response(
+            request=request,
+            response=archive_response(file, headers, status=200),
+        )
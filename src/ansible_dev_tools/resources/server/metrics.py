@@ -0,0 +1,644 @@
+"""Prometheus metrics of the server, aggregated across the worker processes."""
+
+from __future__ import annotations
+
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from ansible_dev_tools.utils import process_alive
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Iterator
+
+    from django.http import HttpRequest
+    from django.http.response import HttpResponseBase
+
+
+R = TypeVar("R")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# The request META key holding the durations of the phases of a request
+TIMINGS = "adt.server_timing"
+TIMING_LOGGER = logging.getLogger("ansible_dev_tools.timing")
+
+# How often a worker writes its metrics for the others to collect, in seconds
+FLUSH_INTERVAL = 1.0
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(4**exponent * 1024) for exponent in range(10))
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class Metric:
+    """The definition of a metric.
+
+    Attributes:
+        name: The metric name.
+        kind: ``counter``, ``gauge`` or ``histogram``. Gauges are summed over
+            the running processes only, the others over every process which
+            ran since the server started.
+        help: The description of the metric.
+        buckets: The upper bounds of the histogram buckets.
+    """
+
+    name: str
+    kind: str
+    help: str
+    buckets: tuple[float, ...] = ()
+
+
+REQUESTS = Metric("adt_http_requests_total", "counter", "HTTP requests by route and status.")
+REQUEST_DURATION = Metric(
+    "adt_http_request_duration_seconds",
+    "histogram",
+    "Time to produce the response of an HTTP request, by route.",
+    DURATION_BUCKETS,
+)
+IN_FLIGHT = Metric("adt_http_requests_in_flight", "gauge", "HTTP requests being processed.")
+SCAFFOLD_DURATION = Metric(
+    "adt_scaffold_duration_seconds",
+    "histogram",
+    "Time to scaffold a successful project in the creator pool, by project type.",
+    DURATION_BUCKETS,
+)
+ARCHIVE_SIZE = Metric(
+    "adt_archive_size_bytes",
+    "histogram",
+    "Size of the archives written, by compression.",
+    SIZE_BUCKETS,
+)
+VALIDATION_DURATION = Metric(
+    "adt_openapi_validation_seconds",
+    "histogram",
+    "Time to validate a request or a response against the OpenAPI spec.",
+    DURATION_BUCKETS,
+)
+ADMISSION_REJECTED = Metric(
+    "adt_admission_rejected_total",
+    "counter",
+    "Requests rejected with a 429 because their budget was exhausted, by route.",
+)
+TMP_USED = Metric(
+    "adt_tmp_filesystem_used_bytes",
+    "gauge",
+    "Used space of the whole filesystem holding the temporary directory, not only by the server.",
+)
+TMP_FREE = Metric(
+    "adt_tmp_filesystem_free_bytes",
+    "gauge",
+    "Free space of the whole filesystem holding the temporary directory.",
+)
+
+METRICS = (
+    REQUESTS,
+    REQUEST_DURATION,
+    IN_FLIGHT,
+    SCAFFOLD_DURATION,
+    ARCHIVE_SIZE,
+    VALIDATION_DURATION,
+    ADMISSION_REJECTED,
+    TMP_USED,
+    TMP_FREE,
+)
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    """Normalize metric labels.
+
+    Args:
+        labels: The label names and values.
+
+    Returns:
+        The labels sorted by name, usable as a key.
+    """
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    """Format labels for the text exposition format.
+
+    Args:
+        labels: The labels.
+
+    Returns:
+        The labels between braces, or an empty string.
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\""))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value.
+
+    Args:
+        value: The value.
+
+    Returns:
+        The value, as an integer when it is one.
+    """
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+@dataclass
+class Samples:
+    """The values of the metrics of a process.
+
+    Attributes:
+        values: The counter and gauge values, by metric name and labels.
+        histograms: The bucket counts followed by the sum and the count of
+            the observations, by metric name and labels.
+    """
+
+    values: dict[tuple[str, Labels], float] = field(default_factory=dict)
+    histograms: dict[tuple[str, Labels], list[float]] = field(default_factory=dict)
+
+    def dump(self) -> str:
+        """Serialize the samples.
+
+        Returns:
+            The samples as JSON.
+        """
+        return json.dumps(
+            {
+                "values": [[name, labels, value] for (name, labels), value in self.values.items()],
+                "histograms": [
+                    [name, labels, counts] for (name, labels), counts in self.histograms.items()
+                ],
+            },
+        )
+
+    @classmethod
+    def load(cls, text: str) -> Samples:
+        """Deserialize samples.
+
+        Args:
+            text: The samples as JSON.
+
+        Returns:
+            The samples.
+        """
+        data = json.loads(text)
+        return cls(
+            values={
+                (name, tuple(map(tuple, labels))): value for name, labels, value in data["values"]
+            },
+            histograms={
+                (name, tuple(map(tuple, labels))): counts
+                for name, labels, counts in data["histograms"]
+            },
+        )
+
+    def merge(self, other: Samples, *, gauges: bool) -> None:
+        """Add the samples of another process.
+
+        Args:
+            other: The samples to add.
+            gauges: Whether to add the gauges, which only count for running processes.
+        """
+        kinds = {metric.name: metric.kind for metric in METRICS}
+        for key, value in other.values.items():
+            if gauges or kinds.get(key[0]) != "gauge":
+                self.values[key] = self.values.get(key, 0) + value
+        for key, counts in other.histograms.items():
+            total = self.histograms.setdefault(key, [0.0] * len(counts))
+            for index, count in enumerate(counts):
+                total[index] += count
+
+
+class Metrics:
+    """The metrics store of a server.
+
+    Each process records its metrics in memory and writes them at most every
+    ``FLUSH_INTERVAL`` to its own file in the metrics directory, so
+    recording never waits on the other workers. Collecting sums the files of
+    every process: counters and histograms of the workers that exited still
+    count, gauges only for the processes still running.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the store.
+
+        Args:
+            path: The metrics directory, shared by the workers.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples = Samples()
+        self._dirty = threading.Event()
+        path.mkdir(parents=True, exist_ok=True)
+
+    def inc(self, metric: Metric, value: float = 1, **labels: str) -> None:
+        """Increment a counter or a gauge.
+
+        Args:
+            metric: The metric.
+            value: The increment, negative to decrement a gauge.
+            **labels: The labels of the sample.
+        """
+        key = (metric.name, _labels(labels))
+        with self._lock:
+            self._samples.values[key] = self._samples.values.get(key, 0) + value
+        self._dirty.set()
+
+    def observe(self, metric: Metric, value: float, **labels: str) -> None:
+        """Record an observation of a histogram.
+
+        Args:
+            metric: The histogram.
+            value: The observed value.
+            **labels: The labels of the sample.
+        """
+        key = (metric.name, _labels(labels))
+        bucket = bisect.bisect_left(metric.buckets, value)
+        with self._lock:
+            counts = self._samples.histograms.setdefault(key, [0.0] * (len(metric.buckets) + 3))
+            # Cumulated at collection, the extra bucket is +Inf
+            counts[bucket] += 1
+            counts[-2] += value
+            counts[-1] += 1
+        self._dirty.set()
+
+    @contextlib.contextmanager
+    def time(self, metric: Metric, **labels: str) -> Iterator[None]:
+        """Observe the duration of a block.
+
+        Args:
+            metric: The histogram.
+            **labels: The labels of the sample.
+
+        Yields:
+            None: The block runs.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(metric, time.perf_counter() - start, **labels)
+
+    def flush(self) -> None:
+        """Write the metrics of this process for the other workers."""
+        self._dirty.clear()
+        with self._lock:
+            text = self._samples.dump()
+        target = self.path / f"{os.getpid()}.json"
+        # A removed directory loses the metrics, it does not stop the worker
+        with contextlib.suppress(OSError):
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path, prefix=".metrics-", delete=False
+            ) as tmp_file:
+                tmp_file.write(text)
+            Path(tmp_file.name).replace(target)
+
+    def flush_forever(self) -> None:
+        """Write the metrics of this process whenever they changed."""
+        while True:
+            self._dirty.wait()
+            self.flush()
+            time.sleep(FLUSH_INTERVAL)
+
+    def collect(self) -> str:
+        """Collect the metrics of every process.
+
+        Returns:
+            The metrics in the Prometheus text exposition format.
+        """
+        self.flush()
+        total = Samples()
+        for path in self.path.glob("*.json"):
+            with contextlib.suppress(OSError, ValueError):
+                samples = Samples.load(path.read_text())
+                total.merge(samples, gauges=process_alive(int(path.stem)))
+        # The filesystem usage, the archives of the server have no name on disk
+        usage = shutil.disk_usage(tempfile.gettempdir())
+        total.values[TMP_USED.name, ()] = usage.used
+        total.values[TMP_FREE.name, ()] = usage.free
+        return "".join(self._format(metric, total) for metric in METRICS)
+
+    @staticmethod
+    def _format(metric: Metric, samples: Samples) -> str:
+        """Format the samples of a metric.
+
+        Args:
+            metric: The metric.
+            samples: The aggregated samples.
+
+        Returns:
+            The metric in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+        if metric.kind != "histogram":
+            lines.extend(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+                for (name, labels), value in sorted(samples.values.items())
+                if name == metric.name
+            )
+        for (name, labels), counts in sorted(samples.histograms.items()):
+            if name != metric.name:
+                continue
+            cumulated = 0.0
+            for bound, count in zip((*metric.buckets, math.inf), counts, strict=False):
+                cumulated += count
+                bucket_labels = (*labels, ("le", _format_value(bound)))
+                lines.append(
+                    f"{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulated)}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(counts[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(counts[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+def metrics_directory(path: str | None) -> str:
+    """Prepare the metrics directory of a server starting.
+
+    The metrics files of the processes which exited, e.g. the workers of a
+    previous server, are removed, the other files are left alone. Without a
+    directory, a temporary one is created and removed when the server exits.
+
+    Args:
+        path: The metrics directory, or None.
+
+    Returns:
+        The metrics directory.
+    """
+    if path is None:
+        path = tempfile.mkdtemp(prefix="adt-metrics-")
+        server = os.getpid()
+
+        def remove() -> None:
+            # The forked workers run the exit handlers of the server too
+            if os.getpid() == server:
+                shutil.rmtree(path, ignore_errors=True)
+
+        atexit.register(remove)
+        return path
+    Path(path).mkdir(parents=True, exist_ok=True)
+    for stale in Path(path).glob("*.json"):
+        if stale.stem.isdigit() and not process_alive(int(stale.stem)):
+            stale.unlink(missing_ok=True)
+    return path
+
+
+@functools.cache
+def metrics() -> Metrics | None:
+    """Return the metrics store of this worker, starting its writer.
+
+    The ``ADT_METRICS`` setting holds the metrics directory, the metrics are
+    disabled when it is not set. The store is opened on first use, after the
+    workers are forked, with a thread writing the metrics of the worker and
+    a last write when the worker exits.
+
+    Returns:
+        The metrics store, or None if it is disabled.
+    """
+    path: str | None = getattr(settings, "ADT_METRICS", None)
+    if not path:
+        return None
+    store = Metrics(Path(path))
+    threading.Thread(target=store.flush_forever, name="adt-metrics", daemon=True).start()
+    atexit.register(store.flush)
+    return store
+
+
+def observe(metric: Metric, value: float, **labels: str) -> None:
+    """Record an observation of a histogram, if the metrics are enabled.
+
+    Args:
+        metric: The histogram.
+        value: The observed value.
+        **labels: The labels of the sample.
+    """
+    store = metrics()
+    if store is not None:
+        store.observe(metric, value, **labels)
+
+
+def time_scaffold(project: str, future: Future[R]) -> Future[R]:
+    """Observe the duration of a scaffold running in the creator pool.
+
+    Only successful scaffolds are observed, so failed requests cannot add a
+    project type.
+
+    Args:
+        project: The project type.
+        future: The running scaffold.
+
+    Returns:
+        A future completed with the scaffold once its duration is observed.
+    """
+    start = time.perf_counter()
+    timed: Future[R] = Future()
+
+    def done(future: Future[R]) -> None:
+        try:
+            result = future.result()
+        except BaseException as exc:  # noqa: BLE001
+            timed.set_exception(exc)
+            return
+        if getattr(result, "status", "success") == "success":
+            observe(SCAFFOLD_DURATION, time.perf_counter() - start, project=project)
+        timed.set_result(result)
+
+    future.add_done_callback(done)
+    return timed
+
+
+@contextlib.contextmanager
+def phase(request: HttpRequest, name: str) -> Iterator[None]:
+    """Time a phase of a request for its ``Server-Timing`` header.
+
+    Args:
+        request: HttpRequest object.
+        name: The phase name.
+
+    Yields:
+        None: The phase runs.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(request, name, time.perf_counter() - start)
+
+
+def record_phase(request: HttpRequest, name: str, seconds: float) -> None:
+    """Add the duration of a phase of a request.
+
+    Requests not going through ``MetricsMiddleware`` are not timed.
+
+    Args:
+        request: HttpRequest object.
+        name: The phase name.
+        seconds: The duration.
+    """
+    timings: dict[str, float] | None = request.META.get(TIMINGS)
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + seconds
+
+
+class MetricsMiddleware:
+    """Count the requests, time their responses and report their phases.
+
+    The phases timed while the response is produced are sent in the
+    ``Server-Timing`` header. A structured log line also holds the time to
+    send the body, once the server closes the response.
+
+    Attributes:
+        sync_capable: The middleware serves WSGI requests.
+        async_capable: The middleware serves ASGI requests without a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self,
+        get_response: Callable[[HttpRequest], Any],
+    ) -> None:
+        """Initialize the middleware.
+
+        Args:
+            get_response: The next middleware or the view.
+        """
+        self.get_response = get_response
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(
+        self,
+        request: HttpRequest,
+    ) -> HttpResponseBase | Coroutine[Any, Any, HttpResponseBase]:
+        """Process a request.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            The response, or a coroutine returning it under ASGI.
+        """
+        if self._async:
+            return self._acall(request)
+        store, start = self._start(request)
+        try:
+            response: HttpResponseBase = self.get_response(request)
+        finally:
+            if store is not None:
+                store.inc(IN_FLIGHT, -1)
+        self._finish(store, request, response, start)
+        return response
+
+    async def _acall(self, request: HttpRequest) -> HttpResponseBase:
+        """Process a request under ASGI.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            The response.
+        """
+        store, start = self._start(request)
+        try:
+            response: HttpResponseBase = await self.get_response(request)
+        finally:
+            if store is not None:
+                store.inc(IN_FLIGHT, -1)
+        self._finish(store, request, response, start)
+        return response
+
+    @staticmethod
+    def _start(request: HttpRequest) -> tuple[Metrics | None, float]:
+        """Start timing a request.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            The metrics store if enabled, and when the request started.
+        """
+        request.META[TIMINGS] = {}
+        store = metrics()
+        if store is not None:
+            store.inc(IN_FLIGHT)
+        return store, time.perf_counter()
+
+    @staticmethod
+    def _finish(
+        store: Metrics | None,
+        request: HttpRequest,
+        response: HttpResponseBase,
+        start: float,
+    ) -> None:
+        """Record a request and report its phases.
+
+        Args:
+            store: The metrics store, None if disabled.
+            request: HttpRequest object.
+            response: The response.
+            start: When the request started.
+        """
+        produced = time.perf_counter()
+        # Labelled by route, not path, so unknown paths add no label values
+        route = f"/{request.resolver_match.route}" if request.resolver_match else "unmatched"
+        method = request.method or ""
+        if store is not None:
+            store.inc(REQUESTS, route=route, method=method, status=str(response.status_code))
+            store.observe(REQUEST_DURATION, produced - start, route=route, method=method)
+        timings: dict[str, float] = {**request.META.pop(TIMINGS, {}), "total": produced - start}
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+        )
+        if not TIMING_LOGGER.isEnabledFor(logging.INFO):
+            return
+
+        close = response.close
+
+        def sent() -> None:
+            # The server closes the response once the body is sent
+            timings["send"] = time.perf_counter() - produced
+            try:
+                TIMING_LOGGER.info(
+                    json.dumps(
+                        {
+                            "route": route,
+                            "method": method,
+                            "status": response.status_code,
+                            "ms": {
+                                name: round(seconds * 1000, 3) for name, seconds in timings.items()
+                            },
+                        },
+                    ),
+                )
+            finally:
+                close()
+
+        response.close = sent  # type: ignore[method-assign]
@@ -0,0 +1,315 @@
+"""The on-disk scaffold archive cache shared by the server workers."""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from ansible_creator._version import version as creator_version
+from django.conf import settings
+
+from ansible_dev_tools.resources.server.archive import archive_response, iter_tar, write_archive
+
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+
+    from django.http import FileResponse
+
+    from ansible_dev_tools.resources.server.archive import ArchiveFormat
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    object TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    headers TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# ansible-creator names each devfile with a random suffix, replaying a cached
+# one would give every client the same "unique" name
+PER_RUN_FILES = ("devfile.yaml",)
+
+
+@dataclass
+class CacheEntry:
+    """A cached scaffold archive.
+
+    Attributes:
+        file: The archive, opened so it outlives a concurrent eviction.
+        headers: The response headers stored with the archive.
+        hit: Whether the archive was found in the cache, or just stored.
+    """
+
+    file: BinaryIO
+    headers: dict[str, str]
+    hit: bool = True
+
+    def response(self) -> FileResponse:
+        """Create the response serving the cached archive.
+
+        Returns:
+            The file response, which closes the archive once sent.
+        """
+        response = archive_response(self.file, self.headers)
+        response["X-Cache"] = "HIT" if self.hit else "MISS"
+        return response
+
+
+class ScaffoldCache:
+    """Content-addressed cache of scaffold archives.
+
+    Archives are stored under the digest of the ansible-creator version, the
+    endpoint, the normalized request parameters and the archive format, each
+    format is stored as sent to the clients. The index is a SQLite
+    database in the cache directory, so every worker process shares the
+    entries and the hit and miss counters. Entries older than the maximum age
+    are dropped, then the least recently used ones until the cache fits in
+    its maximum size.
+    """
+
+    def __init__(self, path: Path, max_size: int, max_age: int) -> None:
+        """Initialize the cache.
+
+        Args:
+            path: The cache directory.
+            max_size: The maximum size of the cached archives in bytes.
+            max_age: The maximum age of an entry in seconds.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        (path / "objects").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path / "index.sqlite3",
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def key(endpoint: str, params: dict[str, Any], archive_format: ArchiveFormat) -> str:
+        """Build the cache key of a scaffold request.
+
+        Args:
+            endpoint: The endpoint path.
+            params: The request parameters.
+            archive_format: The negotiated archive format.
+
+        Returns:
+            The hex digest identifying the archive.
+        """
+        identity = {
+            "creator": creator_version,
+            "endpoint": endpoint,
+            "params": params,
+            "format": [archive_format.media_type, archive_format.compression],
+        }
+        canonical = json.dumps(identity, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _object(self, name: str) -> Path:
+        """Return the path of a cached archive.
+
+        Args:
+            name: The object name, the cache key and a unique suffix.
+
+        Returns:
+            The archive path.
+        """
+        return self.path / "objects" / name[:2] / name
+
+    def _count(self, name: str) -> None:
+        """Increment a counter.
+
+        Args:
+            name: The counter name.
+        """
+        self._db.execute(
+            "INSERT INTO counters VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Look up a cached archive.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached archive, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT object, headers FROM entries WHERE key = ? AND created > ?",
+                (key, now - self.max_age),
+            ).fetchone()
+            file = None
+            if row is not None:
+                with contextlib.suppress(OSError):
+                    file = self._object(row[0]).open("rb")
+            if file is None:
+                self._count("misses")
+                return None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count("hits")
+        return CacheEntry(file=file, headers=json.loads(row[1]))
+
+    def store(
+        self,
+        key: str,
+        directory: Path,
+        archive_format: ArchiveFormat,
+        name: str,
+        headers: dict[str, str] | None = None,
+    ) -> CacheEntry:
+        """Archive a scaffolded directory into the cache.
+
+        The archive is written to an object of its own, only indexed once it
+        is complete, so other workers never read a partial archive, and stays
+        open for the response. The archive it replaces and the entries over
+        the age and size limits are removed then, an evicted archive remains
+        readable until the response closes it. Object names are never reused,
+        so removing one never removes the archive of a newer store.
+
+        Args:
+            key: The cache key.
+            directory: The directory to archive.
+            archive_format: The negotiated format.
+            name: The archive file name suggested to the client, without extension.
+            headers: More response headers to store with the archive.
+
+        Returns:
+            The stored archive, opened at its start.
+        """
+        shard = self.path / "objects" / key[:2]
+        shard.mkdir(exist_ok=True)
+        fd, object_name = tempfile.mkstemp(dir=shard, prefix=f"{key}.")
+        target = Path(object_name)
+        with contextlib.ExitStack() as stack:
+            # Only left over when the archive could not be stored
+            stack.callback(target.unlink, missing_ok=True)
+            file = stack.enter_context(os.fdopen(fd, "w+b"))
+            headers = {
+                **write_archive(file, iter_tar(directory), archive_format, name),
+                **(headers or {}),
+            }
+            file.seek(0)
+            now = time.time()
+            # The context manager commits the transaction, or rolls it back on errors
+            with self._lock, self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                removed = [
+                    row[0]
+                    for row in self._db.execute(
+                        "SELECT object FROM entries WHERE key = ?",
+                        (key,),
+                    )
+                ]
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, target.name, target.stat().st_size, now, now, json.dumps(headers)),
+                )
+                removed.extend(self._evict(now))
+            # Owned by the response from now on
+            stack.pop_all()
+        for removed_name in removed:
+            self._object(removed_name).unlink(missing_ok=True)
+        return CacheEntry(file=file, headers=headers, hit=False)
+
+    def _evict(self, now: float) -> list[str]:
+        """Drop the expired entries, then the least recently used over the size.
+
+        Runs in the transaction of the store, the caller removes the objects.
+
+        Args:
+            now: The current time.
+
+        Returns:
+            The names of the evicted objects.
+        """
+        evicted: list[tuple[str, str]] = self._db.execute(
+            "SELECT key, object FROM entries WHERE created <= ?",
+            (now - self.max_age,),
+        ).fetchall()
+        total = 0
+        for key, object_name, size in self._db.execute(
+            "SELECT key, object, size FROM entries WHERE created > ? ORDER BY accessed DESC",
+            (now - self.max_age,),
+        ).fetchall():
+            total += size
+            if total > self.max_size:
+                evicted.append((key, object_name))
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+        return [object_name for _, object_name in evicted]
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters and usage.
+
+        Returns:
+            The hits, misses, entries and size in bytes.
+        """
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries",
+            ).fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+            "size": size,
+        }
+
+
+def cacheable(directory: Path) -> bool:
+    """Return whether a scaffold is the same on every run, so it can be cached.
+
+    Args:
+        directory: The scaffolded directory.
+
+    Returns:
+        False if the scaffold holds a file generated anew on every run.
+    """
+    return not any(any(directory.rglob(name)) for name in PER_RUN_FILES)
+
+
+@functools.cache
+def scaffold_cache() -> ScaffoldCache | None:
+    """Return the scaffold cache of this worker.
+
+    The ``ADT_SCAFFOLD_CACHE`` setting holds the cache ``path``, ``max_size``
+    and ``max_age``, the cache is disabled when it is not set. The cache is
+    opened on first use, after the workers are forked.
+
+    Returns:
+        The scaffold cache, or None if it is disabled.
+    """
+    config: dict[str, Any] | None = getattr(settings, "ADT_SCAFFOLD_CACHE", None)
+    if not config:
+        return None
+    return ScaffoldCache(Path(config["path"]), config["max_size"], config["max_age"])
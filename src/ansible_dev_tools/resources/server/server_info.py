@@ -2,42 +2,87 @@
 
 from __future__ import annotations
 
-from django.http import HttpRequest, JsonResponse
+from typing import Any
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.urls import get_resolver
 
-from ansible_dev_tools.server_utils import validate_request
-from ansible_dev_tools.version_builder import version_builder
+from ansible_dev_tools.resources.server.metrics import CONTENT_TYPE, metrics
+from ansible_dev_tools.server_utils import PrecomputedResponse, validate_request
+from ansible_dev_tools.version_builder import installed_key, tool_versions
+
+
+# The metadata of this worker, keyed by the installed distributions when refreshed
+_METADATA: dict[str, PrecomputedResponse] = {}
+
+
+def metadata() -> dict[str, Any]:
+    """Build the metadata document.
+
+    Returns:
+        The tool versions and the API endpoints grouped by their first segment.
+    """
+    grouped_endpoints: dict[str, list[str]] = {}
+    for pattern in get_resolver().url_patterns:
+        endpoint = str(pattern.pattern)
+        grouped_endpoints.setdefault(endpoint.partition("/")[0], []).append(f"/{endpoint}")
+    return {"versions": tool_versions(), "apis": grouped_endpoints}
+
+
+def precomputed_metadata() -> PrecomputedResponse:
+    """Return the metadata response of this worker, building it on first use.
+
+    With the ``ADT_METADATA_REFRESH`` setting, the response is built again
+    once distributions are installed, upgraded or removed, at the cost of a
+    ``stat`` of each ``sys.path`` entry per call.
+
+    Returns:
+        The precomputed metadata response.
+    """
+    key = installed_key() if getattr(settings, "ADT_METADATA_REFRESH", False) else ""
+    precomputed = _METADATA.get(key)
+    if precomputed is None:
+        precomputed = PrecomputedResponse.from_response(JsonResponse(metadata()))
+        _METADATA.clear()
+        _METADATA[key] = precomputed
+    return precomputed
 
 
 class GetMetadata:
     """The metadata, returns the available tools with their versions and available API endpoints."""
 
-    def server_info(self, request: HttpRequest) -> JsonResponse:
+    def server_info(self, request: HttpRequest) -> HttpResponse:
         """Return server information including versions and available APIs.
 
+        The document is built once per worker and served with an ETag,
+        clients sending it back in ``If-None-Match`` get a 304 without body.
+
         Args:
             request: HttpRequest Object
         Returns:
             JSON response containing tool versions and available API endpoints.
         """
         validate_request(request)
-        versions = {}
-        for line in version_builder().splitlines():
-            tool, version = line.split(maxsplit=1)
-            versions[tool] = version
+        return precomputed_metadata().respond(request)
 
-        resolver = get_resolver()
-        urlpatterns = resolver.url_patterns
 
-        endpoints = [str(pattern.pattern) for pattern in urlpatterns]
+class GetMetrics:
+    """The metrics of the server, for Prometheus to scrape."""
 
-        grouped_endpoints: dict[str, list[str]] = {}
+    def metrics(self, request: HttpRequest) -> HttpResponse:
+        """Return the metrics of every worker of the server.
 
-        for endpoint in endpoints:
-            parts = endpoint.split("/")
-            key = parts[0]
-            if key not in grouped_endpoints:
-                grouped_endpoints[key] = []
-            grouped_endpoints[key].append(f"/{endpoint}")
+        Args:
+            request: HttpRequest object.
 
-        return JsonResponse({"versions": versions, "apis": grouped_endpoints}, status=200)
+        Returns:
+            The metrics in the Prometheus text format, or 404 when they are disabled.
+        """
+        result = validate_request(request)
+        if isinstance(result, HttpResponse):
+            return result
+        store = metrics()
+        if store is None:
+            return HttpResponse("Metrics are disabled", status=404)
+        return HttpResponse(store.collect(), content_type=CONTENT_TYPE)
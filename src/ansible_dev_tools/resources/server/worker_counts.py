@@ -0,0 +1,104 @@
+"""Counts kept per worker in shared memory, dropped once a worker exits."""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+
+
+# The most workers with a count at once
+MAX_WORKERS = 256
+
+
+class WorkerCounts:
+    """Counts of the workers, in shared memory created in the master before it forks them.
+
+    A worker takes a slot for its counts while one of them is not zero, so
+    the master can drop the counts of a worker which exited, e.g. killed in
+    the middle of a request. The caller serializes the calls with a lock
+    shared by the workers.
+    """
+
+    def __init__(self, columns: int = 1, workers: int = MAX_WORKERS) -> None:
+        """Initialize the counts.
+
+        Args:
+            columns: The number of counts of each worker.
+            workers: The number of workers counted at once.
+        """
+        self.columns = columns
+        self._pids = multiprocessing.Array("i", workers, lock=False)
+        self._counts = multiprocessing.Array("i", workers * columns, lock=False)
+
+    def _slot(self, pid: int) -> int | None:
+        """Find the slot of a worker, or a free one.
+
+        Args:
+            pid: The process id of the worker.
+
+        Returns:
+            The slot index, or None if every slot is taken.
+        """
+        free = None
+        for index, slot_pid in enumerate(self._pids):
+            if slot_pid == pid:
+                return index
+            if free is None and not slot_pid:
+                free = index
+        return free
+
+    def add(self, delta: int, column: int = 0) -> None:
+        """Add to a count of this process, it is not counted when every slot is taken.
+
+        Args:
+            delta: The increment, negative to decrement.
+            column: The count.
+        """
+        pid = os.getpid()
+        index = self._slot(pid)
+        if index is None:
+            return
+        start = index * self.columns
+        self._counts[start + column] = max(0, self._counts[start + column] + delta)
+        # The slot is only held while the worker has something counted
+        self._pids[index] = pid if any(self._counts[start : start + self.columns]) else 0
+
+    def get(self) -> list[int]:
+        """Return the counts of this process.
+
+        Returns:
+            The counts, zero when the process has no slot.
+        """
+        pid = os.getpid()
+        for index, slot_pid in enumerate(self._pids):
+            if slot_pid == pid:
+                return list(self._counts[index * self.columns : (index + 1) * self.columns])
+        return [0] * self.columns
+
+    def total(self, column: int = 0) -> int:
+        """Return a count summed over the workers.
+
+        Args:
+            column: The count.
+
+        Returns:
+            The sum.
+        """
+        return sum(self._counts[column :: self.columns])
+
+    def forget(self, pid: int) -> bool:
+        """Drop the counts of a worker which exited.
+
+        Args:
+            pid: The process id of the worker.
+
+        Returns:
+            Whether the worker had something counted.
+        """
+        for index, slot_pid in enumerate(self._pids):
+            if slot_pid == pid:
+                self._pids[index] = 0
+                start = index * self.columns
+                self._counts[start : start + self.columns] = [0] * self.columns
+                return True
+        return False
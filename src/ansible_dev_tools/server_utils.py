@@ -2,53 +2,315 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import tempfile
+import time
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from importlib import resources as importlib_resources
-from typing import TYPE_CHECKING
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
 
 import yaml
 
-from django.http import FileResponse, HttpRequest, HttpResponse, JsonResponse
-from openapi_core import OpenAPI
+from django.conf import settings
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags
+from openapi_core import Config, OpenAPI, V31ResponseValidator
 from openapi_core.contrib.django import DjangoOpenAPIRequest, DjangoOpenAPIResponse
 from openapi_core.exceptions import OpenAPIError
+from openapi_core.templating.paths import APICallPathFinder
+
+from ansible_dev_tools.resources.server.metrics import (
+    VALIDATION_DURATION,
+    observe,
+    record_phase,
+)
+from ansible_dev_tools.utils import cache_dir
 
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from django.http.response import HttpResponseBase
+    from jsonschema_path import SchemaPath
+    from openapi_core.templating.paths.datatypes import PathOperationServer
     from openapi_core.unmarshalling.request.datatypes import RequestUnmarshalResult
 
 
-OPENAPI = OpenAPI.from_dict(
-    yaml.safe_load(
-        (
-            importlib_resources.files("ansible_dev_tools.resources.server.data") / "openapi.yaml"
-        ).read_text(),
-    ),
+SPEC_PACKAGE = "ansible_dev_tools.resources.server.data"
+# Bump when the compiled form changes so existing compiled specs are not reused
+SPEC_COMPILER_VERSION = 1
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+
+class PrecompiledPathFinder(APICallPathFinder):
+    """Path finder serving the operations resolved when the spec was loaded.
+
+    The default finder matches the request URL against every path template
+    of the spec on each call. The spec declares no ``servers``, so the
+    operation only depends on the method and the URL path. Paths with
+    template variables are resolved on each call. Each finder keeps the
+    operations of its own spec, keyed by method and URL path.
+    """
+
+    def __init__(self, spec: SchemaPath, base_url: str | None = None) -> None:
+        """Initialize the finder with no operation resolved yet.
+
+        Args:
+            spec: The OpenAPI spec.
+            base_url: The base URL of the server.
+        """
+        super().__init__(spec, base_url=base_url)
+        self.operations: dict[tuple[str, str], PathOperationServer] = {}
+
+    def find(self, method: str, name: str) -> PathOperationServer:
+        """Find the operation for a request.
+
+        Args:
+            method: The request method.
+            name: The full request URL.
+
+        Returns:
+            The path, operation and server of the request.
+        """
+        key = (method, urlsplit(name).path)
+        found = self.operations.get(key)
+        if found is None:
+            found = super().find(method, name)
+            # Keep the table bounded, templated paths have a key per value
+            if not found.path_result.variables:
+                self.operations[key] = found
+        return found
+
+
+def _resolve_refs(node: Any, root: dict[str, Any], seen: tuple[str, ...] = ()) -> Any:  # noqa: ANN401
+    """Inline the local ``$ref`` entries of an OpenAPI document.
+
+    References that would recurse into themselves are left in place.
+
+    Args:
+        node: The document node to resolve.
+        root: The complete document.
+        seen: The references being resolved on the current branch.
+
+    Returns:
+        The node with its local references inlined.
+    """
+    if isinstance(node, list):
+        return [_resolve_refs(item, root, seen) for item in node]
+    if not isinstance(node, dict):
+        return node
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#/") and ref not in seen:
+        target: Any = root
+        for part in ref[2:].split("/"):
+            target = target[part.replace("~1", "/").replace("~0", "~")]
+        return _resolve_refs(target, root, (*seen, ref))
+    return {key: _resolve_refs(value, root, seen) for key, value in node.items()}
+
+
+def compile_spec(source: bytes) -> dict[str, Any]:
+    """Compile the OpenAPI document.
+
+    The YAML is parsed, the document is validated and its local references
+    are inlined.
+
+    Args:
+        source: The OpenAPI document as YAML.
+
+    Returns:
+        The compiled document.
+    """
+    spec: dict[str, Any] = yaml.safe_load(source)
+    # Creating the OpenAPI object validates the document
+    OpenAPI.from_dict(spec)
+    compiled: dict[str, Any] = _resolve_refs(spec, spec)
+    return compiled
+
+
+def _compiled_spec_path(digest: str) -> Path:
+    """Return the location of the compiled spec.
+
+    The compiled spec is stored in the user cache directory, the package data
+    directory is read-only on system installs.
+
+    Args:
+        digest: The digest of the YAML document and compiler version.
+
+    Returns:
+        The path of the compiled spec.
+    """
+    return cache_dir() / f"openapi.{digest[:16]}.json"
+
+
+def _write_compiled_spec(path: Path, spec: dict[str, Any]) -> None:
+    """Write the compiled spec, replacing the ones of previous digests.
+
+    The spec is only compiled again on the next load if it cannot be written,
+    a cache directory which cannot be written to never fails the load.
+
+    Args:
+        path: The path of the compiled spec.
+        spec: The compiled spec.
+    """
+    with contextlib.suppress(OSError):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            dir=path.parent,
+            prefix=".openapi-",
+            delete=False,
+        ) as tmp_file:
+            json.dump(spec, tmp_file, separators=(",", ":"))
+        Path(tmp_file.name).replace(path)
+        for stale in path.parent.glob("openapi.*.json"):
+            if stale != path:
+                # Another process may be pruning it too
+                stale.unlink(missing_ok=True)
+
+
+def load_openapi() -> OpenAPI:
+    """Load the OpenAPI spec, preferring its compiled form.
+
+    The compiled form is keyed by the digest of the YAML document, it is
+    created on first use and loaded as JSON without validating the spec again.
+
+    Returns:
+        The OpenAPI object.
+    """
+    source = (importlib_resources.files(SPEC_PACKAGE) / "openapi.yaml").read_bytes()
+    digest = hashlib.sha256(source + f"\0{SPEC_COMPILER_VERSION}".encode()).hexdigest()
+    path = _compiled_spec_path(digest)
+    try:
+        spec = json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        spec = compile_spec(source)
+        _write_compiled_spec(path, spec)
+    # The spec was validated when it was compiled
+    openapi = OpenAPI.from_dict(
+        spec,
+        config=Config(spec_validator_cls=None, path_finder_cls=PrecompiledPathFinder),
+    )
+    _precompile_operations(openapi.request_unmarshaller)
+    _precompile_operations(openapi.response_validator)
+    return openapi
+
+
+def _precompile_operations(validator: object) -> None:
+    """Resolve every operation of the spec for the path finder of a validator.
+
+    Doing this when the spec is loaded moves the cost out of the first
+    request to each operation. Every validator has a finder of its own.
+
+    Args:
+        validator: The validator or unmarshaller.
+    """
+    finder = getattr(validator, "path_finder", None)
+    if not isinstance(finder, PrecompiledPathFinder):
+        return
+    for route, path_item in (finder.spec / "paths").read_value().items():
+        for method in HTTP_METHODS:
+            if method in path_item:
+                finder.find(method, route)
+
+
+class HeadersOnlyResponse(DjangoOpenAPIResponse):
+    """Response adapter exposing the status and headers but never the body."""
+
+    @property
+    def data(self) -> bytes:
+        """Return no data, a streamed body is never read for validation.
+
+        Returns:
+            An empty body.
+        """
+        return b""
+
+
+class HeadersOnlyResponseValidator(V31ResponseValidator):
+    """Validate the status, content type and headers of a response.
+
+    The body is not read, the content type is only checked against the
+    media types declared for the response.
+    """
+
+    def _get_data(
+        self,
+        data: bytes | None,  # noqa: ARG002
+        mimetype: str,
+        operation_response: SchemaPath,
+    ) -> None:
+        """Check the content type is declared for the response.
+
+        Args:
+            data: The response body, ignored.
+            mimetype: The response content type.
+            operation_response: The spec of the response.
+        """
+        if "content" in operation_response:
+            self._find_media_type(operation_response / "content", mimetype)
+
+
+OPENAPI = load_openapi()
+HEADERS_ONLY_VALIDATOR = HeadersOnlyResponseValidator(
+    OPENAPI.spec,
+    path_finder_cls=PrecompiledPathFinder,
 )
+_precompile_operations(HEADERS_ONLY_VALIDATOR)
+# Response counters per route, used to sample the responses to validate
+_RESPONSE_COUNTERS: defaultdict[str, itertools.count[int]] = defaultdict(itertools.count)
 
 
 def validate_request(request: HttpRequest) -> RequestUnmarshalResult | HttpResponse | JsonResponse:
     """Validate the request against the OpenAPI schema.
 
+    The request is validated and unmarshalled in a single pass, the first
+    error found is returned in the same order a validation would raise it.
+
     Args:
         request: HttpRequest object.
 
     Returns:
         The request body or the error HTTP response is validation fails.
     """
-    try:
-        openapi_request = DjangoOpenAPIRequest(request)
-        OPENAPI.validate_request(openapi_request)
-    except OpenAPIError as exc:
-        return HttpResponse(str(exc), status=400)
-    return OPENAPI.unmarshal_request(openapi_request)
+    start = time.perf_counter()
+    result = OPENAPI.unmarshal_request(DjangoOpenAPIRequest(request))
+    errors = list(result.errors)
+    elapsed = time.perf_counter() - start
+    observe(VALIDATION_DURATION, elapsed, kind="request")
+    record_phase(request, "validate", elapsed)
+    if errors:
+        return HttpResponse(str(errors[0]), status=400)
+    return result
 
 
 def validate_response(
     request: HttpRequest,
-    response: FileResponse | HttpResponse,
-) -> FileResponse | HttpResponse:
+    response: StreamingHttpResponse | HttpResponse,
+) -> StreamingHttpResponse | HttpResponse:
     """Validate the response against the OpenAPI schema.
 
+    The ``ADT_RESPONSE_VALIDATION`` setting maps a route, or ``*`` for any
+    other route, to the rate at which its responses are validated: 1 validates
+    every response, N one in N and 0 none. Streaming responses such as file
+    and archive responses are validated without reading their body.
+
     Args:
         request: HttpRequest object.
         response: HttpResponse object.
@@ -56,11 +318,164 @@ def validate_response(
     Returns:
         HttpResponse: The response object.
     """
+    rates: dict[str, int] = getattr(settings, "ADT_RESPONSE_VALIDATION", {})
+    rate = rates.get(request.path, rates.get("*", 1))
+    # Counted per route, templated paths would add a counter per value
+    route = request.resolver_match.route if request.resolver_match else request.path
+    if not rate or next(_RESPONSE_COUNTERS[route]) % rate:
+        return response
+    start = time.perf_counter()
     try:
-        OPENAPI.validate_response(
-            request=DjangoOpenAPIRequest(request),
-            response=DjangoOpenAPIResponse(response),  # type: ignore[arg-type]
-        )
+        if isinstance(response, StreamingHttpResponse):
+            HEADERS_ONLY_VALIDATOR.validate(
+                DjangoOpenAPIRequest(request),
+                HeadersOnlyResponse(response),  # type: ignore[arg-type]
+            )
+        else:
+            OPENAPI.validate_response(
+                request=DjangoOpenAPIRequest(request),
+                response=DjangoOpenAPIResponse(response),
+            )
     except OpenAPIError as exc:
+        # Release the resources of the discarded response, e.g. its archive
+        response.close()
         return HttpResponse(str(exc), status=400)
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(VALIDATION_DURATION, elapsed, kind="response")
+        record_phase(request, "validate-response", elapsed)
     return response
+
+
+@functools.cache
+def creator_executor() -> ThreadPoolExecutor:
+    """Return the executor running the blocking creator views in ASGI mode.
+
+    The ``ADT_CREATOR_THREADS`` setting bounds how many creator requests a
+    worker runs at once, further requests wait for a free thread while the
+    event loop keeps serving the others.
+
+    Returns:
+        The executor.
+    """
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, "ADT_CREATOR_THREADS", 4),
+        thread_name_prefix="adt-creator",
+    )
+
+
+def async_view(
+    view: Callable[..., HttpResponseBase],
+    *,
+    blocking: bool,
+) -> Callable[..., Coroutine[Any, Any, HttpResponseBase]]:
+    """Adapt a view to the ASGI server.
+
+    Django runs every synchronous view of an ASGI application in one shared
+    thread, so a single scaffold would hold up all other requests.
+
+    Args:
+        view: The synchronous view.
+        blocking: Run the view in the creator executor instead of directly
+            on the event loop.
+
+    Returns:
+        The asynchronous view.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request: HttpRequest, **kwargs: Any) -> HttpResponseBase:  # noqa: ANN401
+        if not blocking:
+            return view(request, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            creator_executor(),
+            functools.partial(view, request, **kwargs),
+        )
+
+    return wrapper
+
+
+def parse_accept(header: str) -> dict[str, float]:
+    """Parse an ``Accept`` or ``Accept-Encoding`` header.
+
+    Args:
+        header: The header value, e.g. ``gzip;q=0.8, zstd``.
+
+    Returns:
+        The quality of each listed value, keyed by the lowercase value.
+    """
+    accepted = {}
+    for item in header.split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                with contextlib.suppress(ValueError):
+                    quality = float(number)
+        accepted[value.lower()] = quality
+    return accepted
+
+
+@dataclass(frozen=True)
+class PrecomputedResponse:
+    """A response body serialized and compressed once, then served by ETag.
+
+    Attributes:
+        content: The serialized body.
+        gzip_content: The gzip compressed body.
+        content_type: The content type of the body.
+        etag: The strong ETag of the body, the gzip variant appends ``-gzip``.
+    """
+
+    content: bytes
+    gzip_content: bytes
+    content_type: str
+    etag: str
+
+    @classmethod
+    def from_response(cls, response: HttpResponse) -> PrecomputedResponse:
+        """Precompute a response.
+
+        Args:
+            response: The response to serve repeatedly.
+
+        Returns:
+            The precomputed response.
+        """
+        content = response.content
+        return cls(
+            content=content,
+            gzip_content=gzip.compress(content, compresslevel=9, mtime=0),
+            content_type=response["Content-Type"],
+            etag=hashlib.sha256(content).hexdigest(),
+        )
+
+    def respond(self, request: HttpRequest) -> HttpResponse:
+        """Serve the response, negotiating the encoding.
+
+        Args:
+            request: HttpRequest object.
+
+        Returns:
+            A 304 response without body if the client holds the current
+            version, else the gzip or identity encoded body.
+        """
+        gzip_etag = f"{self.etag}-gzip"
+        use_gzip = parse_accept(request.headers.get("Accept-Encoding", "")).get("gzip", 0) > 0
+        etag = f'"{gzip_etag if use_gzip else self.etag}"'
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        response: HttpResponse
+        if "*" in if_none_match or {f'"{self.etag}"', f'"{gzip_etag}"'} & set(if_none_match):
+            response = HttpResponseNotModified()
+        elif use_gzip:
+            response = HttpResponse(self.gzip_content, content_type=self.content_type)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(self.content, content_type=self.content_type)
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        return response
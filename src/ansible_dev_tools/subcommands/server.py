@@ -2,28 +2,55 @@
 
 from __future__ import annotations
 
+import contextlib
+import functools
+import gc
+import multiprocessing
 import os
+import signal
+import socket
+import threading
 
-from typing import TYPE_CHECKING
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
 
 from django import setup
 from django.conf import settings
+from django.core.asgi import get_asgi_application
 from django.core.wsgi import get_wsgi_application
 from django.urls import path
 from gunicorn.app.base import BaseApplication
 
+from ansible_dev_tools.resources.server.admission import default_budget, share_budgets
 from ansible_dev_tools.resources.server.creator_dynamic import CreatorDynamic
+from ansible_dev_tools.resources.server.creator_pool import warm_up
 from ansible_dev_tools.resources.server.creator_v1 import CreatorFrontendV1
 from ansible_dev_tools.resources.server.creator_v2 import CreatorFrontendV2
-from ansible_dev_tools.resources.server.server_info import GetMetadata
+from ansible_dev_tools.resources.server.health import PRELOAD_MODULES, Health, warm_up_worker
+from ansible_dev_tools.resources.server.idle import track_activity
+from ansible_dev_tools.resources.server.jobs import Jobs
+from ansible_dev_tools.resources.server.metrics import metrics_directory
+from ansible_dev_tools.resources.server.server_info import (
+    GetMetadata,
+    GetMetrics,
+    precomputed_metadata,
+)
+from ansible_dev_tools.utils import auto_workers
 
 
 if TYPE_CHECKING:
+    from django.core.handlers.asgi import ASGIHandler
     from django.core.handlers.wsgi import WSGIHandler
 
+    from ansible_dev_tools.resources.server.admission import Budget
+    from ansible_dev_tools.resources.server.idle import Activity
+
 
 urlpatterns = (
     path(route="metadata", view=GetMetadata().server_info, name="server_info"),
+    path(route="metrics", view=GetMetrics().metrics),
+    path(route="healthz", view=Health().healthz),
+    path(route="readyz", view=Health().readyz),
     path(route="v1/creator/playbook", view=CreatorFrontendV1().playbook),
     path(route="v1/creator/collection", view=CreatorFrontendV1().collection),
     path(route="v2/creator/playbook", view=CreatorFrontendV2().playbook),
@@ -33,22 +60,172 @@ urlpatterns = (
     path(route="v2/creator/capabilities", view=CreatorDynamic().capabilities),
     path(route="v2/creator/schema", view=CreatorDynamic().schema),
     path(route="v2/creator/scaffold", view=CreatorDynamic().scaffold),
+    path(route="v2/creator/batch", view=CreatorDynamic().batch),
+    path(route="v2/creator/cache", view=CreatorDynamic().cache),
+    path(route="v2/jobs", view=Jobs().submit),
+    path(route="v2/jobs/<str:job_id>", view=Jobs().status),
+    path(route="v2/jobs/<str:job_id>/result", view=Jobs().result),
 )
 
 
+def preload_application() -> None:
+    """Warm up the application in the gunicorn master before forking workers.
+
+    Loads what each worker would otherwise import on its first request, the
+    ansible-creator parser, schema and template packages, and builds the
+    metadata response, then moves every
+    object to the permanent generation with ``gc.freeze``. The collector
+    then leaves the pages shared with the workers untouched, so they stay
+    shared copy-on-write instead of being copied into each worker.
+    """
+    warm_up()
+    for name in PRELOAD_MODULES:
+        import_module(name)
+    precomputed_metadata()
+    gc.freeze()
+
+
+class ReadyNotifier:
+    """Tell the launcher, once, that the server accepts connections.
+
+    The first worker to warm up writes the address of the server followed by
+    a newline to the ready file descriptor and sends ``READY=1`` to the
+    systemd ``NOTIFY_SOCKET``. Workers started later, e.g. to replace one,
+    do not notify again. The master keeps its copy of the descriptor for the
+    workers it starts, so the launcher reads one line rather than up to the
+    end of the file. ``NOTIFY_SOCKET`` is taken out of the environment, so
+    gunicorn does not report the server ready before its workers are.
+    """
+
+    def __init__(self, fd: int | None) -> None:
+        """Initialize the notifier, in the gunicorn master.
+
+        Args:
+            fd: The file descriptor to write the address to, if any.
+        """
+        self.fd = fd
+        self.notify_socket = os.environ.pop("NOTIFY_SOCKET", "")
+        # Shared with the workers forked by the master
+        self._notified = multiprocessing.Value("b", 0)
+
+    def notify(self, address: str) -> None:
+        """Announce the server is ready, unless a worker already did.
+
+        The worker closes its copy of the ready file descriptor either way.
+
+        Args:
+            address: The address of the server, e.g. ``http://0.0.0.0:8000``.
+        """
+        with self._notified.get_lock():
+            notified = bool(self._notified.value)
+            self._notified.value = 1
+        if self.fd is not None:
+            with contextlib.suppress(OSError):
+                if not notified:
+                    os.write(self.fd, f"{address}\n".encode())
+                os.close(self.fd)
+        if notified:
+            return
+        notify_socket = self.notify_socket
+        if notify_socket:
+            # A leading @ stands for the abstract namespace
+            if notify_socket.startswith("@"):
+                notify_socket = f"\0{notify_socket[1:]}"
+            message = f"READY=1\nMAINPID={os.getppid()}\nSTATUS=Listening at {address}"
+            with (
+                contextlib.suppress(OSError),
+                socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as notify,
+            ):
+                notify.sendto(message.encode(), notify_socket)
+
+
+def post_worker_init(worker: Any) -> None:  # noqa: ANN401
+    """Warm up a gunicorn worker before it accepts its first connection.
+
+    Connections are only taken by the workers already warmed up meanwhile,
+    so no request waits for the warm-up of the worker it landed on. The
+    launcher is notified once the first worker is ready.
+
+    Args:
+        worker: The gunicorn worker.
+    """
+    seconds = warm_up_worker()
+    worker.log.info("Worker warmed up in %.3fs", seconds)
+    worker.app.ready.notify(str(worker.sockets[0]))
+
+
+def watch_idle(activity: Activity, timeout: int, server: Any) -> None:  # noqa: ANN401
+    """Stop the server once it is idle, watched from a thread of the master.
+
+    The server stops gracefully, as on ``SIGTERM``, and exits with 0.
+
+    Args:
+        activity: The activity of the workers.
+        timeout: Seconds without requests after which the server stops.
+        server: The gunicorn arbiter.
+    """
+
+    def stop() -> None:
+        server.log.info("No request for %ss, stopping", timeout)
+        os.kill(server.pid, signal.SIGTERM)
+
+    threading.Thread(
+        target=activity.watch,
+        args=(timeout, stop),
+        name="adt-idle",
+        daemon=True,
+    ).start()
+
+
+def forget_worker(
+    activity: Activity | None,
+    budgets: list[Budget],
+    _server: Any,  # noqa: ANN401
+    worker: Any,  # noqa: ANN401
+) -> None:
+    """Stop counting the requests of a worker which exited, from the master.
+
+    Called for every worker reaped, including those aborted on timeout or
+    killed, e.g. by the kernel, in the middle of a request.
+
+    Args:
+        activity: The activity of the workers, None without idle timeout.
+        budgets: The admission budgets shared by the workers.
+        _server: The gunicorn arbiter.
+        worker: The gunicorn worker.
+    """
+    if activity is not None:
+        activity.forget(worker.pid)
+    for limit in budgets:
+        limit.forget(worker.pid)
+
+
 class AdtServerApp(BaseApplication):  # type: ignore[misc]
     """Custom application to integrate Gunicorn with the django WSGI app."""
 
     # pylint: disable=abstract-method
-    def __init__(self, app: WSGIHandler, options: dict[str, str]) -> None:
+    def __init__(
+        self,
+        app: WSGIHandler | ASGIHandler,
+        options: dict[str, str | list[str]],
+        ready_fd: int | None = None,
+        idle_timeout: int = 0,
+    ) -> None:
         """Initialize the application.
 
         Args:
             app: The application to run with gunicorn.
             options: Configuration options for gunicorn.
+            ready_fd: The file descriptor to write the address to once ready.
+            idle_timeout: Seconds without requests after which the server exits,
+                0 to run until stopped.
         """
         self.options = options or {}
         self.application = app
+        self.ready = ReadyNotifier(ready_fd)
+        self.idle_timeout = idle_timeout
+        self.activity = track_activity() if idle_timeout else None
+        self.budgets = share_budgets()
         super().__init__()
 
     def load_config(self) -> None:
@@ -60,35 +237,188 @@ class AdtServerApp(BaseApplication):  # type: ignore[misc]
         }
         for key, value in config.items():
             self.cfg.set(key.lower(), value)
+        self.cfg.set("post_worker_init", post_worker_init)
+        if self.activity is not None:
+            self.cfg.set(
+                "when_ready",
+                functools.partial(watch_idle, self.activity, self.idle_timeout),
+            )
+        self.cfg.set("child_exit", functools.partial(forget_worker, self.activity, self.budgets))
 
-    def load(self) -> WSGIHandler:
+    def load(self) -> WSGIHandler | ASGIHandler:
         """Load application.
 
+        With ``preload_app`` this runs once in the master, which is warmed up
+        before the workers are forked.
+
         Returns:
             The application to run with gunicorn.
         """
+        if self.cfg.preload_app:
+            preload_application()
         return self.application
 
 
 class Server:
     """Ansible Devtools server implementation."""
 
-    def __init__(self, port: str, debug: bool) -> None:  # noqa: FBT001
+    def __init__(  # noqa: PLR0913
+        self,
+        port: str,
+        debug: bool,  # noqa: FBT001
+        *,
+        bind: list[str] | None = None,
+        response_validation: list[tuple[str, int]] | None = None,
+        admission: list[tuple[str, tuple[int, int] | None]] | None = None,
+        workers: int | str = 1,
+        threads: int = 1,
+        worker_class: str = "sync",
+        timeout: int = 30,
+        graceful_timeout: int = 30,
+        backlog: int = 2048,
+        preload: bool = False,
+        cache_dir: str | None = None,
+        cache_size: int = 512,
+        cache_max_age: int = 86400,
+        compression_level: int = 6,
+        compression_threads: int = 2,
+        creator_processes: int = 2,
+        creator_max_tasks: int = 100,
+        creator_memory_limit: int = 0,
+        jobs_dir: str | None = None,
+        jobs_max_depth: int = 64,
+        jobs_retention: int = 3600,
+        metadata_refresh: bool = False,
+        metrics_dir: str | None = None,
+        timing_log: bool = False,
+        ready_fd: int | None = None,
+        idle_timeout: int = 0,
+    ) -> None:
         """Initialize an AdtServer object.
 
         Args:
             port: The port on which the server would run.
             debug: Enable or disable debug logging.
+            bind: The addresses to listen on, ``HOST:PORT`` or ``unix:PATH``,
+                instead of the port on all interfaces.
+            response_validation: The response validation rate per route.
+            admission: The number of requests the server runs at once and
+                lets wait per route, ``*`` for the scaffold routes.
+            workers: The number of worker processes, or ``auto``.
+            threads: The number of threads per worker, with the ``asgi`` worker
+                the number of creator requests a worker runs at once.
+            worker_class: The gunicorn worker type, ``sync``, ``gthread`` or
+                ``asgi``.
+            timeout: Seconds before a silent worker is restarted.
+            graceful_timeout: Seconds workers get to finish requests on restart.
+            backlog: The maximum number of pending connections.
+            preload: Warm up the application before forking the workers.
+            cache_dir: The scaffold cache directory, the cache is disabled without it.
+            cache_size: The maximum size of the scaffold cache in MiB.
+            cache_max_age: The maximum age of a cached scaffold in seconds.
+            compression_level: The level of compressed archives, capped at 9
+                for gzip and zip.
+            compression_threads: The number of threads compressing a gzip or
+                zstd archive.
+            creator_processes: The number of processes running the creator
+                commands, per worker.
+            creator_max_tasks: The number of commands a creator process runs
+                before it is replaced, 0 for no limit.
+            creator_memory_limit: The memory limit of a creator process in
+                MiB, 0 for no limit.
+            jobs_dir: The directory of the job queue, shared by the servers,
+                the job API is disabled without it.
+            jobs_max_depth: The maximum number of pending jobs.
+            jobs_retention: How long finished jobs are kept in seconds.
+            metadata_refresh: Rebuild the metadata once distributions are
+                installed or removed.
+            metrics_dir: The directory the workers write their metrics to,
+                a temporary directory by default.
+            timing_log: Log the phase timings of each request to stderr.
+            ready_fd: The file descriptor to write the server address to once
+                it accepts connections.
+            idle_timeout: Seconds without requests after which the server
+                exits, 0 to run until stopped.
         """
         self.port: str = port
         self.debug: bool = debug
+        self.bind: list[str] = bind or [f"0.0.0.0:{port}"]
+        self.workers: int | str = workers
+        self.threads: int = threads
+        self.creator_processes: int = creator_processes
+        self.worker_class: str = worker_class
+        self.timeout: int = timeout
+        self.graceful_timeout: int = graceful_timeout
+        self.backlog: int = backlog
+        self.preload: bool = preload
+        self.ready_fd: int | None = ready_fd
+        self.idle_timeout: int = idle_timeout
 
         settings.configure(
             SECRET_KEY=os.environ.get("SECRET_KEY", os.urandom(32)),
             ALLOWED_HOSTS=[
                 "*",
             ],
-            ROOT_URLCONF=__name__,
+            ROOT_URLCONF=(
+                "ansible_dev_tools.resources.server.asgi_urls"
+                if worker_class == "asgi"
+                else __name__
+            ),
+            ADT_CREATOR_THREADS=threads,
+            ADT_SCAFFOLD_CACHE=(
+                {
+                    "path": cache_dir,
+                    "max_size": cache_size * 1024**2,
+                    "max_age": cache_max_age,
+                }
+                if cache_dir
+                else None
+            ),
+            ADT_CREATOR_POOL={
+                "processes": creator_processes,
+                "max_tasks_per_child": creator_max_tasks,
+                "memory_limit": creator_memory_limit * 1024**2,
+            },
+            ADT_JOBS=(
+                {
+                    "path": jobs_dir,
+                    "max_depth": jobs_max_depth,
+                    "retention": jobs_retention,
+                }
+                if jobs_dir
+                else None
+            ),
+            ADT_COMPRESSION={"level": compression_level, "threads": compression_threads},
+            ADT_METADATA_REFRESH=metadata_refresh,
+            ADT_METRICS=metrics_directory(metrics_dir),
+            ADT_RESPONSE_VALIDATION=dict(response_validation or []),
+            ADT_ADMISSION={
+                "*": default_budget(
+                    auto_workers(creator_processes) if workers == "auto" else int(workers),
+                    threads,
+                    creator_processes,
+                    event_loop=worker_class == "asgi",
+                ),
+                **dict(admission or []),
+            },
+            # Leave a thread of each worker for the other routes
+            ADT_ADMISSION_PER_WORKER=threads - 1 if worker_class != "asgi" else 0,
+            MIDDLEWARE=(
+                "ansible_dev_tools.resources.server.metrics.MetricsMiddleware",
+                "ansible_dev_tools.resources.server.admission.AdmissionMiddleware",
+            ),
+            LOGGING={
+                "version": 1,
+                "disable_existing_loggers": False,
+                "handlers": {"stderr": {"class": "logging.StreamHandler"}},
+                "loggers": {
+                    "ansible_dev_tools.timing": {
+                        "handlers": ["stderr"],
+                        "level": "INFO" if timing_log or debug else "WARNING",
+                        "propagate": False,
+                    },
+                },
+            },
             MIDDLEWARE_CLASSES=(
                 "django.middleware.common.CommonMiddleware",
                 "django.middleware.csrf.CsrfViewMiddleware",
@@ -96,15 +426,36 @@ class Server:
             ),
         )
         setup()
-        self.application = get_wsgi_application()
+        self.application: WSGIHandler | ASGIHandler = (
+            get_asgi_application() if worker_class == "asgi" else get_wsgi_application()
+        )
 
     def run(self) -> None:
         """Start the server."""
-        options: dict[str, str] = {
-            "bind": f"0.0.0.0:{self.port}",
+        options: dict[str, str | list[str]] = {
+            "bind": self.bind,
+            # Only the owner may connect to a unix socket
+            "umask": "0o077",
             "control_socket_disable": "true",
+            "workers": str(
+                auto_workers(self.creator_processes) if self.workers == "auto" else self.workers
+            ),
+            "threads": str(self.threads),
+            "worker_class": self.worker_class,
+            "timeout": str(self.timeout),
+            "graceful_timeout": str(self.graceful_timeout),
+            "backlog": str(self.backlog),
+            "preload_app": str(self.preload).lower(),
         }
+        if self.worker_class == "asgi":
+            # The threads size the creator executor of the asgi worker instead
+            del options["threads"]
         if self.debug:  # pragma: no cover
             options.update({"loglevel": "debug", "accesslog": "-"})
 
-        AdtServerApp(app=self.application, options=options).run()
+        AdtServerApp(
+            app=self.application,
+            options=options,
+            ready_fd=self.ready_fd,
+            idle_timeout=self.idle_timeout,
+        ).run()
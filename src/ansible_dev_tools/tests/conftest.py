@@ -28,6 +28,7 @@ import select
 import shlex
 import shutil
 import subprocess
+import tempfile
 import time
 
 from dataclasses import dataclass
@@ -62,6 +63,7 @@ class Infrastructure:
         only_container: Only container tests
         proc: The host server process
         proc_container: The container server process
+        cache_dir: The scaffold cache of the host server, removed once it stops
         server: Server required
         navigator_ee: The image to use with ansible navigator
     """
@@ -75,6 +77,7 @@ class Infrastructure:
     only_container: bool = False
     proc: None | subprocess.Popen[bytes] = None
     proc_container: None | subprocess.Popen[bytes] = None
+    cache_dir: str = ""
     server: bool = False
     navigator_ee: str = ""
 
@@ -189,7 +192,7 @@ def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item
 
 
 @pytest.fixture(scope="session")
-def server_url() -> Generator[str, None, None]:
+def server_url(tmp_path_factory: pytest.TempPathFactory) -> Generator[str, None, None]:
     """Start the server and provide its URL.
 
     If the server is already running (e.g., started by pytest_sessionstart hook
@@ -197,6 +200,9 @@ def server_url() -> Generator[str, None, None]:
     the server itself. This allows tests to work both when running from source
     and when running from an installed package via args.
 
+    Args:
+        tmp_path_factory: Pytest tmp_path_factory fixture.
+
     Yields:
         str: The server URL.
     """
@@ -204,8 +210,8 @@ def server_url() -> Generator[str, None, None]:
 
     # Check if server is already running (started by hook when running from source)
     try:
-        res = requests.get(url, timeout=1)
-        if res.status_code == requests.codes.get("not_found"):
+        res = requests.get(f"{url}/readyz", timeout=1)
+        if res.status_code == requests.codes.get("ok"):
             LOGGER.info("Server already running at %s", url)
             yield url
             return
@@ -217,26 +223,31 @@ def server_url() -> Generator[str, None, None]:
     if bin_path is None:
         pytest.fail("adt not found in $PATH")
 
+    # A free port, announced on the ready pipe once the server accepts connections
+    ready_read, ready_write = os.pipe()
     proc = subprocess.Popen(  # noqa: S603
-        [bin_path, "server", "-p", f"{ADT_SERVER_PORT}"],
+        [
+            bin_path,
+            "server",
+            "--port",
+            "0",
+            "--ready-fd",
+            str(ready_write),
+            "--cache-dir",
+            str(tmp_path_factory.mktemp("scaffolds")),
+        ],
         env=os.environ,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
+        pass_fds=(ready_write,),
     )
-
-    # Wait for server to be ready
-    for _ in range(10):
-        try:
-            res = requests.get(url, timeout=0.5)
-            if res.status_code == requests.codes.get("not_found"):
-                break
-        except requests.exceptions.ConnectionError:
-            time.sleep(0.5)
-    else:
+    os.close(ready_write)
+    address = _read_ready(ready_read, timeout=45)
+    if address is None:
         proc.terminate()
         pytest.fail("Could not start the server")
 
-    yield url
+    yield f"http://localhost:{address.rpartition(':')[2]}"
 
     proc.terminate()
     proc.wait()
@@ -488,7 +499,23 @@ def exec_container() -> Callable[[str], subprocess.CompletedProcess[str]]:
     return _exec_container
 
 
-def _start_server(*, container: bool = False) -> None:
+def _read_ready(fd: int, timeout: float) -> str | None:
+    """Read the address a server announces on its ready file descriptor.
+
+    Args:
+        fd: The read end of the ready pipe, closed once read.
+        timeout: Seconds to wait for the server.
+
+    Returns:
+        The server address, or None if the server exited or did not start in time.
+    """
+    with os.fdopen(fd, "rb") as ready:
+        readable, _, _ = select.select([ready], [], [], timeout)
+        line = ready.readline() if readable else b""
+    return line.decode().strip() or None
+
+
+def _start_server(*, container: bool = False) -> None:  # noqa: PLR0915
     """Start the server.
 
     Args:
@@ -523,26 +550,41 @@ def _start_server(*, container: bool = False) -> None:
         if bin_path is None:
             msg = "adt not found in $PATH"
             raise RuntimeError(msg)
-        cmd_args = [bin_path, "server", "-p", ADT_SERVER_PORT, "--debug"]
+        ready_read, ready_write = os.pipe()
+        # An empty cache, so the scaffolds of the tests run ansible-creator
+        INFRASTRUCTURE.cache_dir = tempfile.mkdtemp(prefix="adt-scaffolds-")
+        cmd_args = [
+            bin_path,
+            "server",
+            "-p",
+            ADT_SERVER_PORT,
+            "--debug",
+            "--cache-dir",
+            INFRASTRUCTURE.cache_dir,
+        ]
         msg = f"Starting adt server with `{shlex.join(cmd_args)}` and log file at {server_log_file}"
         LOGGER.warning(msg)
         start_time = time.time()
         with server_log_file.open("w") as log_file:
             proc = subprocess.Popen(  # noqa: S603
-                cmd_args,
+                [*cmd_args, "--ready-fd", str(ready_write)],
                 env=os.environ,
                 stdout=log_file,
                 stderr=subprocess.STDOUT,
+                pass_fds=(ready_write,),
             )
+        os.close(ready_write)
         INFRASTRUCTURE.proc = proc
+        if _read_ready(ready_read, timeout=45) is not None:
+            return
 
     tries = 0
     timeout = 3
-    max_tries = 15
-    while tries < max_tries:
+    max_tries = 15 if container else 0
+    while tries < max_tries:  # pragma: no cover
         try:
-            res = requests.get(f"http://localhost:{port}", timeout=timeout)
-            if res.status_code == requests.codes.get("not_found"):
+            res = requests.get(f"http://localhost:{port}/readyz", timeout=timeout)
+            if res.status_code == requests.codes.get("ok"):
                 if container:  # pragma: no cover
                     _load_container_image()
                 return
@@ -575,6 +617,7 @@ def _stop_server() -> None:
     INFRASTRUCTURE.proc.terminate()
     INFRASTRUCTURE.proc.wait()
     INFRASTRUCTURE.proc = None
+    shutil.rmtree(INFRASTRUCTURE.cache_dir, ignore_errors=True)
 
 
 @pytest.fixture
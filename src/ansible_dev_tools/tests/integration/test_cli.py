@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import json
+
 from typing import Any
 
 import pytest
@@ -28,6 +30,23 @@ def test_version(
         assert pkg in captured.out, f"{pkg} not found in version output"
 
 
+def test_version_json(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test collecting versions as JSON.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+        capsys: Pytest capsys fixture.
+    """
+    monkeypatch.setattr("sys.argv", ["adt", "--version", "--format", "json"])
+    with pytest.raises(SystemExit):
+        main()
+    versions = json.loads(capsys.readouterr().out)
+    assert set(PKGS) <= set(versions)
+
+
 def test_server_fail_no_deps(
     monkeypatch: pytest.MonkeyPatch,
     capsys: pytest.CaptureFixture[str],
@@ -38,6 +38,29 @@ def test_capabilities(server_url: str) -> None:
     assert "execution_env" in init_cmd["subcommands"]
 
 
+def test_capabilities_etag(server_url: str) -> None:
+    """Test the capabilities are served gzip encoded and revalidated by ETag.
+
+    Args:
+        server_url: The server URL.
+    """
+    response = requests.get(
+        f"{server_url}/v2/creator/capabilities",
+        headers={"Accept-Encoding": "gzip"},
+        timeout=10,
+    )
+    assert response.status_code == requests.codes.get("ok")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()["name"] == "ansible-creator"
+    response = requests.get(
+        f"{server_url}/v2/creator/capabilities",
+        headers={"If-None-Match": response.headers["ETag"]},
+        timeout=10,
+    )
+    assert response.status_code == requests.codes.get("not_modified")
+    assert not response.content
+
+
 def test_capabilities_wrong_method(server_url: str) -> None:
     """Test that POST to capabilities returns 400.
 
@@ -242,3 +265,73 @@ def test_scaffold_wrong_method(server_url: str) -> None:
     """
     response = requests.get(f"{server_url}/v2/creator/scaffold", timeout=10)
     assert response.status_code == requests.codes.get("bad_request")
+
+
+# --- Batch tests ---
+
+BATCH_ITEMS: list[dict[str, object]] = [
+    {"command_path": ["init", "collection"], "params": {"collection": "batch.one"}},
+    {"command_path": ["init", "nonexistent"]},
+    {"command_path": ["add", "resource", "devfile"]},
+]
+
+
+def test_batch(server_url: str, tmp_path: Path) -> None:
+    """Test a batch returns the scaffolds and the manifest in one archive.
+
+    Args:
+        server_url: The server URL.
+        tmp_path: Pytest tmp_path fixture.
+    """
+    response = requests.post(
+        f"{server_url}/v2/creator/batch", json={"items": BATCH_ITEMS}, timeout=30
+    )
+    assert response.status_code == requests.codes.get("created")
+    assert response.headers["Content-Disposition"] == 'attachment; filename="batch.tar"'
+    dest_file = tmp_path / "batch.tar"
+    dest_file.write_bytes(response.content)
+    with tarfile.open(dest_file) as file:
+        names = file.getnames()
+        manifest_file = file.extractfile("./manifest.ndjson")
+        assert manifest_file is not None
+        manifest = [json.loads(line) for line in manifest_file]
+    assert "./0-init_collection/galaxy.yml" in names
+    assert "./2-add_resource_devfile/devfile.yaml" in names
+    assert not [name for name in names if name.startswith("./1-")]
+    assert [(entry["index"], entry["status"]) for entry in manifest] == [
+        (0, "success"),
+        (1, "error"),
+        (2, "success"),
+    ]
+    assert manifest[0]["directory"] == "0-init_collection"
+    assert "directory" not in manifest[1]
+
+
+def test_batch_ndjson(server_url: str) -> None:
+    """Test a batch returns only the manifest when NDJSON is accepted.
+
+    Args:
+        server_url: The server URL.
+    """
+    response = requests.post(
+        f"{server_url}/v2/creator/batch",
+        json={"items": BATCH_ITEMS},
+        headers={"Accept": "application/x-ndjson"},
+        timeout=30,
+    )
+    assert response.status_code == requests.codes.get("ok")
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    manifest = [json.loads(line) for line in response.text.splitlines()]
+    assert [entry["command_path"] for entry in manifest] == [
+        item["command_path"] for item in BATCH_ITEMS
+    ]
+
+
+def test_batch_empty(server_url: str) -> None:
+    """Test a batch without items is rejected.
+
+    Args:
+        server_url: The server URL.
+    """
+    response = requests.post(f"{server_url}/v2/creator/batch", json={"items": []}, timeout=10)
+    assert response.status_code == requests.codes.get("bad_request")
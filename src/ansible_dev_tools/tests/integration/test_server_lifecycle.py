@@ -0,0 +1,97 @@
+"""Test starting the dev tools server from a launcher and stopping it when idle."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+
+from typing import TYPE_CHECKING
+
+import requests
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+LAUNCHER = """
+import os, sys
+os.dup2(int(sys.argv[1]), 3)
+os.environ.update(LISTEN_PID=str(os.getpid()), LISTEN_FDS="1")
+os.execv(sys.argv[2], sys.argv[2:])
+"""
+
+
+def test_socket_activation_idle_exit() -> None:
+    """Test the server serves an inherited socket and exits once idle."""
+    bin_path = shutil.which("adt")
+    assert bin_path is not None
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        ready_read, ready_write = os.pipe()
+        # As systemd does, the socket is passed as fd 3 to the process in LISTEN_PID
+        proc = subprocess.Popen(  # noqa: S603
+            [
+                sys.executable,
+                "-c",
+                LAUNCHER,
+                str(listener.fileno()),
+                bin_path,
+                "server",
+                "--idle-timeout",
+                "1",
+                "--ready-fd",
+                str(ready_write),
+            ],
+            pass_fds=(ready_write, listener.fileno()),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        os.close(ready_write)
+    try:
+        with os.fdopen(ready_read, "rb") as ready:
+            assert ready.readline() == f"http://127.0.0.1:{port}\n".encode()
+        response = requests.get(f"http://127.0.0.1:{port}/healthz", timeout=10)
+        assert response.json()["status"] == "alive"
+        assert proc.wait(timeout=30) == 0
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_unix_socket(tmp_path: Path) -> None:
+    """Test the server listens on a unix socket only its owner can connect to.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    bin_path = shutil.which("adt")
+    assert bin_path is not None
+    path = tmp_path / "adt.sock"
+    ready_read, ready_write = os.pipe()
+    proc = subprocess.Popen(  # noqa: S603
+        [bin_path, "server", "--bind", f"unix:{path}", "--ready-fd", str(ready_write)],
+        pass_fds=(ready_write,),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    os.close(ready_write)
+    try:
+        with os.fdopen(ready_read, "rb") as ready:
+            assert ready.readline() == f"unix:{path}\n".encode()
+        assert stat.S_IMODE(path.stat().st_mode) == stat.S_IRWXU
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(str(path))
+            client.sendall(b"GET /healthz HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+            response = b"".join(iter(lambda: client.recv(4096), b""))
+        assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert b'"status": "alive"' in response
+    finally:
+        proc.terminate()
+        proc.wait()
@@ -0,0 +1,99 @@
+"""Tests for the admission control of the server."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+
+from django.test import Client, override_settings
+
+from ansible_dev_tools.resources.server.admission import Budget, configured_budget
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@pytest.fixture(name="budgets")
+def fixture_budgets() -> Iterator[None]:
+    """Allow one scaffold at a time, and one metadata request, without queue.
+
+    Yields:
+        None: The budgets are configured.
+    """
+    configured_budget.cache_clear()
+    with override_settings(ADT_ADMISSION={"*": (1, 0), "/metadata": (1, 0)}):
+        yield
+    configured_budget.cache_clear()
+
+
+def test_budget_queue() -> None:
+    """Test requests wait for a slot until the queue is full."""
+    budget = Budget(limit=1, queue=1)
+    assert budget.acquire()
+    waiter = threading.Thread(target=budget.acquire)
+    waiter.start()
+    while not budget._waiters:
+        waiter.join(0.01)
+    assert not budget.acquire()
+    budget.release()
+    waiter.join()
+    # The slot was handed over to the waiting request, which holds it
+    assert budget._running == 1
+    budget.release()
+    assert budget._running == 0
+
+
+def test_budget_async_cancelled() -> None:
+    """Test a cancelled waiting request leaves the queue."""
+
+    async def scenario() -> None:
+        budget = Budget(limit=1, queue=1)
+        assert await budget.acquire_async()
+        waiter = asyncio.ensure_future(budget.acquire_async())
+        await asyncio.sleep(0)
+        assert not await budget.acquire_async()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not budget._waiters
+        budget.release()
+        assert await budget.acquire_async()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.usefixtures("budgets")
+def test_scaffold_rejected() -> None:
+    """Test scaffolds over budget are rejected without starving the metadata."""
+    shared = configured_budget("*")
+    assert shared is not None
+    assert shared.acquire()
+    try:
+        client = Client()
+        response = client.post("/v2/creator/ee_project", content_type="application/json")
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response["Retry-After"] == "1"
+        assert client.get("/metadata").status_code == HTTPStatus.OK
+    finally:
+        shared.release()
+
+
+@pytest.mark.usefixtures("budgets")
+def test_route_budget() -> None:
+    """Test a route with a budget of its own is rejected when it is exhausted."""
+    budget = configured_budget("/metadata")
+    assert budget is not None
+    assert budget.acquire()
+    try:
+        response = Client().get("/metadata")
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.json()["code"] == HTTPStatus.TOO_MANY_REQUESTS
+    finally:
+        budget.release()
+    assert Client().get("/metadata").status_code == HTTPStatus.OK
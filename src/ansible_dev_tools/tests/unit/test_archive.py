@@ -0,0 +1,230 @@
+"""Tests for the scaffold archives."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import zipfile
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from django.test import RequestFactory
+
+from ansible_dev_tools.resources.server.archive import (
+    ARCHIVE_MTIME,
+    TAR,
+    TAR_GZIP,
+    TAR_ZSTD,
+    ZIP,
+    ArchiveFormat,
+    archive_response,
+    gzip_chunks,
+    iter_tar,
+    negotiate,
+    temporary_archive,
+    zip_chunks,
+)
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _scaffold(path: Path) -> Path:
+    """Create a directory tree to archive.
+
+    Args:
+        path: The parent directory.
+
+    Returns:
+        The directory to archive.
+    """
+    directory = path / "scaffold"
+    (directory / "roles" / "run").mkdir(parents=True)
+    (directory / "README.md").write_text("readme\n")
+    (directory / "roles" / "run" / "main.yml").write_bytes(b"-" * 70000)
+    (directory / "link").symlink_to("README.md")
+    return directory
+
+
+def _canonical(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    """Normalize a member as the canonical archives do.
+
+    Args:
+        info: The member.
+
+    Returns:
+        The normalized member.
+    """
+    info.mtime = ARCHIVE_MTIME
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    info.mode = 0o777 if info.issym() else 0o755 if info.isdir() or info.mode & 0o100 else 0o644
+    return info
+
+
+def test_iter_tar(tmp_path: Path) -> None:
+    """Test the streamed archive matches the one written by tarfile.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    directory = _scaffold(tmp_path)
+    expected = io.BytesIO()
+    with tarfile.open(fileobj=expected, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        tar.add(str(directory), arcname=".", filter=_canonical)
+    chunks = list(iter_tar(directory))
+    assert b"".join(chunks) == expected.getvalue()
+    assert max(len(chunk) for chunk in chunks) <= tarfile.RECORDSIZE * 7
+
+
+def test_iter_tar_reproducible(tmp_path: Path) -> None:
+    """Test identical scaffolds produce the same archive.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    first = _scaffold(tmp_path / "first")
+    second = _scaffold(tmp_path / "second")
+    # Another date, a group writable file and an executable
+    os.utime(second / "README.md", (0, 1234567890))
+    (second / "README.md").chmod(0o664)
+    (first / "roles" / "run" / "main.yml").chmod(0o700)
+    (second / "roles" / "run" / "main.yml").chmod(0o775)
+    archive = b"".join(iter_tar(first))
+    assert archive == b"".join(iter_tar(second))
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        modes = (tar.getmember("./roles/run/main.yml").mode, tar.getmember("./README.md").mode)
+        assert modes == (0o755, 0o644)
+        assert {member.mtime for member in tar} == {ARCHIVE_MTIME}
+        assert not tar.pax_headers
+
+
+def test_temporary_archive(tmp_path: Path) -> None:
+    """Test the archive file outlives the scaffold and is closed with the response.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    directory = _scaffold(tmp_path)
+    expected = b"".join(iter_tar(directory))
+    file, headers = temporary_archive(
+        iter_tar(directory), ArchiveFormat(TAR_GZIP, "gzip"), "scaffold"
+    )
+    shutil.rmtree(directory)
+    digest = hashlib.sha256(expected).hexdigest()
+    assert headers == {
+        "Content-Type": TAR_GZIP,
+        "Content-Disposition": 'attachment; filename="scaffold.tar.gz"',
+        "ETag": f'"{digest}-gzip"',
+        "Vary": "Accept, Accept-Encoding",
+        "X-Archive-SHA256": digest,
+    }
+    response = archive_response(file, headers)
+    assert response.file_to_stream is file
+    assert response["Content-Disposition"] == headers["Content-Disposition"]
+    content = response.getvalue()
+    assert response["Content-Length"] == str(len(content))
+    assert gzip.decompress(content) == expected
+    response.close()
+    assert file.closed
+
+
+@pytest.mark.parametrize(
+    ("accept", "accept_encoding", "expected"),
+    (
+        pytest.param("", "", ArchiveFormat(TAR), id="none"),
+        pytest.param("*/*", "identity", ArchiveFormat(TAR), id="any"),
+        pytest.param("application/json", "", ArchiveFormat(TAR), id="unsupported"),
+        pytest.param(TAR_GZIP, "", ArchiveFormat(TAR_GZIP, "gzip"), id="tar-gzip"),
+        pytest.param(f"{TAR}, {ZIP}", "", ArchiveFormat(ZIP, "zip"), id="zip-tie"),
+        pytest.param(f"{TAR}, {ZIP};q=0.5", "", ArchiveFormat(TAR), id="zip-lower"),
+        pytest.param(
+            f"{ZIP};q=0", "gzip", ArchiveFormat(TAR, "gzip", content_encoding=True), id="encoding"
+        ),
+        pytest.param("", "gzip;q=0, br", ArchiveFormat(TAR), id="encoding-refused"),
+    ),
+)
+def test_negotiate(accept: str, accept_encoding: str, expected: ArchiveFormat) -> None:
+    """Test the archive format negotiation.
+
+    Args:
+        accept: The Accept header.
+        accept_encoding: The Accept-Encoding header.
+        expected: The negotiated format.
+    """
+    request = RequestFactory().get(
+        "/", headers={"Accept": accept, "Accept-Encoding": accept_encoding}
+    )
+    assert negotiate(request) == expected
+
+
+def test_negotiate_zstd() -> None:
+    """Test zstd is preferred when the client accepts it."""
+    pytest.importorskip("zstandard")
+    request = RequestFactory().get(
+        "/", headers={"Accept": f"{TAR_GZIP}, {TAR_ZSTD}", "Accept-Encoding": "gzip, zstd"}
+    )
+    assert negotiate(request) == ArchiveFormat(TAR_ZSTD, "zstd")
+    request = RequestFactory().get("/", headers={"Accept-Encoding": "gzip, zstd"})
+    assert negotiate(request) == ArchiveFormat(TAR, "zstd", content_encoding=True)
+
+
+@pytest.mark.parametrize("threads", (1, 3), ids=("single", "threaded"))
+def test_gzip_chunks(tmp_path: Path, threads: int) -> None:
+    """Test the gzip stream decompresses to the tar archive.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        threads: The number of compression threads.
+    """
+    directory = _scaffold(tmp_path)
+    # Several blocks, the last one partial
+    (directory / "large.txt").write_text("scaffold\n" * 50000)
+    expected = b"".join(iter_tar(directory))
+    compressed = b"".join(gzip_chunks(iter_tar(directory), 6, threads))
+    assert gzip.decompress(compressed) == expected
+    assert len(compressed) < len(expected) // 10
+
+
+def test_zstd_chunks(tmp_path: Path) -> None:
+    """Test the zstd frame decompresses to the tar archive.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    zstandard = pytest.importorskip("zstandard")
+    from ansible_dev_tools.resources.server.archive import zstd_chunks  # noqa: PLC0415
+
+    directory = _scaffold(tmp_path)
+    expected = b"".join(iter_tar(directory))
+    compressed = b"".join(zstd_chunks(iter_tar(directory), 3, 2))
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == expected
+
+
+def test_zip_chunks(tmp_path: Path) -> None:
+    """Test the zip archive holds the entries of the tar archive.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    directory = _scaffold(tmp_path)
+    data = b"".join(zip_chunks(iter_tar(directory), 6))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == [
+            "README.md",
+            "link",
+            "roles/",
+            "roles/run/",
+            "roles/run/main.yml",
+        ]
+        assert archive.read("README.md") == b"readme\n"
+        assert archive.read("roles/run/main.yml") == b"-" * 70000
+        assert archive.read("link") == b"README.md"
+        assert archive.getinfo("roles/").is_dir()
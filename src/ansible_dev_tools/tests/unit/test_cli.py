@@ -2,8 +2,16 @@
 
 from __future__ import annotations
 
+import argparse
+import os
+import subprocess
+import sys
+
+from typing import NoReturn
+
 import pytest
 
+from ansible_dev_tools.arg_parser import admission, bind, response_validation, workers
 from ansible_dev_tools.cli import Cli
 
 
@@ -18,3 +26,188 @@ def test_cli_subcommand_missing() -> None:
     cli.args = {"subcommand": "missing"}
     with pytest.raises(ImportError):
         cli.run()
+
+
+def test_cli_versions_not_resolved(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the tool versions are only resolved when --version is passed.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+
+    def fail() -> NoReturn:
+        """Fail if the versions are resolved.
+
+        Raises:
+            AssertionError: Always.
+        """
+        msg = "Versions resolved without --version"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr("ansible_dev_tools.arg_parser.version_builder", fail)
+    monkeypatch.setattr("sys.argv", ["adt", "server", "--port", "8080"])
+    cli = Cli()
+    cli.parse_args()
+    assert cli.args == {
+        "subcommand": "server",
+        "port": "8080",
+        "debug": False,
+        "bind": None,
+        "response_validation": None,
+        "admission": None,
+        "workers": 1,
+        "threads": 1,
+        "worker_class": "sync",
+        "timeout": 30,
+        "graceful_timeout": 30,
+        "backlog": 2048,
+        "preload": False,
+        "cache_dir": None,
+        "cache_size": 512,
+        "cache_max_age": 86400,
+        "compression_level": 6,
+        "compression_threads": 2,
+        "creator_processes": 2,
+        "creator_max_tasks": 100,
+        "creator_memory_limit": 0,
+        "jobs_dir": None,
+        "jobs_max_depth": 64,
+        "jobs_retention": 3600,
+        "metadata_refresh": False,
+        "metrics_dir": None,
+        "timing_log": False,
+        "ready_fd": None,
+        "idle_timeout": 0,
+    }
+
+
+def test_cli_format_without_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test --format is rejected without --version.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr("sys.argv", ["adt", "--format", "json", "server"])
+    with pytest.raises(SystemExit) as exc:
+        Cli().parse_args()
+    assert exc.value.code == 2  # noqa: PLR2004
+
+
+def test_cli_version_closed_pipe() -> None:
+    """Test the versions are printed without a traceback to a reader going away."""
+    read_end, write_end = os.pipe()
+    # The reader went away before the versions are printed
+    os.close(read_end)
+    try:
+        adt = subprocess.run(
+            [sys.executable, "-m", "ansible_dev_tools", "--version", "--format", "json"],
+            stdout=write_end,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+    finally:
+        os.close(write_end)
+    assert adt.stderr == b""
+    assert adt.returncode == 0
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        ("strict", ("*", 1)),
+        ("off", ("*", 0)),
+        ("sampled:10", ("*", 10)),
+        ("/v2/creator/scaffold=off", ("/v2/creator/scaffold", 0)),
+    ),
+)
+def test_response_validation(value: str, expected: tuple[str, int]) -> None:
+    """Test parsing the response validation modes.
+
+    Args:
+        value: The command line value.
+        expected: The expected route and rate.
+    """
+    assert response_validation(value) == expected
+
+
+@pytest.mark.parametrize("value", ("sampled", "sampled:0", "lax"))
+def test_response_validation_invalid(value: str) -> None:
+    """Test invalid response validation modes are rejected.
+
+    Args:
+        value: The command line value.
+    """
+    with pytest.raises(argparse.ArgumentTypeError):
+        response_validation(value)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        ("2:4", ("*", (2, 4))),
+        ("off", ("*", None)),
+        ("/metadata=8:0", ("/metadata", (8, 0))),
+    ),
+)
+def test_admission(value: str, expected: tuple[str, tuple[int, int] | None]) -> None:
+    """Test parsing the admission budgets.
+
+    Args:
+        value: The command line value.
+        expected: The expected route and budget.
+    """
+    assert admission(value) == expected
+
+
+@pytest.mark.parametrize("value", ("2", "0:4", "2:-1", "many"))
+def test_admission_invalid(value: str) -> None:
+    """Test invalid admission budgets are rejected.
+
+    Args:
+        value: The command line value.
+    """
+    with pytest.raises(argparse.ArgumentTypeError):
+        admission(value)
+
+
+@pytest.mark.parametrize("value", ("127.0.0.1:8000", "[::1]:8000", "unix:/run/adt.sock"))
+def test_bind(value: str) -> None:
+    """Test parsing the server addresses.
+
+    Args:
+        value: The command line value.
+    """
+    assert bind(value) == value
+
+
+@pytest.mark.parametrize("value", ("unix:", "localhost", ":8000", "localhost:http"))
+def test_bind_invalid(value: str) -> None:
+    """Test invalid server addresses are rejected.
+
+    Args:
+        value: The command line value.
+    """
+    with pytest.raises(argparse.ArgumentTypeError):
+        bind(value)
+
+
+@pytest.mark.parametrize(("value", "expected"), (("4", 4), ("auto", "auto")))
+def test_workers(value: str, expected: int | str) -> None:
+    """Test parsing the number of server workers.
+
+    Args:
+        value: The command line value.
+        expected: The expected number of workers.
+    """
+    assert workers(value) == expected
+
+
+@pytest.mark.parametrize("value", ("0", "-1", "many"))
+def test_workers_invalid(value: str) -> None:
+    """Test invalid numbers of server workers are rejected.
+
+    Args:
+        value: The command line value.
+    """
+    with pytest.raises(argparse.ArgumentTypeError):
+        workers(value)
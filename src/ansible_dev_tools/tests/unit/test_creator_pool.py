@@ -0,0 +1,122 @@
+"""Tests for the creator process pool."""
+
+from __future__ import annotations
+
+import os
+import signal
+import sys
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING
+
+import pytest
+
+from django.test import override_settings
+
+from ansible_dev_tools.resources.server.creator_backend import CreatorBackendV2
+from ansible_dev_tools.resources.server.creator_pool import (
+    creator_pool,
+    run_backend,
+    submit,
+    template_modules,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+@pytest.fixture(name="pool_settings")
+def fixture_pool_settings() -> Iterator[dict[str, int]]:
+    """Start a dedicated creator pool of a single process.
+
+    Yields:
+        dict[str, int]: The pool settings, updated before the pool is first used.
+    """
+    config = {"processes": 1, "max_tasks_per_child": 0, "memory_limit": 0}
+    creator_pool.cache_clear()
+    with override_settings(ADT_CREATOR_POOL=config):
+        yield config
+        creator_pool().shutdown()
+    creator_pool.cache_clear()
+
+
+def _loaded(names: tuple[str, ...]) -> bool:
+    """Tell whether modules are imported, in a process of the pool.
+
+    Args:
+        names: The module names.
+
+    Returns:
+        Whether every module is imported.
+    """
+    return all(name in sys.modules for name in names)
+
+
+def _allocate(size: int) -> int:
+    """Allocate memory, in a process of the pool.
+
+    Args:
+        size: The number of bytes.
+
+    Returns:
+        The number of bytes allocated.
+    """
+    return len(bytearray(size))
+
+
+@pytest.mark.usefixtures("pool_settings")
+def test_warm() -> None:
+    """Test the pool processes have loaded the creator templates."""
+    assert submit(_loaded, template_modules()).result()
+
+
+@pytest.mark.usefixtures("pool_settings")
+def test_backend_light(tmp_path: Path) -> None:
+    """Test running a backend does not load the server views in the pool.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    submit(run_backend, CreatorBackendV2(tmp_path), "ee_project", {}).result()
+    assert not submit(_loaded, ("ansible_dev_tools.server_utils",)).result()
+    assert not submit(_loaded, ("openapi_core",)).result()
+
+
+def test_max_tasks(pool_settings: dict[str, int]) -> None:
+    """Test a process is replaced after its maximum number of commands.
+
+    Args:
+        pool_settings: The pool settings.
+    """
+    pool_settings["max_tasks_per_child"] = 1
+    first = submit(os.getpid).result()
+    assert submit(os.getpid).result() != first
+
+
+def test_memory_limit(pool_settings: dict[str, int]) -> None:
+    """Test a command over the memory limit fails, not the process.
+
+    Args:
+        pool_settings: The pool settings.
+    """
+    pool_settings["memory_limit"] = 2**30
+    with pytest.raises(MemoryError):
+        submit(_allocate, 2**31).result()
+    assert submit(_allocate, 2**20).result() == 2**20
+
+
+@pytest.mark.usefixtures("pool_settings")
+def test_broken_pool() -> None:
+    """Test a pool broken by a killed process is replaced."""
+    pool = creator_pool()
+    pid = submit(os.getpid).result()
+    running = submit(time.sleep, 60)
+    os.kill(pid, signal.SIGKILL)
+    with pytest.raises(BrokenProcessPool):
+        running.result()
+    assert submit(os.getpid).result() != pid
+    assert creator_pool() is not pool
+    pool.shutdown()
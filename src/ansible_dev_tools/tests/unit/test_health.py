@@ -0,0 +1,64 @@
+"""Tests for the liveness and readiness probes."""
+
+from __future__ import annotations
+
+import os
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+
+from django.test import Client, override_settings
+
+from ansible_dev_tools.resources.server import health
+from ansible_dev_tools.resources.server.job_queue import job_queue
+from ansible_dev_tools.resources.server.metrics import metrics
+from ansible_dev_tools.resources.server.scaffold_cache import scaffold_cache
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+FACTORIES = (job_queue, metrics, scaffold_cache)
+
+
+@pytest.fixture(name="no_state")
+def fixture_no_state() -> Iterator[None]:
+    """Disable the job queue, metrics and scaffold cache opened by the warm-up.
+
+    Yields:
+        None: The state is disabled.
+    """
+    for factory in FACTORIES:
+        factory.cache_clear()
+    with override_settings(ADT_JOBS=None, ADT_METRICS=None, ADT_SCAFFOLD_CACHE=None):
+        yield
+    for factory in FACTORIES:
+        factory.cache_clear()
+
+
+def test_healthz() -> None:
+    """Test the liveness probe answers from the worker process."""
+    response = Client().get("/healthz")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"status": "alive", "pid": os.getpid()}
+
+
+@pytest.mark.usefixtures("no_state")
+def test_readyz(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the readiness probe only succeeds once the worker is warmed up.
+
+    Args:
+        monkeypatch: pytest fixture to patch the warm-up state.
+    """
+    monkeypatch.setattr(health, "_WARM_UP_SECONDS", {})
+    client = Client()
+    response = client.get("/readyz")
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json()["status"] == "warming up"
+    seconds = health.warm_up_worker()
+    response = client.get("/readyz")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["warm_up_seconds"] == round(seconds, 3)
@@ -0,0 +1,72 @@
+"""Tests for the activity tracking of the server."""
+
+from __future__ import annotations
+
+import multiprocessing
+import time
+
+from typing import TYPE_CHECKING
+
+from django.test import Client
+
+from ansible_dev_tools.resources.server import idle
+
+
+if TYPE_CHECKING:
+    from multiprocessing.synchronize import Event
+
+    import pytest
+
+
+def test_activity() -> None:
+    """Test the server is idle only once nothing runs."""
+    activity = idle.Activity()
+    with activity.busy():
+        assert activity.idle_for() == 0
+    assert activity.idle_for() > 0
+    stopped: list[bool] = []
+    activity.watch(0.01, lambda: stopped.append(True))
+    assert stopped
+
+
+def test_killed_worker() -> None:
+    """Test a worker killed in the middle of a request does not keep the server busy."""
+    activity = idle.Activity()
+    context = multiprocessing.get_context("fork")
+    started = context.Event()
+    worker = context.Process(target=_hang, args=(activity, started))
+    worker.start()
+    started.wait()
+    worker.kill()
+    worker.join()
+    assert activity.idle_for() == 0
+    activity.forget(worker.pid or 0)
+    assert activity.idle_for() > 0
+
+
+def _hang(activity: idle.Activity, started: Event) -> None:
+    """Start a request which never finishes, in a forked worker.
+
+    Args:
+        activity: The activity of the workers.
+        started: Set once the request started.
+    """
+    activity.update(1)
+    started.set()
+    time.sleep(60)
+
+
+def test_track_requests(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test requests and jobs are tracked once the activity is.
+
+    Args:
+        monkeypatch: pytest fixture to restore the tracked activity.
+    """
+    monkeypatch.setattr(idle, "_ACTIVITY", None)
+    activity = idle.track_activity()
+    running: list[int] = []
+    monkeypatch.setattr(activity, "update", running.append)
+    Client().get("/healthz")
+    with idle.busy():
+        pass
+    assert running == [1, -1, 1, -1]
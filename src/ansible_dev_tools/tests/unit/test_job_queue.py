@@ -0,0 +1,252 @@
+"""Tests for the scaffold job queue."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import tarfile
+import time
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+
+from django.test import Client, override_settings
+
+from ansible_dev_tools.resources.server.job_queue import (
+    FAILED,
+    QUEUED,
+    RUNNING,
+    SUCCEEDED,
+    IdempotencyConflictError,
+    JobQueue,
+    QueueFullError,
+    job_queue,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+SCAFFOLD = {"command_path": ["init", "collection"], "params": {"collection": "jobs.test"}}
+
+
+@pytest.fixture(name="server_jobs")
+def fixture_server_jobs(tmp_path: Path) -> Iterator[Path]:
+    """Enable the job queue of the server in a temporary directory.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+
+    Yields:
+        Path: The jobs directory.
+    """
+    path = tmp_path / "jobs"
+    config = {"path": str(path), "max_depth": 4, "retention": 3600}
+    job_queue.cache_clear()
+    with override_settings(ADT_JOBS=config):
+        yield path
+    job_queue.cache_clear()
+
+
+def test_submit_idempotent(tmp_path: Path) -> None:
+    """Test a retried submission returns the first job.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    queue = JobQueue(tmp_path, max_depth=4, retention=3600)
+    job, created = queue.submit(SCAFFOLD, "key")
+    assert created
+    assert job.status == QUEUED
+    assert queue.submit(SCAFFOLD, "key") == (job, False)
+    assert queue.submit(SCAFFOLD)[0].id != job.id
+    with pytest.raises(IdempotencyConflictError):
+        queue.submit({"command_path": ["init", "playbook"]}, "key")
+
+
+def test_submit_full(tmp_path: Path) -> None:
+    """Test the queue rejects jobs over its depth, but not retries.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    queue = JobQueue(tmp_path, max_depth=2, retention=3600)
+    job, _ = queue.submit(SCAFFOLD, "first")
+    queue.submit(SCAFFOLD)
+    with pytest.raises(QueueFullError):
+        queue.submit(SCAFFOLD)
+    assert queue.submit(SCAFFOLD, "first") == (job, False)
+
+
+def test_run_next(tmp_path: Path) -> None:
+    """Test jobs run in submission order and keep their archive.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    queue = JobQueue(tmp_path, max_depth=4, retention=3600)
+    assert not queue.run_next()
+    job, _ = queue.submit(SCAFFOLD)
+    failing, _ = queue.submit({"command_path": ["init", "collection"], "params": {}})
+    assert queue.run_next()
+    done = queue.get(job.id)
+    assert done is not None
+    assert done.status == SUCCEEDED
+    assert done.started is not None
+    assert queue.describe(done)["result"] == f"/v2/jobs/{job.id}/result"
+    with tarfile.open(queue.result(done)) as tar:
+        assert "./galaxy.yml" in tar.getnames()
+    assert queue.run_next()
+    failed = queue.get(failing.id)
+    assert failed is not None
+    assert failed.status == FAILED
+    assert failed.message
+    assert queue.describe(failed)["result"] is None
+
+
+def test_expire(tmp_path: Path) -> None:
+    """Test finished jobs are dropped with their archive after the retention.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    queue = JobQueue(tmp_path, max_depth=1, retention=0)
+    job, _ = queue.submit(SCAFFOLD)
+    assert queue.run_next()
+    assert queue.get(job.id) is None
+    assert queue.result(job).exists()
+    # The finished job no longer counts against the depth
+    queue.submit(SCAFFOLD)
+    assert not queue.result(job).exists()
+
+
+def test_requeue_dead_runner(tmp_path: Path) -> None:
+    """Test a job left running by a process that is gone is queued again.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    queue = JobQueue(tmp_path, max_depth=4, retention=3600)
+    assert not queue._pending()
+    job, _ = queue.submit(SCAFFOLD)
+    assert queue._pending()
+    claimed = queue._claim()
+    assert claimed is not None
+    assert claimed.status == RUNNING
+    assert not queue._pending()
+    assert queue._claim() is None
+    dead = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    with queue._db:
+        queue._db.execute("UPDATE jobs SET runner = ? WHERE id = ?", (int(dead.stdout), job.id))
+    assert queue._pending()
+    reclaimed = queue._claim()
+    assert reclaimed is not None
+    assert reclaimed.id == job.id
+
+
+def _wait(client: Client, location: str) -> dict[str, object]:
+    """Poll a job until it finished.
+
+    Args:
+        client: The test client.
+        location: The job URL.
+
+    Returns:
+        The finished job.
+    """
+    deadline = time.monotonic() + 60
+    while True:
+        job: dict[str, object] = client.get(location).json()
+        if job["status"] in {SUCCEEDED, FAILED} or time.monotonic() > deadline:
+            return job
+        time.sleep(0.1)
+
+
+def test_jobs_api(server_jobs: Path) -> None:
+    """Test a job is submitted, polled and its archive downloaded.
+
+    Args:
+        server_jobs: The jobs directory of the server.
+    """
+    client = Client()
+    response = client.post(
+        "/v2/jobs",
+        SCAFFOLD,
+        content_type="application/json",
+        headers={"Idempotency-Key": "api"},
+    )
+    assert response.status_code == HTTPStatus.ACCEPTED
+    location = response["Location"]
+    assert location == f"/v2/jobs/{response.json()['id']}"
+    retry = client.post(
+        "/v2/jobs",
+        SCAFFOLD,
+        content_type="application/json",
+        headers={"Idempotency-Key": "api"},
+    )
+    assert retry["Location"] == location
+    job = _wait(client, location)
+    assert job["status"] == SUCCEEDED
+    assert (server_jobs / "jobs.sqlite3").exists()
+
+    response = client.get(f"{location}/result", headers={"Accept": "application/tar+gzip"})
+    assert response.status_code == HTTPStatus.OK
+    assert response["Content-Type"] == "application/tar+gzip"
+    assert response["Content-Disposition"].endswith('.tar.gz"')
+    response.close()
+
+
+@pytest.mark.usefixtures("server_jobs")
+def test_jobs_api_errors() -> None:
+    """Test the errors of the job API."""
+    client = Client()
+    response = client.get("/v2/jobs/unknown")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    response = client.get("/v2/jobs/unknown/result")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    response = client.post(
+        "/v2/jobs",
+        {"command_path": ["init", "collection"], "params": {}},
+        content_type="application/json",
+        headers={"Idempotency-Key": "errors"},
+    )
+    location = response["Location"]
+    response = client.post(
+        "/v2/jobs",
+        SCAFFOLD,
+        content_type="application/json",
+        headers={"Idempotency-Key": "errors"},
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert _wait(client, location)["status"] == FAILED
+    response = client.get(f"{location}/result")
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json()["status"] == FAILED
+
+
+@pytest.mark.usefixtures("server_jobs")
+def test_jobs_api_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a full queue asks the client to retry later.
+
+    Args:
+        monkeypatch: pytest fixture to stop the runner from draining the queue.
+    """
+    monkeypatch.setattr(JobQueue, "run_forever", lambda _self: None)
+    client = Client()
+    statuses = [
+        client.post("/v2/jobs", SCAFFOLD, content_type="application/json").status_code
+        for _ in range(5)
+    ]
+    assert statuses == [HTTPStatus.ACCEPTED] * 4 + [HTTPStatus.TOO_MANY_REQUESTS]
+    response = client.post("/v2/jobs", SCAFFOLD, content_type="application/json")
+    assert response["Retry-After"]
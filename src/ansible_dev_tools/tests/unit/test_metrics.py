@@ -0,0 +1,181 @@
+"""Tests for the server metrics."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+
+from django.test import Client, override_settings
+
+from ansible_dev_tools.resources.server.metrics import (
+    ARCHIVE_SIZE,
+    IN_FLIGHT,
+    REQUESTS,
+    TIMING_LOGGER,
+    Metrics,
+    Samples,
+    metrics,
+    metrics_directory,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+@pytest.fixture(name="server_metrics")
+def fixture_server_metrics(tmp_path: Path) -> Iterator[Path]:
+    """Enable the metrics of the server in a temporary directory, without cache.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+
+    Yields:
+        Path: The metrics directory.
+    """
+    path = tmp_path / "metrics"
+    metrics.cache_clear()
+    # Scaffolds are timed on a cache miss only
+    with override_settings(ADT_METRICS=str(path), ADT_SCAFFOLD_CACHE=None):
+        yield path
+    metrics.cache_clear()
+
+
+def _dead_pid() -> int:
+    """Return the pid of a process which exited.
+
+    Returns:
+        The process id.
+    """
+    process = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return int(process.stdout)
+
+
+def test_collect_processes(tmp_path: Path) -> None:
+    """Test the metrics of exited processes only keep their counters and histograms.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    store = Metrics(tmp_path)
+    store.inc(REQUESTS, route="/metadata", method="GET", status="200")
+    store.inc(IN_FLIGHT)
+    exited = Samples()
+    exited.values[REQUESTS.name, (("method", "GET"), ("route", "/metadata"), ("status", "200"))] = 2
+    exited.values[IN_FLIGHT.name, ()] = 5
+    (tmp_path / f"{_dead_pid()}.json").write_text(exited.dump())
+
+    text = store.collect()
+    assert 'adt_http_requests_total{method="GET",route="/metadata",status="200"} 3' in text
+    assert "adt_http_requests_in_flight 1\n" in text
+    assert "# TYPE adt_tmp_filesystem_free_bytes gauge" in text
+    assert "# HELP adt_tmp_filesystem_used_bytes Used space of the whole filesystem" in text
+
+
+def test_histogram(tmp_path: Path) -> None:
+    """Test histograms are exposed with cumulated buckets.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    store = Metrics(tmp_path)
+    store.observe(ARCHIVE_SIZE, 1024, compression="gzip")
+    store.observe(ARCHIVE_SIZE, 5000, compression="gzip")
+    store.observe(ARCHIVE_SIZE, 2**40, compression="gzip")
+    text = store.collect()
+    assert 'adt_archive_size_bytes_bucket{compression="gzip",le="1024"} 1' in text
+    assert 'adt_archive_size_bytes_bucket{compression="gzip",le="16384"} 2' in text
+    assert 'adt_archive_size_bytes_bucket{compression="gzip",le="+Inf"} 3' in text
+    assert 'adt_archive_size_bytes_count{compression="gzip"} 3' in text
+    assert f'adt_archive_size_bytes_sum{{compression="gzip"}} {1024 + 5000 + 2**40}' in text
+
+
+def test_metrics_directory(tmp_path: Path) -> None:
+    """Test only the metrics of the processes which exited are removed.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    dead = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    (tmp_path / f"{int(dead.stdout)}.json").write_text("{}")
+    (tmp_path / f"{os.getpid()}.json").write_text("{}")
+    (tmp_path / "settings.json").write_text("{}")
+    assert metrics_directory(str(tmp_path)) == str(tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"{os.getpid()}.json",
+        "settings.json",
+    ]
+
+
+@pytest.mark.usefixtures("server_metrics")
+def test_metrics_endpoint() -> None:
+    """Test the requests, scaffolds and validations are exposed."""
+    client = Client()
+    assert client.get("/metadata").status_code == HTTPStatus.OK
+    client.post(
+        "/v2/creator/ee_project",
+        content_type="application/json",
+        headers={"Accept": "application/tar+gzip"},
+    ).close()
+    response = client.get("/metrics")
+    assert response.status_code == HTTPStatus.OK
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = response.content.decode()
+    assert 'adt_http_requests_total{method="GET",route="/metadata",status="200"} 1' in text
+    assert 'adt_http_request_duration_seconds_count{method="GET",route="/metadata"} 1' in text
+    assert 'adt_scaffold_duration_seconds_count{project="ee_project"} 1' in text
+    assert 'adt_archive_size_bytes_count{compression="gzip"} 1' in text
+    assert 'adt_openapi_validation_seconds_count{kind="request"}' in text
+    # The metrics request itself is in flight
+    assert "adt_http_requests_in_flight 1\n" in text
+
+
+def test_metrics_disabled() -> None:
+    """Test the endpoint answers 404 when the metrics are disabled."""
+    metrics.cache_clear()
+    try:
+        with override_settings(ADT_METRICS=None):
+            assert Client().get("/metrics").status_code == HTTPStatus.NOT_FOUND
+    finally:
+        metrics.cache_clear()
+
+
+@pytest.mark.usefixtures("server_metrics")
+def test_server_timing(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the phases of a creator request are reported and logged.
+
+    Args:
+        caplog: pytest fixture to capture logs.
+    """
+    with caplog.at_level(logging.INFO, logger=TIMING_LOGGER.name):
+        response = Client().post(
+            "/v2/creator/ee_project",
+            content_type="application/json",
+            headers={"Accept": "application/tar+gzip"},
+        )
+        phases = [entry.partition(";")[0] for entry in response["Server-Timing"].split(", ")]
+        assert phases == ["queue", "validate", "scaffold", "archive", "validate-response", "total"]
+        response.close()
+    logged = json.loads(caplog.records[-1].getMessage())
+    assert logged["route"] == "/v2/creator/ee_project"
+    assert logged["status"] == HTTPStatus.CREATED
+    assert [*logged["ms"]] == [*phases, "send"]
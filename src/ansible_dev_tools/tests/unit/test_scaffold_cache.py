@@ -0,0 +1,269 @@
+"""Tests for the scaffold cache."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import tarfile
+import time
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+import yaml
+
+from django.test import Client, override_settings
+
+from ansible_dev_tools.resources.server.archive import TAR, TAR_GZIP, ArchiveFormat
+from ansible_dev_tools.resources.server.scaffold_cache import ScaffoldCache, scaffold_cache
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+@pytest.fixture(name="scaffold")
+def fixture_scaffold(tmp_path: Path) -> Path:
+    """Create a scaffolded directory to cache.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+
+    Returns:
+        The scaffolded directory.
+    """
+    directory = tmp_path / "scaffold"
+    directory.mkdir()
+    (directory / "README.md").write_text("a" * 1024)
+    return directory
+
+
+def _store(cache: ScaffoldCache, key: str, directory: Path) -> bytes:
+    """Store a scaffold as the server does.
+
+    Args:
+        cache: The scaffold cache.
+        key: The cache key.
+        directory: The scaffolded directory.
+
+    Returns:
+        The stored archive.
+    """
+    entry = cache.store(key, directory, ArchiveFormat(TAR), "scaffold")
+    with entry.file:
+        return entry.file.read()
+
+
+@pytest.fixture(name="server_cache")
+def fixture_server_cache(tmp_path: Path) -> Iterator[Path]:
+    """Enable the scaffold cache of the server in a temporary directory.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+
+    Yields:
+        Path: The cache directory.
+    """
+    path = tmp_path / "cache"
+    config = {"path": str(path), "max_size": 2**30, "max_age": 3600}
+    scaffold_cache.cache_clear()
+    with override_settings(ADT_SCAFFOLD_CACHE=config):
+        yield path
+    scaffold_cache.cache_clear()
+
+
+def test_key_normalized() -> None:
+    """Test the key does not depend on the order of the parameters."""
+    params = {"namespace": "ns", "collection_name": "c"}
+    tar = ArchiveFormat(TAR)
+    key = ScaffoldCache.key("/v2/creator/playbook", params, tar)
+    assert key == ScaffoldCache.key(
+        "/v2/creator/playbook", {"collection_name": "c", "namespace": "ns"}, tar
+    )
+    assert key != ScaffoldCache.key("/v2/creator/scaffold", params, tar)
+    assert key != ScaffoldCache.key("/v2/creator/playbook", params, ArchiveFormat(TAR_GZIP, "gzip"))
+
+
+def test_hit_and_miss(tmp_path: Path, scaffold: Path) -> None:
+    """Test a stored archive is served with its headers and the counters.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        scaffold: The scaffolded directory.
+    """
+    cache = ScaffoldCache(tmp_path / "cache", max_size=2**20, max_age=3600)
+    assert cache.get("key") is None
+    archive = _store(cache, "key", scaffold)
+    entry = cache.get("key")
+    assert entry is not None
+    with entry.file:
+        assert entry.file.read() == archive
+    assert entry.headers["Content-Disposition"] == 'attachment; filename="scaffold.tar"'
+    # The counters are shared with the other workers through the index
+    shared = ScaffoldCache(tmp_path / "cache", max_size=2**20, max_age=3600)
+    assert shared.stats() == {"hits": 1, "misses": 1, "entries": 1, "size": len(archive)}
+
+
+def test_evict_least_recently_used(tmp_path: Path, scaffold: Path) -> None:
+    """Test the least recently used archives are evicted over the maximum size.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        scaffold: The scaffolded directory.
+    """
+    cache = ScaffoldCache(tmp_path / "cache", max_size=2**20, max_age=3600)
+    # Room for two archives
+    cache.max_size = 2 * len(_store(cache, "first", scaffold))
+    _store(cache, "second", scaffold)
+    entry = cache.get("first")
+    assert entry is not None
+    entry.file.close()
+    _store(cache, "third", scaffold)
+    assert cache.get("second") is None
+    for key in ("first", "third"):
+        entry = cache.get(key)
+        assert entry is not None
+        entry.file.close()
+
+
+def test_evict_expired(tmp_path: Path, scaffold: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test archives older than the maximum age are not served and evicted.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        scaffold: The scaffolded directory.
+        monkeypatch: pytest fixture for patching.
+    """
+    cache = ScaffoldCache(tmp_path / "cache", max_size=2**20, max_age=60)
+    _store(cache, "old", scaffold)
+    later = time.time() + 120
+    monkeypatch.setattr("time.time", lambda: later)
+    assert cache.get("old") is None
+    _store(cache, "new", scaffold)
+    assert cache.stats()["entries"] == 1
+    assert not list((tmp_path / "cache" / "objects").glob("ol/old.*"))
+
+
+def test_store_replaced(tmp_path: Path, scaffold: Path) -> None:
+    """Test storing a key again replaces its archive under a new object name.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        scaffold: The scaffolded directory.
+    """
+    cache = ScaffoldCache(tmp_path / "cache", max_size=2**20, max_age=3600)
+    _store(cache, "key", scaffold)
+    (first,) = (tmp_path / "cache" / "objects").glob("ke/key.*")
+    _store(cache, "key", scaffold)
+    (second,) = (tmp_path / "cache" / "objects").glob("ke/key.*")
+    assert second != first
+    entry = cache.get("key")
+    assert entry is not None
+    entry.file.close()
+
+
+def test_store(tmp_path: Path, scaffold: Path) -> None:
+    """Test a stored archive stays readable after its eviction.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        scaffold: The scaffolded directory.
+    """
+    # Too small to keep the archive
+    cache = ScaffoldCache(tmp_path / "cache", max_size=1, max_age=3600)
+    entry = cache.store("key", scaffold, ArchiveFormat(TAR), "scaffold", {"X-Test": "yes"})
+    assert not entry.hit
+    assert entry.headers["X-Test"] == "yes"
+    assert cache.get("key") is None
+    with entry.file:
+        archive = entry.file.read()
+    assert entry.headers["X-Archive-SHA256"] == hashlib.sha256(archive).hexdigest()
+
+
+def test_store_failed(tmp_path: Path) -> None:
+    """Test an archive that could not be written is not stored.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    cache = ScaffoldCache(tmp_path / "cache", max_size=2**20, max_age=3600)
+    with pytest.raises(FileNotFoundError):
+        cache.store("key", tmp_path / "missing", ArchiveFormat(TAR), "scaffold")
+    assert cache.get("key") is None
+    assert not [path for path in (tmp_path / "cache" / "objects").rglob("*") if path.is_file()]
+
+
+@pytest.mark.usefixtures("server_cache")
+def test_cached_scaffold() -> None:
+    """Test a repeated scaffold request is served from the cache."""
+    client = Client()
+    responses = []
+    for _ in range(2):
+        response = client.post("/v2/creator/ee_project", data={}, content_type="application/json")
+        responses.append((response.status_code, response["X-Cache"], response.getvalue()))
+    assert [response[:2] for response in responses] == [
+        (HTTPStatus.CREATED, "MISS"),
+        (HTTPStatus.CREATED, "HIT"),
+    ]
+    assert responses[0][2] == responses[1][2]
+    stats = client.get("/v2/creator/cache").json()
+    assert stats == {
+        "enabled": True,
+        "hits": 1,
+        "misses": 1,
+        "entries": 1,
+        "size": len(responses[0][2]),
+    }
+
+
+@pytest.mark.usefixtures("server_cache")
+def test_cached_scaffold_formats() -> None:
+    """Test each archive format is cached separately, with its headers."""
+    client = Client()
+    responses = []
+    for encoding in ("gzip", "gzip", "identity"):
+        response = client.post(
+            "/v2/creator/ee_project",
+            data={},
+            content_type="application/json",
+            headers={"Accept-Encoding": encoding},
+        )
+        # The archive is stored once it was streamed to its end
+        content = response.getvalue()
+        responses.append(
+            (
+                response["X-Cache"],
+                response.get("Content-Encoding"),
+                content,
+                response["X-Archive-SHA256"],
+            )
+        )
+    assert [response[:2] for response in responses] == [
+        ("MISS", "gzip"),
+        ("HIT", "gzip"),
+        ("MISS", None),
+    ]
+    assert responses[0][2] == responses[1][2]
+    # The digest is the one of the canonical tar, whatever the encoding
+    assert responses[0][3] == hashlib.sha256(gzip.decompress(responses[0][2])).hexdigest()
+    assert responses[2][3] == hashlib.sha256(responses[2][2]).hexdigest()
+
+
+@pytest.mark.usefixtures("server_cache")
+def test_devfile_not_cached() -> None:
+    """Test scaffolds holding a devfile are not cached, its name is unique per run."""
+    client = Client()
+    names = []
+    for _ in range(2):
+        response = client.post("/v2/creator/devfile", data={}, content_type="application/json")
+        assert response.status_code == HTTPStatus.CREATED
+        assert "X-Cache" not in response
+        with tarfile.open(fileobj=io.BytesIO(response.getvalue())) as archive:
+            devfile = archive.extractfile("./devfile.yaml")
+            assert devfile is not None
+            names.append(yaml.safe_load(devfile)["metadata"]["name"])
+    assert names[0] != names[1]
+    assert client.get("/v2/creator/cache").json()["entries"] == 0
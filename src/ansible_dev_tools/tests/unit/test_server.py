@@ -2,11 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
+import gc
+import os
+import socket
+import sys
+
+from http import HTTPStatus
 from typing import TYPE_CHECKING, Any
 
+import pytest
+
+from django.test import AsyncClient, override_settings
+
+from ansible_dev_tools.subcommands.server import AdtServerApp, ReadyNotifier
+
 
 if TYPE_CHECKING:
-    import pytest
+    from pathlib import Path
 
     from ansible_dev_tools.subcommands.server import Server
 
@@ -44,3 +57,103 @@ def test_server_debug_options(monkeypatch: pytest.MonkeyPatch, adt_server: Serve
     adt_server.run()
     assert options["loglevel"] == "debug"
     assert called
+
+
+def test_server_worker_options(monkeypatch: pytest.MonkeyPatch, adt_server: Server) -> None:
+    """Test the worker options are passed to gunicorn, sizing the pool when auto.
+
+    Args:
+        monkeypatch: pytest fixture for patching.
+        adt_server: The server instance.
+    """
+    options = {}
+
+    class MockAdtServerApp:
+        """Mock AdtServerApp class."""
+
+        def __init__(self, *_args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+            """Initialize the mock class.
+
+            Args:
+                *_args: The positional arguments.
+                **kwargs: The keyword arguments.
+            """
+            nonlocal options
+            options = kwargs["options"]
+
+        def run(self) -> None:
+            """Run the mock class."""
+
+    monkeypatch.setattr("ansible_dev_tools.subcommands.server.AdtServerApp", MockAdtServerApp)
+    monkeypatch.setattr("ansible_dev_tools.subcommands.server.auto_workers", lambda _processes: 5)
+    monkeypatch.setattr(adt_server, "workers", "auto")
+    monkeypatch.setattr(adt_server, "threads", 4)
+    monkeypatch.setattr(adt_server, "worker_class", "gthread")
+    monkeypatch.setattr(adt_server, "bind", ["unix:/run/adt.sock", "127.0.0.1:8000"])
+
+    adt_server.run()
+    assert options["bind"] == ["unix:/run/adt.sock", "127.0.0.1:8000"]
+    assert options["workers"] == "5"
+    assert options["threads"] == "4"
+    assert options["worker_class"] == "gthread"
+    assert options["backlog"] == "2048"
+
+
+def test_server_preload(adt_server: Server) -> None:
+    """Test the preload warms up the creator templates and freezes the heap.
+
+    Args:
+        adt_server: The server instance.
+    """
+    app = AdtServerApp(app=adt_server.application, options={"preload_app": "true"})
+    try:
+        assert app.load() is adt_server.application
+        assert gc.get_freeze_count() > 0
+        assert "ansible_creator.resources.common.role" in sys.modules
+    finally:
+        gc.unfreeze()
+
+
+@override_settings(ROOT_URLCONF="ansible_dev_tools.resources.server.asgi_urls")
+def test_asgi_urls() -> None:
+    """Test the cheap and the creator views through the ASGI handler."""
+
+    async def requests() -> tuple[int, int]:
+        client = AsyncClient()
+        metadata = await client.get("/metadata")
+        playbook = await client.post(
+            "/v2/creator/playbook",
+            data={"project": "ansible-project", "namespace": "ns", "collection_name": "name"},
+            content_type="application/json",
+        )
+        playbook.close()
+        return metadata.status_code, playbook.status_code
+
+    assert asyncio.run(requests()) == (HTTPStatus.OK, HTTPStatus.CREATED)
+
+
+def test_ready_notifier(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test the first worker ready writes the address and notifies systemd, once.
+
+    Args:
+        monkeypatch: pytest fixture for patching.
+        tmp_path: pytest fixture for a temporary directory.
+    """
+    notify_path = tmp_path / "notify"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as notify_socket:
+        notify_socket.bind(str(notify_path))
+        monkeypatch.setenv("NOTIFY_SOCKET", str(notify_path))
+        ready_read, ready_write = os.pipe()
+        notifier = ReadyNotifier(ready_write)
+        notifier.notify("http://0.0.0.0:43210")
+        # A second worker, holding its own copy of the descriptor
+        notifier.fd = os.dup(ready_read)
+        notifier.notify("http://0.0.0.0:43210")
+        with pytest.raises(OSError, match="Bad file descriptor"):
+            os.fstat(notifier.fd)
+        with os.fdopen(ready_read, "rb") as ready:
+            assert ready.read() == b"http://0.0.0.0:43210\n"
+        assert notify_socket.recv(1024).startswith(b"READY=1\n")
+        notify_socket.settimeout(0)
+        with pytest.raises(BlockingIOError):
+            notify_socket.recv(1024)
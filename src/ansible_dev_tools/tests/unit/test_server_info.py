@@ -0,0 +1,52 @@
+"""Tests for the precomputed metadata."""
+
+from __future__ import annotations
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from django.test import Client, override_settings
+
+from ansible_dev_tools.resources.server import server_info
+
+
+if TYPE_CHECKING:
+    import pytest
+
+
+def test_metadata_etag() -> None:
+    """Test the metadata is revalidated by ETag."""
+    client = Client()
+    response = client.get("/metadata")
+    assert response.status_code == HTTPStatus.OK
+    assert "/v2/jobs" in response.json()["apis"]["v2"]
+    etag = response["ETag"]
+    response = client.get("/metadata", headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not response.content
+
+
+def test_metadata_built_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the metadata is only built again when refreshed after an install.
+
+    Args:
+        monkeypatch: pytest fixture for patching.
+    """
+    built = []
+    metadata = server_info.metadata
+
+    def counted() -> dict[str, object]:
+        built.append(True)
+        return metadata()
+
+    monkeypatch.setattr(server_info, "metadata", counted)
+    monkeypatch.setattr(server_info, "_METADATA", {})
+    monkeypatch.setattr(server_info, "installed_key", lambda: "before")
+    first = server_info.precomputed_metadata()
+    assert server_info.precomputed_metadata() is first
+    with override_settings(ADT_METADATA_REFRESH=True):
+        refreshed = server_info.precomputed_metadata()
+        assert server_info.precomputed_metadata() is refreshed
+        monkeypatch.setattr(server_info, "installed_key", lambda: "after")
+        assert server_info.precomputed_metadata() is not refreshed
+    assert len(built) == len(("first", "refreshed", "after"))
@@ -7,17 +7,38 @@ the Server instance configured with the Django settings.
 
 from __future__ import annotations
 
+import asyncio
+import gzip
+import io
 import json
+import threading
 
 from http import HTTPStatus
+from typing import TYPE_CHECKING, NoReturn
 
 import pytest
 
-from django.http import HttpRequest, HttpResponse
+from django.http import FileResponse, HttpRequest, HttpResponse, JsonResponse
+from django.test import override_settings
 from django.test.client import RequestFactory
+from openapi_core import OpenAPI
 from openapi_core.unmarshalling.request.datatypes import RequestUnmarshalResult
 
-from ansible_dev_tools.server_utils import validate_request, validate_response
+from ansible_dev_tools.server_utils import (
+    HEADERS_ONLY_VALIDATOR,
+    OPENAPI,
+    PrecompiledPathFinder,
+    PrecomputedResponse,
+    async_view,
+    load_openapi,
+    parse_accept,
+    validate_request,
+    validate_response,
+)
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 
 @pytest.fixture(name="collection_request")
@@ -86,3 +107,226 @@ def test_validate_response_fail(collection_request: HttpRequest) -> None:
     response.status_code = HTTPStatus.CREATED.value
     result = validate_response(collection_request, response)
     assert result.status_code == HTTPStatus.BAD_REQUEST.value
+
+
+def test_validate_response_streaming(collection_request: HttpRequest) -> None:
+    """Test a streaming response is validated without reading its body.
+
+    Args:
+        collection_request: A Django request object
+    """
+    body = io.BytesIO(b"Hello, World!")
+    response = FileResponse(body, content_type="application/tar", status=HTTPStatus.CREATED)
+    result = validate_response(collection_request, response)
+    assert result is response
+    assert body.tell() == 0
+    assert b"".join(response.streaming_content) == b"Hello, World!"  # type: ignore[arg-type]
+
+
+def test_validate_response_streaming_fail(collection_request: HttpRequest) -> None:
+    """Test a streaming response with an undeclared content type fails.
+
+    Args:
+        collection_request: A Django request object
+    """
+    response = FileResponse(io.BytesIO(b"{}"), content_type="text/plain", status=HTTPStatus.CREATED)
+    result = validate_response(collection_request, response)
+    assert result.status_code == HTTPStatus.BAD_REQUEST.value
+
+
+@pytest.mark.parametrize(
+    ("rates", "failures"),
+    (
+        pytest.param({"*": 0}, 0, id="off"),
+        pytest.param({"/v1/creator/collection": 2}, 2, id="sampled"),
+        pytest.param({"*": 0, "/v1/creator/collection": 1}, 4, id="strict-route"),
+    ),
+)
+def test_validate_response_rate(
+    collection_request: HttpRequest,
+    rates: dict[str, int],
+    failures: int,
+) -> None:
+    """Test the responses are validated at the configured rate.
+
+    Args:
+        collection_request: A Django request object
+        rates: The response validation rates per route.
+        failures: The expected number of failed validations out of 4.
+    """
+    statuses = []
+    with override_settings(ADT_RESPONSE_VALIDATION=rates):
+        for _ in range(4):
+            response = HttpResponse(content_type="application/tar", status=HTTPStatus.CREATED)
+            statuses.append(validate_response(collection_request, response).status_code)
+    assert statuses.count(HTTPStatus.BAD_REQUEST.value) == failures
+
+
+def test_load_openapi_compiled(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test the compiled spec is written once and loaded afterwards.
+
+    The compiled specs of previous digests are removed.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+        tmp_path: Pytest tmp_path fixture.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    stale = tmp_path / "ansible-dev-tools" / "openapi.0000000000000000.json"
+    stale.parent.mkdir()
+    stale.write_text("{}")
+    load_openapi()
+    (compiled,) = stale.parent.glob("openapi.*.json")
+    assert compiled != stale
+    spec = json.loads(compiled.read_text())
+    assert "$ref" not in json.dumps(spec["paths"])
+
+    def fail(_source: bytes) -> NoReturn:
+        """Fail if the spec is compiled again.
+
+        Args:
+            _source: The OpenAPI document.
+
+        Raises:
+            AssertionError: Always.
+        """
+        msg = "The spec was compiled despite an existing compiled spec"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr("ansible_dev_tools.server_utils.compile_spec", fail)
+    assert isinstance(load_openapi(), OpenAPI)
+
+
+def test_load_openapi_read_only(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test the spec is loaded when the cache directory cannot be written to.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+        tmp_path: Pytest tmp_path fixture.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    stale = tmp_path / "ansible-dev-tools" / "openapi.0000000000000000.json"
+    stale.parent.mkdir()
+    stale.write_text("{}")
+
+    def denied(*_args: object, **_kwargs: object) -> NoReturn:
+        """Deny writing to the cache directory, as for a foreign owned one.
+
+        Args:
+            *_args: The positional arguments.
+            **_kwargs: The keyword arguments.
+
+        Raises:
+            PermissionError: Always.
+        """
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr("pathlib.Path.unlink", denied)
+    assert isinstance(load_openapi(), OpenAPI)
+    assert stale.exists()
+
+
+def test_validate_request_single_pass(
+    monkeypatch: pytest.MonkeyPatch,
+    collection_request: HttpRequest,
+) -> None:
+    """Test the request is unmarshalled without a separate validation pass.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+        collection_request: A Django request object
+    """
+
+    def fail(*_args: object) -> NoReturn:
+        """Fail if the request is validated separately.
+
+        Args:
+            *_args: The positional arguments.
+
+        Raises:
+            AssertionError: Always.
+        """
+        msg = "The request was validated twice"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(OPENAPI, "validate_request", fail)
+    result = validate_request(collection_request)
+    assert isinstance(result, RequestUnmarshalResult)
+
+
+def test_precompiled_operations() -> None:
+    """Test every operation of the spec is resolved when the spec is loaded."""
+    validators = (OPENAPI.request_unmarshaller, OPENAPI.response_validator, HEADERS_ONLY_VALIDATOR)
+    spec = OPENAPI.spec.read_value()
+    for validator in validators:
+        finder = getattr(validator, "path_finder", None)
+        assert isinstance(finder, PrecompiledPathFinder)
+        for route, path_item in spec["paths"].items():
+            for method in path_item:
+                assert (method, route) in finder.operations
+    # The operations are not shared between finders
+    assert not PrecompiledPathFinder(OPENAPI.spec).operations
+
+
+@pytest.mark.parametrize(("blocking", "prefix"), ((True, "adt-creator"), (False, "MainThread")))
+def test_async_view(collection_request: HttpRequest, *, blocking: bool, prefix: str) -> None:
+    """Test blocking views run in the creator executor, others on the event loop.
+
+    Args:
+        collection_request: The request object.
+        blocking: Whether the view is blocking.
+        prefix: The expected thread name prefix.
+    """
+
+    def view(_request: HttpRequest) -> HttpResponse:
+        return HttpResponse(threading.current_thread().name)
+
+    response = asyncio.run(async_view(view, blocking=blocking)(collection_request))
+    assert isinstance(response, HttpResponse)
+    assert response.content.decode().startswith(prefix)
+
+
+def test_parse_accept() -> None:
+    """Test parsing the qualities of an Accept-Encoding header."""
+    assert parse_accept("gzip;q=0.5, ZSTD, br;q=0, deflate;q=x") == {
+        "gzip": 0.5,
+        "zstd": 1.0,
+        "br": 0.0,
+        "deflate": 1.0,
+    }
+
+
+@pytest.mark.parametrize(
+    ("headers", "status", "encoding"),
+    (
+        pytest.param({}, HTTPStatus.OK, None, id="identity"),
+        pytest.param({"Accept-Encoding": "gzip"}, HTTPStatus.OK, "gzip", id="gzip"),
+        pytest.param({"Accept-Encoding": "gzip;q=0"}, HTTPStatus.OK, None, id="no-gzip"),
+        pytest.param({"If-None-Match": "*"}, HTTPStatus.NOT_MODIFIED, None, id="any"),
+    ),
+)
+def test_precomputed_response(
+    headers: dict[str, str],
+    status: HTTPStatus,
+    encoding: str | None,
+) -> None:
+    """Test a precomputed response negotiates the encoding and honors If-None-Match.
+
+    Args:
+        headers: The request headers.
+        status: The expected status.
+        encoding: The expected content encoding.
+    """
+    precomputed = PrecomputedResponse.from_response(JsonResponse({"key": "value"}))
+    response = precomputed.respond(RequestFactory().get("/", headers=headers))
+    assert response.status_code == status
+    assert response.get("Content-Encoding") == encoding
+    if status == HTTPStatus.OK:
+        content = gzip.decompress(response.content) if encoding else response.content
+        assert json.loads(content) == {"key": "value"}
+        # Sending back the ETag of either encoding returns a 304 without body
+        revalidated = precomputed.respond(
+            RequestFactory().get("/", headers={"If-None-Match": response["ETag"]}),
+        )
+        assert revalidated.status_code == HTTPStatus.NOT_MODIFIED
+        assert not revalidated.content
@@ -0,0 +1,89 @@
+"""Tests for the utility functions."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from ansible_dev_tools import utils
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+GIB = 1024**3
+
+
+@pytest.fixture(name="cgroup")
+def fixture_cgroup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Point the cgroup lookups at a temporary hierarchy.
+
+    Args:
+        tmp_path: pytest fixture for a temporary directory.
+        monkeypatch: pytest fixture for patching.
+
+    Returns:
+        The root of the temporary cgroup hierarchy.
+    """
+    root = tmp_path / "cgroup"
+    proc = tmp_path / "proc_cgroup"
+    root.mkdir()
+    proc.write_text("")
+    monkeypatch.setattr(utils, "CGROUP_ROOT", root)
+    monkeypatch.setattr(utils, "PROC_CGROUP", proc)
+    monkeypatch.setattr("os.sched_getaffinity", lambda _pid: set(range(8)))
+    return root
+
+
+def test_cgroup_v2_limits(cgroup: Path) -> None:
+    """Test reading the limits of the process cgroup in the unified hierarchy.
+
+    Args:
+        cgroup: The root of the temporary cgroup hierarchy.
+    """
+    (cgroup / "cgroup.controllers").write_text("cpu memory")
+    utils.PROC_CGROUP.write_text("0::/adt.slice\n")
+    (cgroup / "adt.slice").mkdir()
+    (cgroup / "adt.slice" / "cpu.max").write_text("150000 100000\n")
+    (cgroup / "adt.slice" / "memory.max").write_text(f"{2 * GIB}\n")
+    limits = (utils.cgroup_cpu_limit(), utils.cgroup_memory_limit())
+    assert limits == (1.5, 2 * GIB)
+    # Two workers per CPU plus one, with the quota rounded up
+    assert utils.auto_workers() == 2 * 2 + 1
+
+
+def test_cgroup_v1_limits(cgroup: Path) -> None:
+    """Test reading the limits from the legacy hierarchy of a container.
+
+    Args:
+        cgroup: The root of the temporary cgroup hierarchy.
+    """
+    utils.PROC_CGROUP.write_text("4:memory:/docker/abc\n3:cpu,cpuacct:/docker/abc\n")
+    (cgroup / "cpu").mkdir()
+    (cgroup / "cpu" / "cpu.cfs_quota_us").write_text("400000\n")
+    (cgroup / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    (cgroup / "memory").mkdir()
+    (cgroup / "memory" / "memory.limit_in_bytes").write_text(f"{GIB}\n")
+    limits = (utils.cgroup_cpu_limit(), utils.cgroup_memory_limit())
+    assert limits == (4, GIB)
+    # The memory limit only fits four of the nine workers for four CPUs
+    assert utils.auto_workers() == GIB // utils.WORKER_MEMORY
+    # And fewer once their creator processes are counted
+    worker = utils.WORKER_MEMORY + 2 * utils.CREATOR_MEMORY
+    assert utils.auto_workers(creator_processes=2) == GIB // worker
+
+
+def test_cgroup_unlimited(cgroup: Path) -> None:
+    """Test workers are sized from the CPUs without cgroup limits.
+
+    Args:
+        cgroup: The root of the temporary cgroup hierarchy.
+    """
+    (cgroup / "cgroup.controllers").write_text("cpu memory")
+    (cgroup / "cpu.max").write_text("max 100000\n")
+    (cgroup / "memory.max").write_text("max\n")
+    assert utils.cgroup_cpu_limit() is None
+    assert utils.cgroup_memory_limit() is None
+    assert utils.auto_workers() == 2 * 8 + 1
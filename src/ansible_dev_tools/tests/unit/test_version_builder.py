@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
+import json
+import os
 import re
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NoReturn
 
-from ansible_dev_tools.version_builder import PKGS, version_builder
+from ansible_dev_tools.version_builder import PKGS, tool_versions, version_builder
 
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     import pytest
 
 
@@ -26,3 +30,53 @@ def test_version_builder_failure(monkeypatch: pytest.MonkeyPatch) -> None:
     versions = version_builder()
 
     assert re.search(r"__invalid__\s+not installed", versions)
+
+
+def test_version_manifest_reused(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test the versions are served from the manifest once it is written.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+        tmp_path: Pytest tmp_path fixture.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    versions = tool_versions()
+    assert list(tmp_path.glob("ansible-dev-tools/versions-*.json"))
+
+    def fail() -> NoReturn:
+        """Fail if the environment is scanned again.
+
+        Raises:
+            AssertionError: Always.
+        """
+        msg = "The environment was scanned despite a current manifest"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr("ansible_dev_tools.version_builder._distribution_index", fail)
+    assert tool_versions() == versions
+
+
+def test_version_manifest_invalidated(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test the manifest is rebuilt when a sys.path entry changes.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+        tmp_path: Pytest tmp_path fixture.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    site_dir = tmp_path / "site-packages"
+    site_dir.mkdir()
+    monkeypatch.syspath_prepend(str(site_dir))
+    assert tool_versions()["ansible-lint"] != "99.0"
+
+    (site_dir / "ansible_lint-99.0.dist-info").mkdir()
+    os.utime(site_dir, ns=(0, 1))
+    assert tool_versions()["ansible-lint"] == "99.0"
+
+
+def test_version_builder_json() -> None:
+    """Test the JSON output includes the bundled tools and installed extras."""
+    versions = json.loads(version_builder(output_format="json"))
+    assert all(p in versions for p in PKGS)
+    assert all(versions[p] != "not installed" for p in PKGS)
+    assert "django" in versions
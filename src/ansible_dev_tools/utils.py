@@ -2,6 +2,24 @@
 
 from __future__ import annotations
 
+import contextlib
+import math
+import os
+
+from pathlib import Path
+
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_CGROUP = Path("/proc/self/cgroup")
+# Rough resident size of a server worker once django, openapi-core and
+# ansible-creator are loaded, used to fit the workers in a memory limit
+WORKER_MEMORY = 256 * 1024**2
+# Rough resident size of a creator process, which only loads ansible-creator
+# and its templates, and of the scaffold it runs
+CREATOR_MEMORY = 64 * 1024**2
+# cgroup v1 reports an unlimited memory limit as a page aligned LONG_MAX
+UNLIMITED_MEMORY = 2**62
+
 
 class Colors:
     """ANSI color codes.
@@ -57,3 +75,121 @@ class Colors:
     NEGATIVE = "\033[7m"
     CROSSED = "\033[9m"
     END = "\033[0m"
+
+
+def cache_dir() -> Path:
+    """Return the directory used for ansible-dev-tools cache files.
+
+    Honors ``XDG_CACHE_HOME`` and falls back to ``~/.cache``.
+
+    Returns:
+        The cache directory, which may not exist yet.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "ansible-dev-tools"
+
+
+def process_alive(pid: int) -> bool:
+    """Tell whether a process is running on this host.
+
+    Args:
+        pid: The process id.
+
+    Returns:
+        False if the process is gone.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_cgroup_file(v2_file: str, v1_controller: str, v1_file: str) -> str | None:
+    """Read a cgroup interface file of the current process.
+
+    Both the unified (v2) and legacy (v1) hierarchies are supported. The
+    process cgroup is tried first, then the root of the hierarchy, which is
+    where a container with its own cgroup namespace sees its limits.
+
+    Args:
+        v2_file: The file name in the unified hierarchy.
+        v1_controller: The controller of the legacy hierarchy.
+        v1_file: The file name in the legacy hierarchy.
+
+    Returns:
+        The file content, or None if no file could be read.
+    """
+    unified = (CGROUP_ROOT / "cgroup.controllers").exists()
+    directory = CGROUP_ROOT if unified else CGROUP_ROOT / v1_controller
+    name = v2_file if unified else v1_file
+    candidates = [directory / name]
+    with contextlib.suppress(OSError):
+        for line in PROC_CGROUP.read_text().splitlines():
+            _, controllers, cgroup = line.split(":", 2)
+            if (unified and not controllers) or v1_controller in controllers.split(","):
+                candidates.insert(0, directory / cgroup.lstrip("/") / name)
+                break
+    for candidate in candidates:
+        with contextlib.suppress(OSError):
+            return candidate.read_text().strip()
+    return None
+
+
+def cgroup_cpu_limit() -> float | None:
+    """Return the CPU quota of the current cgroup.
+
+    Returns:
+        The number of CPUs the quota allows, or None if there is no quota.
+    """
+    quota = _read_cgroup_file("cpu.max", "cpu", "cpu.cfs_quota_us")
+    if quota is None or quota.startswith(("max", "-")):
+        return None
+    if " " in quota:
+        quota, period = quota.split()
+    else:
+        period = _read_cgroup_file("cpu.max", "cpu", "cpu.cfs_period_us") or "100000"
+    with contextlib.suppress(ValueError, ZeroDivisionError):
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit() -> int | None:
+    """Return the memory limit of the current cgroup.
+
+    Returns:
+        The limit in bytes, or None if there is no limit.
+    """
+    limit = _read_cgroup_file("memory.max", "memory", "memory.limit_in_bytes")
+    if limit is None or not limit.isdigit() or int(limit) >= UNLIMITED_MEMORY:
+        return None
+    return int(limit)
+
+
+def auto_workers(creator_processes: int = 0) -> int:
+    """Size the server worker pool for the CPUs and memory available.
+
+    Follows the gunicorn recommendation of two workers per CPU plus one,
+    bounded by the cgroup CPU quota and by the number of workers that fit
+    in the cgroup memory limit, each with its creator processes.
+
+    Args:
+        creator_processes: The number of creator processes of each worker.
+
+    Returns:
+        The number of workers.
+    """
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota:
+        cpus = min(cpus, quota)
+    workers = 2 * math.ceil(cpus) + 1
+    memory = cgroup_memory_limit()
+    if memory:
+        workers = min(workers, memory // (WORKER_MEMORY + creator_processes * CREATOR_MEMORY))
+    return max(1, workers)
@@ -2,7 +2,18 @@
 
 from __future__ import annotations
 
+import contextlib
+import hashlib
 import importlib.metadata
+import json
+import os
+import re
+import sys
+import tempfile
+
+from pathlib import Path, PurePath
+
+from ansible_dev_tools.utils import cache_dir
 
 
 PKGS = [
@@ -19,19 +30,181 @@ PKGS = [
     "tox-ansible",
 ]
 
+# Reported alongside the bundled tools when installed, e.g. with the server extra
+EXTRAS = [
+    "django",
+    "gunicorn",
+    "openapi-core",
+]
 
-def version_builder() -> str:
-    """Build a string of formatted versions.
+METADATA_SUFFIXES = (".dist-info", ".egg-info")
+
+
+def _manifest_path() -> Path:
+    """Return the version manifest path for the running interpreter.
+
+    Each environment gets its own manifest so switching between virtual
+    environments does not keep invalidating a shared one.
 
     Returns:
-        The versions string
+        The manifest file path.
+    """
+    prefix = hashlib.sha256(sys.prefix.encode()).hexdigest()[:16]
+    return cache_dir() / f"versions-{prefix}.json"
+
+
+def installed_key() -> str:
+    """Build the key identifying the installed distributions.
+
+    Installing, upgrading or removing a distribution adds or removes its
+    metadata directory, which updates the mtime of the ``sys.path`` entry
+    holding it.
+
+    Returns:
+        A digest of the package list and the ``sys.path`` entry mtimes.
     """
-    lines = []
-    for pkg in sorted(PKGS):
+    digest = hashlib.sha256("\0".join([*PKGS, "", *EXTRAS]).encode())
+    for entry in sys.path:
+        if not entry:
+            continue
         try:
-            version = importlib.metadata.version(pkg)
-        except importlib.metadata.PackageNotFoundError:
-            version = "not installed"
-        lines.append(f"{pkg: <40} {version}")
+            mtime = Path(entry).stat().st_mtime_ns
+        except OSError:
+            continue
+        digest.update(f"\0{entry}\0{mtime}".encode())
+    return digest.hexdigest()
 
-    return "\n".join(lines)
+
+def _read_manifest(path: Path, key: str) -> dict[str, str] | None:
+    """Read the versions from the manifest if it is still current.
+
+    Args:
+        path: The manifest file path.
+        key: The key for the installed distributions.
+
+    Returns:
+        The versions, or None if the manifest is missing, unreadable or stale.
+    """
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("key") != key:
+        return None
+    versions = manifest.get("versions")
+    return versions if isinstance(versions, dict) else None
+
+
+def _write_manifest(path: Path, key: str, versions: dict[str, str]) -> None:
+    """Write the versions manifest, ignoring an unwritable cache directory.
+
+    Args:
+        path: The manifest file path.
+        key: The key for the installed distributions.
+        versions: The tool versions.
+    """
+    with contextlib.suppress(OSError):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            dir=path.parent,
+            prefix=".versions-",
+            delete=False,
+        ) as tmp_file:
+            json.dump({"key": key, "versions": versions}, tmp_file)
+        Path(tmp_file.name).replace(path)
+
+
+def _normalize(name: str) -> str:
+    """Normalize a distribution name as described in PEP 503.
+
+    Args:
+        name: The distribution name.
+
+    Returns:
+        The normalized name.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _distribution_index() -> dict[str, str]:
+    """Index the installed distributions in a single pass over ``sys.path``.
+
+    Names and versions are taken from the metadata directory names, the
+    metadata file is only parsed for legacy ``.egg-info`` directories without
+    a version in their name. As with ``importlib.metadata.version``, the first
+    distribution found on ``sys.path`` wins.
+
+    Returns:
+        The installed versions, keyed by normalized distribution name.
+    """
+    index: dict[str, str] = {}
+    for entry in sys.path:
+        try:
+            with os.scandir(entry or ".") as entries:
+                names = [dir_entry.name for dir_entry in entries]
+        except OSError:
+            continue
+        for name in names:
+            metadata_dir = PurePath(name)
+            if metadata_dir.suffix not in METADATA_SUFFIXES:
+                continue
+            dist_name, _, version = metadata_dir.stem.partition("-")
+            dist_name = _normalize(dist_name)
+            if dist_name in index:
+                continue
+            # Legacy egg-info names may carry a python tag, e.g. name-1.0-py3.11
+            version = version.partition("-")[0]
+            if not version:
+                metadata_path = Path(entry or ".", name)
+                version = importlib.metadata.PathDistribution(metadata_path).version
+            if version:
+                index[dist_name] = version
+    return index
+
+
+def _resolve_versions() -> dict[str, str]:
+    """Resolve the bundled tools and installed extras from the distribution index.
+
+    Returns:
+        The tool versions, keyed by package name.
+    """
+    index = _distribution_index()
+    versions = {pkg: index.get(_normalize(pkg), "not installed") for pkg in sorted(PKGS)}
+    versions.update(
+        {pkg: index[_normalize(pkg)] for pkg in sorted(EXTRAS) if _normalize(pkg) in index},
+    )
+    return versions
+
+
+def tool_versions() -> dict[str, str]:
+    """Return the versions of the bundled tools and installed extras.
+
+    The versions are read from a manifest in the cache directory, the
+    environment is only scanned when the installed distributions changed.
+
+    Returns:
+        The tool versions, keyed by package name.
+    """
+    key = installed_key()
+    path = _manifest_path()
+    versions = _read_manifest(path, key)
+    if versions is None:
+        versions = _resolve_versions()
+        _write_manifest(path, key, versions)
+    return versions
+
+
+def version_builder(output_format: str = "text") -> str:
+    """Build a string of formatted versions.
+
+    Args:
+        output_format: Either ``text`` for aligned columns or ``json``.
+
+    Returns:
+        The versions string
+    """
+    versions = tool_versions()
+    if output_format == "json":
+        return json.dumps(versions, indent=2)
+    return "\n".join(f"{pkg: <40} {version}" for pkg, version in versions.items())
@@ -0,0 +1,111 @@
+# ruff: noqa: INP001
+"""Compare the worker CPU time per MB of archives sent with and without sendfile.
+
+Run with ``python tools/benchmarks/archive_sendfile.py [requests]`` on Linux,
+the server dependencies must be installed. Each mode starts ``adt server``
+with a single sync worker and an empty scaffold cache, scaffolds a collection
+once, then downloads it from the cache. ``SENDFILE=0`` makes gunicorn copy the
+archive through the worker in userland chunks, as every archive was sent
+before, the default hands the file descriptor to ``os.sendfile``.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+import requests
+
+
+SCAFFOLD = {"command_path": ["init", "collection"], "params": {"collection": "bench.sendfile"}}
+
+
+def _free_port() -> int:
+    """Find a free local port.
+
+    Returns:
+        The port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+    return port
+
+
+def _cpu_seconds(pid: int) -> float:
+    """Read the user and system CPU time of a process.
+
+    Args:
+        pid: The process id.
+
+    Returns:
+        The CPU time in seconds.
+    """
+    # The fields following the parenthesized command name, utime and stime are 14 and 15
+    fields = Path(f"/proc/{pid}/stat").read_text().rpartition(")")[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _run(count: int, *, sendfile: bool) -> None:
+    """Benchmark one mode and print the results.
+
+    Args:
+        count: The number of archives to download.
+        sendfile: Whether gunicorn may use sendfile.
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/v2/creator/scaffold"
+    env = {**os.environ, "SENDFILE": "1" if sendfile else "0"}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        command = [
+            sys.executable,
+            "-m",
+            "ansible_dev_tools",
+            "server",
+            "--port",
+            str(port),
+            "--cache-dir",
+            cache_dir,
+        ]
+        proc = subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL)  # noqa: S603
+        try:
+            with requests.Session() as session:
+                while True:
+                    try:
+                        session.post(url, json=SCAFFOLD, timeout=30)
+                        break
+                    except requests.ConnectionError:
+                        time.sleep(0.01)
+                (worker,) = Path(f"/proc/{proc.pid}/task/{proc.pid}/children").read_text().split()
+                start = _cpu_seconds(int(worker))
+                size = 0
+                for _ in range(count):
+                    response = session.post(url, json=SCAFFOLD, timeout=30)
+                    size += len(response.content)
+                cpu = _cpu_seconds(int(worker)) - start
+        finally:
+            proc.terminate()
+            proc.wait()
+    label = "sendfile" if sendfile else "userland"
+    megabytes = size / 1024**2
+    print(  # noqa: T201
+        f"{label}: {megabytes:.1f} MB in {count} archives,"
+        f" {cpu * 1000 / megabytes:.2f} ms of worker CPU per MB",
+    )
+
+
+def main() -> None:
+    """Run the benchmark for both modes."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    _run(count, sendfile=False)
+    _run(count, sendfile=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# ruff: noqa: INP001
+"""Compare the OpenAPI spec load time from YAML and from its compiled form.
+
+Run with ``python tools/benchmarks/openapi_startup.py [repeat]``, the server
+dependencies must be installed.
+"""
+
+from __future__ import annotations
+
+import statistics
+import sys
+import timeit
+
+from importlib import resources as importlib_resources
+
+import yaml
+
+from openapi_core import OpenAPI
+
+from ansible_dev_tools.server_utils import SPEC_PACKAGE, load_openapi
+
+
+def _from_yaml() -> OpenAPI:
+    """Load the spec the way the server did before it was compiled.
+
+    Returns:
+        The OpenAPI object.
+    """
+    source = (importlib_resources.files(SPEC_PACKAGE) / "openapi.yaml").read_text()
+    return OpenAPI.from_dict(yaml.safe_load(source))
+
+
+def main() -> None:
+    """Time both load paths and print the median of each."""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    # Compile once so the timed runs load the compiled spec
+    load_openapi()
+    results = {}
+    for name, func in (("yaml", _from_yaml), ("compiled", load_openapi)):
+        times = timeit.repeat(func, number=1, repeat=repeat)
+        results[name] = statistics.median(times)
+        print(f"{name: <10} {results[name] * 1000:8.2f} ms (median of {repeat})")  # noqa: T201
+    print(f"speedup    {results['yaml'] / results['compiled']:8.1f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
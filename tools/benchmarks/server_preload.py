@@ -0,0 +1,112 @@
+# ruff: noqa: INP001
+"""Compare worker memory and time to first request with and without --preload.
+
+Run with ``python tools/benchmarks/server_preload.py [workers]`` on Linux, the
+server dependencies must be installed. Each mode starts ``adt server``,
+times the first request, sends a scaffold request per worker and reads the
+memory of every worker from ``/proc``. PSS splits the shared pages between
+the processes sharing them, USS only counts the pages private to a worker.
+"""
+
+from __future__ import annotations
+
+import socket
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+import requests
+
+
+SCAFFOLD = {"command_path": ["init", "collection"], "params": {"collection": "bench.preload"}}
+
+
+def _free_port() -> int:
+    """Find a free local port.
+
+    Returns:
+        The port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+    return port
+
+
+def _memory(pid: int) -> dict[str, int]:
+    """Read the memory summary of a process.
+
+    Args:
+        pid: The process id.
+
+    Returns:
+        The Rss, Pss and private sizes in KiB.
+    """
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":")
+        fields[name] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _run(workers: int, *, preload: bool) -> None:
+    """Benchmark one server mode and print the results.
+
+    Args:
+        workers: The number of workers.
+        preload: Whether to start the server with --preload.
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable,
+        "-m",
+        "ansible_dev_tools",
+        "server",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+    ]
+    if preload:
+        command.append("--preload")
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, stderr=subprocess.DEVNULL)  # noqa: S603
+    try:
+        while True:
+            try:
+                requests.get(f"{url}/v2/creator/capabilities", timeout=10)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.01)
+        first_request = time.perf_counter() - start
+        # Give each worker the chance to serve a scaffold
+        for _ in range(workers * 2):
+            requests.post(f"{url}/v2/creator/scaffold", json=SCAFFOLD, timeout=30)
+        children = Path(f"/proc/{proc.pid}/task/{proc.pid}/children").read_text().split()
+        memory = [_memory(int(pid)) for pid in children]
+    finally:
+        proc.terminate()
+        proc.wait()
+    label = "preload" if preload else "default"
+    print(f"{label}: first request after {first_request * 1000:.0f} ms")  # noqa: T201
+    for key in ("rss", "pss", "uss"):
+        average = sum(worker[key] for worker in memory) / len(memory) / 1024
+        print(f"  {key} per worker {average:8.1f} MiB")  # noqa: T201
+
+
+def main() -> None:
+    """Run the benchmark for both modes."""
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    _run(workers, preload=False)
+    _run(workers, preload=True)
+
+
+if __name__ == "__main__":
+    main()